@@ -3,9 +3,11 @@ from typing import List
 from fastapi import APIRouter, Depends, HTTPException, status
 from typing_extensions import Annotated
 
+from core.cache import genres_cache, invalidator
 from core.config import db
 from core.enum import Genre
 from core.jwt import security_jwt
+from core.redis import get_redis
 
 router = APIRouter(tags=["genres"])
 
@@ -79,4 +81,8 @@ async def add_favorite_user_genres(
         {"user_id": user_id}, {"_id": 0}
     )
 
+    # Сбрасываем жанры пользователя в локальных кэшах этой и остальных реплик
+    genres_cache.delete(user_id)
+    await invalidator.publish(await get_redis(), genres_cache.name, user_id)
+
     return updated_user_genres or {"genres": []}
@@ -1,18 +1,26 @@
-import json
 import logging
-import random
 from datetime import datetime, timezone
 from time import time
 
 import httpx
-from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from redis.asyncio import Redis
 from typing_extensions import Annotated
 
+from core.cache import MISSING, cache_ttls, genres_cache, recommendation_cache
 from core.config import db, settings
+from core.experiments import MODEL_TYPES, model_experiment
 from core.jwt import JWTBearer, security_jwt
-from core.metrics import REQUEST_COUNT, REQUEST_LATENCY  # Импортируем метрики
+from core.log_writer import log_writer
+from core.metrics import (  # Импортируем метрики
+    RECOMMENDATION_CACHE_LOOKUPS,
+    REQUEST_COUNT,
+    REQUEST_LATENCY,
+)
 from core.redis import get_redis
+from core.single_flight import single_flight
+from core.stages import collect_stages, server_timing, stage
+from ml.recommendation_logs import recommendation_log
 from ml.recommendation_model import recommendation_model
 from schemas.schemas import RecommendationResponse
 
@@ -50,11 +58,14 @@ async def get_base_recommendations_for_user(
 
     user_id = user["id"]
 
-    # Получаем любимые жанры пользователя из MongoDB
-    user_genres = await db.favourite_genres.find_one(
-        {"user_id": user_id}, {"_id": 0, "genres": 1}
-    )
-    favorite_genres = user_genres.get("genres") if user_genres else []
+    # Получаем любимые жанры пользователя: локальный кэш, при промахе MongoDB
+    favorite_genres = genres_cache.get(user_id)
+    if favorite_genres is MISSING:
+        user_genres = await db.favourite_genres.find_one(
+            {"user_id": user_id}, {"_id": 0, "genres": 1}
+        )
+        favorite_genres = user_genres.get("genres") if user_genres else []
+        genres_cache.set(user_id, favorite_genres)
 
     headers = {
         "Authorization": f"Bearer {token}",
@@ -136,6 +147,8 @@ async def get_base_recommendations_for_user(
 
 @router.get("/{user_id}", response_model=RecommendationResponse)
 async def get_recommendations(
+    request: Request,
+    response: Response,
     user: Annotated[dict, Depends(security_jwt)],
     # user_id: str,
     model: str = Query(None, description="Models: ALS or LightFM"),
@@ -143,45 +156,79 @@ async def get_recommendations(
 ):
     """
     Возвращает рекомендации для пользователя.
+
+    С заголовком settings.STAGE_TIMING_HEADER ответ содержит разбивку
+    времени по этапам построения в заголовке Server-Timing.
     """
     start_time = time()
+    stages = None
+    if settings.STAGE_TIMING_ENABLED and request.headers.get(
+        settings.STAGE_TIMING_HEADER
+    ):
+        stages = collect_stages()
 
     user_id = user["id"]
 
-    model_type = (
-        model if model in ["als", "lightfm"] else random.choice(["als", "lightfm"])
-    )
+    # Без явной модели пользователь закреплён за одной моделью (и одним ключом кэша)
+    if model in MODEL_TYPES:
+        model_type, assignment = model, "explicit"
+    else:
+        model_type = await model_experiment.assign(redis, user_id)
+        assignment = "bucket"
     cache_key = f"recommendations:{user_id}:{model_type}"
 
-    cached = await redis.get(cache_key)
+    async def compute():
+        result = await recommendation_model.get_recommendations(
+            user_id, db, model_type=model_type
+        )
+        # Популярные фильмы, отданные до загрузки моделей, не кэшируются:
+        # после загрузки пользователь сразу получит персональные рекомендации
+        if result["source"] != "popular" or recommendation_model.ready:
+            with stage("cache_write", model_type):
+                await recommendation_cache.set(redis, cache_key, result, *cache_ttls())
+
+        # Сохранение рекомендаций для анализа: в фоне, пачками. Запись нужна
+        # и при фоновом пересчёте: по ней связываются session_id и отзывы
+        with stage("log_write", model_type):
+            await log_writer.write(
+                "recommendation_logs",
+                recommendation_log(
+                    user_id, model_type, result, datetime.now(timezone.utc)
+                ),
+            )
+        logger.info(f"Cached {model_type} recommendations for user {user_id}: {result}")
+        return result
+
+    async def load():
+        cached, _ = await recommendation_cache.get(redis, cache_key)
+        return cached
+
+    # Локальный кэш, затем Redis; устаревшее значение отдаётся сразу,
+    # а пересчитывается в фоне
+    cached, stale = await recommendation_cache.get(redis, cache_key)
+    RECOMMENDATION_CACHE_LOOKUPS.labels(
+        model=model_type, assignment=assignment, result="hit" if cached else "miss"
+    ).inc()
     if cached:
         logger.info(f"Cache hit for user {user_id} with {model_type}: {cached}")
+        if stale:
+            recommendation_cache.refresh(redis, cache_key, compute)
         REQUEST_COUNT.labels(
             method="GET", endpoint="/recommendations", status="200"
         ).inc()
         REQUEST_LATENCY.labels(endpoint="/recommendations").observe(time() - start_time)
-        return json.loads(cached)
-
-    result = await recommendation_model.get_recommendations(
-        user_id, db, model_type=model_type
-    )
-    await redis.setex(cache_key, settings.REDIS_CACHE_EXPIRE, json.dumps(result))
-
-    # Сохранение рекомендаций для анализа
-    await db["recommendation_logs"].insert_one(
-        {
-            "user_id": user_id,
-            "model_type": model_type,
-            "source": result["source"],
-            "recommendations": result["recommendations"],
-            "session_id": result["session_id"],
-            "timestamp": datetime.now(timezone.utc),
-        }
-    )
+        if stages is not None:
+            response.headers["Server-Timing"] = server_timing(
+                stages, time() - start_time
+            )
+        return cached
 
-    logger.info(f"Cached {model_type} recommendations for user {user_id}: {result}")
+    # Одновременные промахи по ключу ждут одно вычисление и одну запись в лог
+    result = await single_flight.do(cache_key, compute, redis=redis, load=load)
     REQUEST_COUNT.labels(method="GET", endpoint="/recommendations", status="200").inc()
     REQUEST_LATENCY.labels(endpoint="/recommendations").observe(time() - start_time)
+    if stages is not None:
+        response.headers["Server-Timing"] = server_timing(stages, time() - start_time)
     return result
 
 
@@ -203,7 +250,7 @@ async def submit_feedback(
         "liked": liked,
         "timestamp": datetime.now(timezone.utc),
     }
-    await db["feedback"].insert_one(feedback_entry)
+    await log_writer.write("feedback", feedback_entry)
     logger.info(
         f"Feedback submitted for session {session_id}, movie {movie_id}, liked: {liked}"
     )
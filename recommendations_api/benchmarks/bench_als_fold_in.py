@@ -0,0 +1,138 @@
+"""
+Бенчмарк дообучения ALS: полный fit по накопленной матрице (прежний
+partial_train) против fold-in только затронутых строк (ml/incremental.py).
+
+История фиксирована, размер приращения меняется: время fold-in должно расти
+с приращением, а полного обучения — оставаться временем обучения всей истории.
+Для качества сравнивается доля совпадений top-10 затронутых пользователей
+с результатом полного обучения: у модели до дообучения и после fold-in.
+
+Запуск: python -m benchmarks.bench_als_fold_in --users 100000 --deltas 100 1000 10000
+"""
+
+import argparse
+import json
+from time import perf_counter
+
+import implicit
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from ml.incremental import fold_in_als
+from ml.ranking import top_k_indices
+
+
+def random_interactions(
+    users: np.ndarray, n_users: int, n_items: int, rng: np.random.Generator
+) -> csr_matrix:
+    """Взаимодействия пользователей users (по строке на каждое) с фильмами"""
+    # Популярность фильмов по степенному закону, как в реальных данных
+    popularity = rng.permutation(1.0 / np.arange(1, n_items + 1) ** 0.8)
+    nnz = len(users)
+    items = rng.choice(n_items, nnz, p=popularity / popularity.sum())
+    data = rng.choice([0.3, 0.5, 1.0], nnz).astype(np.float32)
+    return csr_matrix((data, (users, items)), shape=(n_users, n_items))
+
+
+def make_model(factors: int, iterations: int):
+    return implicit.als.AlternatingLeastSquares(
+        factors=factors, iterations=iterations, random_state=0
+    )
+
+
+def top_k_overlap(model_a, model_b, users: np.ndarray, k: int = 10) -> float:
+    overlap = []
+    for user in users:
+        top_a = top_k_indices(model_a.item_factors @ model_a.user_factors[user], k)
+        top_b = top_k_indices(model_b.item_factors @ model_b.user_factors[user], k)
+        overlap.append(len(np.intersect1d(top_a, top_b)) / k)
+    return float(np.mean(overlap))
+
+
+def bench(
+    n_users: int,
+    n_items: int,
+    per_user: int,
+    delta_users: int,
+    factors: int,
+    iterations: int,
+) -> dict:
+    rng = np.random.default_rng(42)
+    history = random_interactions(
+        np.repeat(np.arange(n_users), per_user), n_users, n_items, rng
+    )
+    base = make_model(factors, iterations)
+    base.fit(history, show_progress=False)
+
+    # Приращение: существующие пользователи и 10% новых, плюс новые фильмы
+    new_users, new_items = delta_users // 10, max(1, n_items // 1000)
+    users = rng.choice(n_users + new_users, delta_users, replace=False)
+    delta = random_interactions(
+        np.repeat(users, max(1, per_user // 4)),
+        n_users + new_users,
+        n_items + new_items,
+        rng,
+    )
+    history.resize(delta.shape)
+    user_items = (history + delta).tocsr()
+
+    full = make_model(factors, iterations)
+    start = perf_counter()
+    full.fit(user_items, show_progress=False)
+    full_duration = perf_counter() - start
+
+    folded = make_model(factors, iterations)
+    folded.user_factors = base.user_factors.copy()
+    folded.item_factors = base.item_factors.copy()
+    stats = fold_in_als(folded, user_items, delta)
+
+    # Существующие затронутые пользователи: у новых нет «устаревшего» вектора
+    touched = np.flatnonzero(np.diff(delta.indptr))
+    sample = rng.choice(touched[touched < n_users], 200)
+    stale_overlap = top_k_overlap(base, full, sample)
+    return {
+        "users": n_users,
+        "delta_interactions": delta.nnz,
+        "touched_users": stats["users"],
+        "touched_items": stats["items"],
+        "full_fit_s": round(full_duration, 3),
+        "fold_in_s": round(stats["duration"], 3),
+        "speedup": round(full_duration / stats["duration"], 1),
+        "stale_top10_overlap_with_full": round(stale_overlap, 3),
+        "fold_in_top10_overlap_with_full": round(
+            top_k_overlap(folded, full, sample), 3
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--per-user", type=int, default=20)
+    parser.add_argument("--deltas", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--factors", type=int, default=20)
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--output", help="Путь для JSON-отчёта")
+    args = parser.parse_args()
+
+    results = []
+    for delta_users in args.deltas:
+        results.append(
+            bench(
+                args.users,
+                args.items,
+                args.per_user,
+                delta_users,
+                args.factors,
+                args.iterations,
+            )
+        )
+        print(json.dumps(results[-1]))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
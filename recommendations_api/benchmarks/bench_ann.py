@@ -0,0 +1,100 @@
+"""
+Бенчмарк ANN-индекса (IVF) против точного top-K по всему каталогу.
+
+Для нескольких значений nprobe печатает полноту recall@K относительно
+точного поиска и перцентили задержки одного запроса.
+
+Запуск: python -m benchmarks.bench_ann --items 200000 --nprobe 1 4 8 16 32
+"""
+
+import argparse
+import json
+from time import perf_counter
+
+import numpy as np
+
+from ml.ann import IVFIndex
+from ml.ranking import top_k_indices
+
+
+def synthetic_item_factors(n_items: int, factors: int, seed: int = 0) -> np.ndarray:
+    """Факторы с кластерной структурой, как у обученных ALS/LightFM"""
+    rng = np.random.default_rng(seed)
+    clusters = max(1, n_items // 1000)
+    centers = rng.standard_normal((clusters, factors)) * 2
+    labels = rng.integers(0, clusters, n_items)
+    return (centers[labels] + rng.standard_normal((n_items, factors))).astype(
+        np.float32
+    )
+
+
+def latency_ms(timings: list, q: float) -> float:
+    return round(float(np.percentile(timings, q)) * 1000, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=200000)
+    parser.add_argument("--factors", type=int, default=20)
+    parser.add_argument("--nlist", type=int, default=0)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--output", help="Путь для JSON-отчёта")
+    args = parser.parse_args()
+
+    item_vectors = synthetic_item_factors(args.items, args.factors)
+    queries = (
+        np.random.default_rng(1)
+        .standard_normal((args.queries, args.factors))
+        .astype(np.float32)
+    )
+
+    start = perf_counter()
+    index = IVFIndex.build(item_vectors, nlist=args.nlist or None)
+    build_seconds = perf_counter() - start
+
+    exact, exact_timings = [], []
+    for query in queries:
+        start = perf_counter()
+        exact.append(set(top_k_indices(item_vectors @ query, args.k)))
+        exact_timings.append(perf_counter() - start)
+
+    results = [
+        {
+            "method": "exact",
+            "items": args.items,
+            "recall": 1.0,
+            "p50_ms": latency_ms(exact_timings, 50),
+            "p99_ms": latency_ms(exact_timings, 99),
+        }
+    ]
+    for nprobe in args.nprobe:
+        hits, timings = 0, []
+        for query, expected in zip(queries, exact):
+            start = perf_counter()
+            items, _ = index.search(query, args.k, nprobe=nprobe)
+            timings.append(perf_counter() - start)
+            hits += len(expected & set(items))
+        results.append(
+            {
+                "method": "ivf",
+                "items": args.items,
+                "nlist": index.nlist,
+                "nprobe": nprobe,
+                "build_seconds": round(build_seconds, 2),
+                "recall": round(hits / (args.k * len(queries)), 4),
+                "p50_ms": latency_ms(timings, 50),
+                "p99_ms": latency_ms(timings, 99),
+            }
+        )
+
+    for result in results:
+        print(json.dumps(result))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Бенчмарк загрузки моделей: прежний pickle со словарями id против артефакта
+из .npy-файлов, открываемых через mmap (ml/artifacts.py).
+
+Сравнивается время загрузки и прирост RSS процесса (чтение с диска,
+без MinIO) при разном числе пользователей.
+
+Запуск: python -m benchmarks.bench_artifacts --users 100000 1000000
+"""
+
+import argparse
+import json
+import os
+import pickle
+import resource
+import tempfile
+import uuid
+from time import perf_counter
+
+import numpy as np
+
+from ml.artifacts import read_arrays, read_manifest, write_artifact
+
+
+def rss_mb() -> float:
+    """Текущий RSS процесса (Linux)"""
+    with open("/proc/self/statm") as f:
+        pages = int(f.read().split()[1])
+    return pages * resource.getpagesize() / 2**20
+
+
+def bench(n_users: int, n_items: int, factors: int, workdir: str) -> dict:
+    user_ids = [str(uuid.uuid4()) for _ in range(n_users)]
+    movie_ids = [str(uuid.uuid4()) for _ in range(n_items)]
+    user_factors = np.random.rand(n_users, factors).astype(np.float32)
+    item_factors = np.random.rand(n_items, factors).astype(np.float32)
+
+    # Прежний формат: pickle всего словаря с id-таблицами
+    pickle_path = os.path.join(workdir, f"model_{n_users}.pkl")
+    with open(pickle_path, "wb") as f:
+        pickle.dump(
+            {
+                "user_factors": user_factors,
+                "item_factors": item_factors,
+                "user_ids": user_ids,
+                "movie_ids": movie_ids,
+                "user_to_idx": {uid: idx for idx, uid in enumerate(user_ids)},
+                "movie_to_idx": {mid: idx for idx, mid in enumerate(movie_ids)},
+                "idx_to_movie": dict(enumerate(movie_ids)),
+            },
+            f,
+        )
+
+    artifact_path = os.path.join(workdir, f"artifact_{n_users}")
+    write_artifact(
+        artifact_path,
+        {
+            "user_ids": np.array(user_ids, dtype="S"),
+            "movie_ids": np.array(movie_ids, dtype="S"),
+            "als_user_vectors": user_factors,
+            "als_item_vectors": item_factors,
+        },
+    )
+    del user_ids, movie_ids, user_factors, item_factors
+
+    rss_before = rss_mb()
+    start = perf_counter()
+    with open(pickle_path, "rb") as f:
+        data = pickle.load(f)
+    pickle_seconds = perf_counter() - start
+    pickle_rss = rss_mb() - rss_before
+    del data
+
+    rss_before = rss_mb()
+    start = perf_counter()
+    arrays = read_arrays(artifact_path, read_manifest(artifact_path))
+    mmap_seconds = perf_counter() - start
+    mmap_rss = rss_mb() - rss_before
+    del arrays
+
+    return {
+        "users": n_users,
+        "items": n_items,
+        "pickle_bytes": os.path.getsize(pickle_path),
+        "artifact_bytes": sum(
+            entry.stat().st_size for entry in os.scandir(artifact_path)
+        ),
+        "pickle_load_ms": round(pickle_seconds * 1000, 2),
+        "pickle_rss_mb": round(pickle_rss, 1),
+        "mmap_load_ms": round(mmap_seconds * 1000, 2),
+        "mmap_rss_mb": round(mmap_rss, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--items", type=int, default=50000)
+    parser.add_argument("--factors", type=int, default=20)
+    parser.add_argument("--output", help="Путь для JSON-отчёта")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for n_users in args.users:
+            results.append(bench(n_users, args.items, args.factors, workdir))
+            print(json.dumps(results[-1]))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Бенчмарк таблиц id: прежние list + dict по строкам UUID против IdIndex
+(упакованные 16-байтовые ключи + бинарный поиск, ml/id_index.py).
+
+Сравниваются занимаемая память, время построения и скорость поиска:
+пачкой (как в partial_train и get_user_row) и по одному id (как в запросе).
+
+Запуск: python -m benchmarks.bench_id_index --users 1000000 10000000
+"""
+
+import argparse
+import json
+import sys
+from time import perf_counter
+
+import numpy as np
+
+from ml.id_index import IdIndex, unpack_uuids
+
+
+def random_uuids(n: int, rng: np.random.Generator) -> list:
+    keys = np.frombuffer(rng.bytes(16 * n), dtype="S16")
+    return unpack_uuids(keys).tolist()
+
+
+def dict_bytes(ids: list, id_to_idx: dict) -> int:
+    """Память list + dict вместе со строками, на которые они ссылаются"""
+    return (
+        sys.getsizeof(ids)
+        + sys.getsizeof(id_to_idx)
+        + sum(sys.getsizeof(id_) for id_ in ids)
+    )
+
+
+def throughput(func, queries: list, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = perf_counter()
+        func(queries)
+        best = min(best, perf_counter() - start)
+    return len(queries) / best
+
+
+def bench(n_users: int, n_queries: int, n_single: int) -> dict:
+    rng = np.random.default_rng(42)
+    ids = random_uuids(n_users, rng)
+    # 90% существующих id и 10% неизвестных
+    queries = [ids[i] for i in rng.integers(0, n_users, n_queries)]
+    queries[: n_queries // 10] = random_uuids(n_queries // 10, rng)
+    single = queries[:n_single]
+
+    start = perf_counter()
+    id_to_idx = {id_: idx for idx, id_ in enumerate(ids)}
+    dict_build = perf_counter() - start
+
+    start = perf_counter()
+    index = IdIndex.from_ids(ids)
+    index_build = perf_counter() - start
+    assert index.lookup(queries).tolist() == [id_to_idx.get(q, -1) for q in queries]
+
+    result = {
+        "users": n_users,
+        "dict_bytes_per_id": round(dict_bytes(ids, id_to_idx) / n_users, 1),
+        "id_index_bytes_per_id": round(index.nbytes / n_users, 1),
+        "dict_build_s": round(dict_build, 2),
+        "id_index_build_s": round(index_build, 2),
+        "dict_batch_lookups_per_s": round(
+            throughput(lambda q: [id_to_idx.get(id_, -1) for id_ in q], queries)
+        ),
+        "id_index_batch_lookups_per_s": round(throughput(index.lookup, queries)),
+        "dict_single_lookups_per_s": round(
+            throughput(lambda q: [id_to_idx.get(id_) for id_ in q], single)
+        ),
+        "id_index_single_lookups_per_s": round(
+            throughput(lambda q: [index.get(id_) for id_ in q], single)
+        ),
+    }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, nargs="+", default=[1000000, 10000000])
+    parser.add_argument("--queries", type=int, default=100000)
+    parser.add_argument("--single", type=int, default=10000)
+    parser.add_argument("--output", help="Путь для JSON-отчёта")
+    args = parser.parse_args()
+
+    results = []
+    for n_users in args.users:
+        results.append(bench(n_users, args.queries, args.single))
+        print(json.dumps(results[-1]))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Бенчмарк загрузки взаимодействий: прежний путь (find().to_list(None) по трём
+коллекциям, кортежи (user_id, movie_id, weight) и списки rows/cols/data)
+против потокового колоночного загрузчика (ml/interactions.py).
+
+MongoDB заменена коллекциями в памяти, которые, как и драйвер, создают
+документы только при чтении курсора. Пик памяти меряется через tracemalloc
+(учитывает и массивы numpy), поэтому оба способа сравниваются в одном процессе.
+
+Запуск: python -m benchmarks.bench_interactions --interactions 100000 1000000
+"""
+
+import argparse
+import asyncio
+import json
+import tracemalloc
+from time import perf_counter
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from ml.id_index import IdIndex, unpack_uuids
+from ml.interactions import load_interaction_matrix
+
+
+class Cursor:
+    def __init__(self, columns: dict, projection: dict = None):
+        self.columns = columns
+        self.fields = [
+            name for name in columns if projection is None or projection.get(name)
+        ]
+        self.offset = 0
+
+    def batch_size(self, size: int):
+        return self
+
+    async def to_list(self, length: int = None):
+        size = len(self.columns["user_id"])
+        start = self.offset
+        end = size if length is None else min(size, start + length)
+        self.offset = end
+        values = [self.columns[name][start:end] for name in self.fields]
+        return [dict(zip(self.fields, row)) for row in zip(*values)]
+
+
+class Collection:
+    def __init__(self, columns: dict):
+        self.columns = columns
+
+    async def count_documents(self, query: dict) -> int:
+        return len(self.columns["user_id"])
+
+    def find(self, query: dict = None, projection: dict = None):
+        return Cursor(self.columns, projection)
+
+
+def make_db(n: int, n_users: int, n_movies: int, rng: np.random.Generator) -> dict:
+    user_ids = unpack_uuids(np.frombuffer(rng.bytes(16 * n_users), dtype="S16"))
+    movie_ids = unpack_uuids(np.frombuffer(rng.bytes(16 * n_movies), dtype="S16"))
+
+    def columns(size: int, **extra) -> dict:
+        return {
+            "_id": list(range(size)),
+            "user_id": user_ids[rng.integers(0, n_users, size)].tolist(),
+            "movie_id": movie_ids[rng.integers(0, n_movies, size)].tolist(),
+            "timestamp": ["2024-01-01T00:00:00"] * size,
+            **extra,
+        }
+
+    n_likes, n_bookmarks = n // 4, n // 8
+    n_watched = n - n_likes - n_bookmarks
+    return {
+        "watched_movies": Collection(
+            columns(n_watched, complete=(rng.random(n_watched) < 0.5).tolist())
+        ),
+        "likes": Collection(
+            columns(n_likes, rating=rng.integers(0, 11, n_likes).tolist())
+        ),
+        "bookmarks": Collection(columns(n_bookmarks)),
+    }
+
+
+async def load_with_tuples(db: dict) -> csr_matrix:
+    """Прежний код train(): все документы целиком, затем кортежи и списки"""
+    watched_movies = await db["watched_movies"].find().to_list(None)
+    likes = await db["likes"].find().to_list(None)
+    bookmarks = await db["bookmarks"].find().to_list(None)
+
+    interactions = (
+        [
+            (str(wm["user_id"]), str(wm["movie_id"]), 1.0 if wm["complete"] else 0.5)
+            for wm in watched_movies
+        ]
+        + [
+            (str(like["user_id"]), str(like["movie_id"]), like["rating"] / 10.0)
+            for like in likes
+        ]
+        + [(str(bm["user_id"]), str(bm["movie_id"]), 0.3) for bm in bookmarks]
+    )
+    interaction_users = [uid for uid, _, _ in interactions]
+    interaction_movies = [mid for _, mid, _ in interactions]
+    user_index = IdIndex.from_ids(sorted(set(interaction_users)))
+    movie_index = IdIndex.from_ids(sorted(set(interaction_movies)))
+
+    rows = user_index.lookup(interaction_users)
+    cols = movie_index.lookup(interaction_movies)
+    data = [weight for _, _, weight in interactions]
+    return csr_matrix((data, (rows, cols)), shape=(len(user_index), len(movie_index)))
+
+
+def measure(load) -> tuple:
+    tracemalloc.start()
+    start = perf_counter()
+    matrix = asyncio.run(load())
+    duration = perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return matrix, duration, peak
+
+
+def bench(n: int, n_users: int, n_movies: int, batch_size: int) -> dict:
+    rng = np.random.default_rng(42)
+    db = make_db(n, n_users, n_movies, rng)
+
+    old_matrix, old_duration, old_peak = measure(lambda: load_with_tuples(db))
+    loaded, new_duration, new_peak = measure(
+        lambda: load_interaction_matrix(db, batch_size=batch_size)
+    )
+    assert loaded.matrix.nnz == old_matrix.nnz
+    assert np.isclose(loaded.matrix.sum(), old_matrix.sum())
+
+    matrix_bytes = sum(
+        array.nbytes
+        for array in (loaded.matrix.data, loaded.matrix.indices, loaded.matrix.indptr)
+    )
+    return {
+        "interactions": n,
+        "matrix_mb": round(matrix_bytes / 2**20, 1),
+        "tuples_rows_per_s": round(n / old_duration),
+        "loader_rows_per_s": round(n / new_duration),
+        "tuples_peak_mb": round(old_peak / 2**20, 1),
+        "loader_peak_mb": round(new_peak / 2**20, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--interactions", type=int, nargs="+", default=[100000, 1000000]
+    )
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--movies", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--output", help="Путь для JSON-отчёта")
+    args = parser.parse_args()
+
+    results = []
+    for n in args.interactions:
+        results.append(bench(n, args.users, args.movies, args.batch_size))
+        print(json.dumps(results[-1]))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
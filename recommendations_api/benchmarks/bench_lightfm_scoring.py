@@ -0,0 +1,93 @@
+"""
+Бенчмарк скоринга LightFM на один запрос.
+
+Сравнивает LightFM.predict по всему каталогу с полным argsort (как было
+в get_recommendations) и скоринг по закэшированным представлениям фильмов
+(RecommendationModel.get_factors) с argpartition top-K при разном размере
+каталога и числе признаков фильмов.
+
+Запуск: python -m benchmarks.bench_lightfm_scoring --items 1000 10000 50000
+"""
+
+import argparse
+import json
+from time import perf_counter
+
+import numpy as np
+from lightfm import LightFM
+from scipy.sparse import random as sparse_random
+
+from ml.ranking import top_k_indices
+
+
+def percentile_ms(timings: list, q: float) -> float:
+    return round(float(np.percentile(timings, q)) * 1000, 3)
+
+
+def bench(n_items: int, n_features: int, n_users: int, requests: int, k: int) -> dict:
+    interactions = sparse_random(
+        n_users, n_items, density=0.01, format="coo", random_state=1
+    )
+    item_features = sparse_random(
+        n_items, n_features, density=0.1, format="csr", random_state=2
+    )
+    model = LightFM(no_components=20, loss="warp")
+    model.fit(interactions, item_features=item_features, epochs=1)
+    users = np.random.default_rng(3).integers(0, n_users, requests)
+
+    predict_timings = []
+    for user_idx in users:
+        start = perf_counter()
+        scores = model.predict(
+            int(user_idx), np.arange(n_items), item_features=item_features
+        )
+        expected = np.argsort(-scores)[:k]
+        predict_timings.append(perf_counter() - start)
+
+    start = perf_counter()
+    item_biases, item_vectors = model.get_item_representations(item_features)
+    item_vectors = np.ascontiguousarray(item_vectors, dtype=np.float32)
+    _, user_vectors = model.get_user_representations()
+    cache_build = perf_counter() - start
+
+    cached_timings = []
+    for user_idx in users:
+        start = perf_counter()
+        scores = item_vectors @ user_vectors[user_idx] + item_biases
+        top = top_k_indices(scores, k)
+        cached_timings.append(perf_counter() - start)
+    # Сверяем выдачу последнего пользователя с эталонным predict
+    assert set(top) == set(expected)
+
+    return {
+        "items": n_items,
+        "item_features": n_features,
+        "predict_p50_ms": percentile_ms(predict_timings, 50),
+        "predict_p99_ms": percentile_ms(predict_timings, 99),
+        "cached_p50_ms": percentile_ms(cached_timings, 50),
+        "cached_p99_ms": percentile_ms(cached_timings, 99),
+        "cache_build_ms": round(cache_build * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--features", type=int, default=100)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--output", help="Путь для JSON-отчёта")
+    args = parser.parse_args()
+
+    results = []
+    for n_items in args.items:
+        results.append(bench(n_items, args.features, args.users, args.requests, args.k))
+        print(json.dumps(results[-1]))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Бенчмарк хранения recommendation_logs: документы со строковыми UUID
+(формат documents) против компактного формата time-series коллекции.
+
+Без MongoDB меряется размер BSON-документов и время, которое оценщик
+тратит на клиенте: разбор BSON всех логов и приведение к строковым id
+(прежний find() без проекции против find() с LOG_PROJECTION) и проход
+по сессиям с обратной связью (--feedback-share). С --mongo-url
+логи записываются в две временные коллекции и дополнительно печатаются
+storageSize/totalIndexSize из collStats и время полного чтения курсором.
+
+Запуск: python -m benchmarks.bench_log_storage --logs 100000 [--mongo-url mongodb://localhost:27017]
+"""
+
+import argparse
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+from time import perf_counter
+
+import bson
+import numpy as np
+
+from ml.recommendation_logs import (
+    LOG_PROJECTION,
+    decode_log,
+    encode_id,
+    recommendation_log,
+    timeseries_options,
+)
+
+
+def make_logs(n_logs: int, n_users: int, n_movies: int) -> list:
+    rng = np.random.default_rng(42)
+    users = [str(uuid.uuid4()) for _ in range(n_users)]
+    movies = [str(uuid.uuid4()) for _ in range(n_movies)]
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    logs = []
+    for i in range(n_logs):
+        model_type = "als" if i % 2 else "lightfm"
+        result = {
+            "source": model_type,
+            "recommendations": [movies[j] for j in rng.integers(0, n_movies, 10)],
+            "session_id": str(uuid.uuid4()),
+        }
+        timestamp = start + timedelta(seconds=i * 5)
+        logs.append((users[rng.integers(0, n_users)], model_type, result, timestamp))
+    return logs
+
+
+def project(doc: dict) -> dict:
+    return {key: value for key, value in doc.items() if LOG_PROJECTION.get(key)}
+
+
+def evaluate(docs: list, feedback_sessions: set) -> int:
+    """Проход оценщика: раскодируются только логи сессий с обратной связью"""
+    keys = feedback_sessions | {encode_id(session) for session in feedback_sessions}
+    evaluated = 0
+    for doc in docs:
+        if doc["session_id"] in keys:
+            evaluated += len(set(decode_log(doc)["recommendations"])) > 0
+    return evaluated
+
+
+def offline(layout: str, logs: list, feedback_sessions: set) -> dict:
+    docs = [recommendation_log(*log, layout=layout) for log in logs]
+    for doc in docs:
+        doc["_id"] = bson.ObjectId()
+    # Прежний оценщик читал документы целиком, новый — только нужные поля
+    payload = [
+        bson.encode(doc if layout == "documents" else project(doc)) for doc in docs
+    ]
+    blob = b"".join(payload)
+
+    start = perf_counter()
+    evaluated = evaluate(bson.decode_all(blob), feedback_sessions)
+    scan = perf_counter() - start
+    assert evaluated == len(feedback_sessions)
+
+    stored = sum(len(bson.encode(doc)) for doc in docs)
+    return {
+        "layout": layout,
+        "logs": len(logs),
+        "bson_bytes_per_log": round(stored / len(logs), 1),
+        "bson_mb": round(stored / 2**20, 2),
+        "evaluator_scan_s": round(scan, 3),
+    }
+
+
+def online(layout: str, logs: list, mongo_url: str, database: str) -> dict:
+    import pymongo
+
+    db = pymongo.MongoClient(mongo_url)[database]
+    name = f"bench_logs_{layout}"
+    db.drop_collection(name)
+    if layout == "timeseries":
+        db.create_collection(name, **timeseries_options(0))
+    docs = [recommendation_log(*log, layout=layout) for log in logs]
+    for start in range(0, len(docs), 10000):
+        end = start + 10000
+        db[name].insert_many(docs[start:end], ordered=False)
+
+    start = perf_counter()
+    projection = None if layout == "documents" else LOG_PROJECTION
+    decoded = [decode_log(doc) for doc in db[name].find({}, projection)]
+    scan = perf_counter() - start
+    stats = db.command("collStats", name)
+    db.drop_collection(name)
+    return {
+        "layout": layout,
+        "logs": len(decoded),
+        "storage_mb": round(stats["storageSize"] / 2**20, 2),
+        "index_mb": round(stats["totalIndexSize"] / 2**20, 2),
+        "mongo_scan_s": round(scan, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logs", type=int, default=100000)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--movies", type=int, default=5000)
+    parser.add_argument("--feedback-share", type=float, default=0.1)
+    parser.add_argument("--mongo-url", help="MongoDB для замера collStats")
+    parser.add_argument("--database", default="bench")
+    parser.add_argument("--output", help="Путь для JSON-отчёта")
+    args = parser.parse_args()
+
+    logs = make_logs(args.logs, args.users, args.movies)
+    # Обратная связь есть у feedback_share сессий
+    step = round(1 / args.feedback_share)
+    feedback_sessions = {result["session_id"] for _, _, result, _ in logs[::step]}
+    results = []
+    for layout in ("documents", "timeseries"):
+        results.append(offline(layout, logs, feedback_sessions))
+        print(json.dumps(results[-1]))
+        if args.mongo_url:
+            results.append(online(layout, logs, args.mongo_url, args.database))
+            print(json.dumps(results[-1]))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
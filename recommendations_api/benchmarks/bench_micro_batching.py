@@ -0,0 +1,136 @@
+"""
+Нагрузочный тест скоринга промахов кэша: отдельная задача в пуле на каждый
+запрос (прежний путь) против micro-batching (ml/batching.py).
+
+clients корутин в замкнутом цикле запрашивают top-K для случайных
+пользователей; для каждого режима печатаются пропускная способность
+и перцентили задержки запроса. Параметры пачек задаются --max-wait-ms
+и --max-batch (можно перечислить несколько значений).
+
+Запуск: python -m benchmarks.bench_micro_batching --items 50000 --clients 16 64 256
+"""
+
+import argparse
+import asyncio
+import json
+from time import perf_counter
+
+import numpy as np
+
+from ml.batching import MicroBatcher
+from ml.id_index import IdIndex
+from ml.ranking import top_k_indices
+from ml.scoring import ScoringExecutor
+from ml.snapshot import ModelSnapshot
+
+
+def make_snapshot(n_users: int, n_items: int, factors: int) -> ModelSnapshot:
+    rng = np.random.default_rng(42)
+    return ModelSnapshot.build(
+        "synthetic",
+        IdIndex.from_ids(f"user-{i}" for i in range(n_users)),
+        IdIndex.from_ids(f"movie-{i}" for i in range(n_items)),
+        {
+            "als": (
+                rng.standard_normal((n_users, factors), dtype=np.float32),
+                rng.standard_normal((n_items, factors), dtype=np.float32),
+                None,
+            )
+        },
+        ann_indexes={},
+    )
+
+
+def score_one(snapshot: ModelSnapshot, user_idx: int, exclude: np.ndarray, n: int):
+    """Прежний путь: оценки каталога для одного пользователя"""
+    user_vectors, item_vectors, _ = snapshot.factors["als"]
+    scores = item_vectors @ user_vectors[user_idx]
+    scores[exclude] = -np.inf
+    return top_k_indices(scores, n)
+
+
+async def client(rank, snapshot, deadline: float, latencies: list, seed: int):
+    rng = np.random.default_rng(seed)
+    n_users = len(snapshot.users)
+    n_items = len(snapshot.movies)
+    while perf_counter() < deadline:
+        await asyncio.sleep(0)  # Запросы к MongoDB/Redis перед скорингом
+        user_idx = int(rng.integers(0, n_users))
+        exclude = rng.integers(0, n_items, 20)
+        start = perf_counter()
+        await rank(snapshot, user_idx, exclude, 10)
+        latencies.append(perf_counter() - start)
+
+
+async def run(mode: str, rank, snapshot, clients: int, seconds: float) -> dict:
+    deadline = perf_counter() + seconds
+    latencies = []
+    await asyncio.gather(
+        *(client(rank, snapshot, deadline, latencies, seed) for seed in range(clients))
+    )
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "mode": mode,
+        "clients": clients,
+        "requests_per_s": round(len(latencies) / seconds),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 2),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 2),
+    }
+
+
+async def bench(snapshot, clients: int, args) -> list:
+    scoring = ScoringExecutor(workers=args.workers)
+    results = [
+        await run(
+            "per_request",
+            lambda *a: scoring.run(score_one, *a),
+            snapshot,
+            clients,
+            args.seconds,
+        )
+    ]
+    for max_wait_ms in args.max_wait_ms:
+        for max_batch in args.max_batch:
+            batcher = MicroBatcher(
+                scoring, max_wait_ms=max_wait_ms, max_batch=max_batch
+            )
+            result = await run(
+                f"batched(wait={max_wait_ms}ms, max={max_batch})",
+                lambda snap, user_idx, exclude, n: batcher.score(
+                    snap, "als", user_idx, exclude, n
+                ),
+                snapshot,
+                clients,
+                args.seconds,
+            )
+            results.append(result)
+    scoring.shutdown()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--items", type=int, default=50000)
+    parser.add_argument("--factors", type=int, default=64)
+    parser.add_argument("--clients", type=int, nargs="+", default=[16, 64, 256])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--max-wait-ms", type=float, nargs="+", default=[2.0])
+    parser.add_argument("--max-batch", type=int, nargs="+", default=[64])
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--output", help="Путь для JSON-отчёта")
+    args = parser.parse_args()
+
+    snapshot = make_snapshot(args.users, args.items, args.factors)
+    results = []
+    for clients in args.clients:
+        for result in asyncio.run(bench(snapshot, clients, args)):
+            results.append(result)
+            print(json.dumps(result))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Бенчмарк пакетного предрасчёта рекомендаций.
+
+Сравнивает прежний путь (скоринг каждого пользователя по отдельности
+с полным argsort по каталогу) с блочным precompute_recommendations
+на синтетических факторах и показывает, как пропускная способность
+меняется с ростом числа пользователей.
+
+Запуск: python -m benchmarks.bench_precompute --users 1000 10000 100000
+"""
+
+import argparse
+import asyncio
+import json
+from time import perf_counter
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse import random as sparse_random
+
+from ml.id_index import IdIndex
+from ml.precompute import precompute_recommendations
+from ml.snapshot import ModelSnapshot
+
+
+class NullPipeline:
+    """Pipeline Redis без сети: измеряем только скоринг и сериализацию"""
+
+    def setex(self, *args):
+        pass
+
+    async def execute(self):
+        return []
+
+
+class NullRedis:
+    def pipeline(self, transaction=True):
+        return NullPipeline()
+
+
+class SyntheticCursor:
+    def __init__(self, docs: list):
+        self.docs = docs
+
+    async def to_list(self, length):
+        return self.docs
+
+
+class SyntheticInteractions:
+    """Коллекция взаимодействий без MongoDB: строки синтетической матрицы"""
+
+    def __init__(self, user_items, movie_ids: list):
+        self.user_items = user_items
+        self.movie_ids = movie_ids
+
+    def find(self, query, projection=None):
+        indptr, indices = self.user_items.indptr, self.user_items.indices
+        docs = []
+        for user_id in query["user_id"]["$in"]:
+            row = int(user_id.removeprefix("user-"))
+            start, end = indptr[row], indptr[row + 1]
+            docs.extend(
+                {"user_id": user_id, "movie_id": self.movie_ids[col]}
+                for col in indices[start:end]
+            )
+        return SyntheticCursor(docs)
+
+
+class SyntheticModel:
+    """Минимальная замена RecommendationModel со случайными факторами"""
+
+    def __init__(self, n_users: int, n_items: int, factors: int, density: float):
+        rng = np.random.default_rng(42)
+        self.user_vectors = rng.standard_normal((n_users, factors), dtype=np.float32)
+        self.item_vectors = rng.standard_normal((n_items, factors), dtype=np.float32)
+        self.user_item_matrix = sparse_random(
+            n_users, n_items, density=density, format="csr", random_state=42
+        )
+        self.movie_ids = [f"movie-{i}" for i in range(n_items)]
+        self.snapshot = ModelSnapshot.build(
+            "synthetic",
+            IdIndex.from_ids(f"user-{i}" for i in range(n_users)),
+            IdIndex.from_ids(self.movie_ids),
+            {"als": (self.user_vectors, self.item_vectors, None)},
+            ann_indexes={},
+        )
+
+    def database(self) -> dict:
+        """Просмотры — строки синтетической матрицы, лайков и закладок нет"""
+        empty = SyntheticInteractions(
+            csr_matrix(self.user_item_matrix.shape), self.movie_ids
+        )
+        return {
+            "watched_movies": SyntheticInteractions(
+                self.user_item_matrix, self.movie_ids
+            ),
+            "likes": empty,
+            "bookmarks": empty,
+        }
+
+    async def get_new_movies(self, db, exclude=frozenset(), snapshot=None):
+        return []
+
+
+def per_user_baseline(model: SyntheticModel, n: int, sample: int) -> float:
+    """Старый путь: полный argsort по каталогу для каждого пользователя"""
+    sample = min(sample, model.user_vectors.shape[0])
+    start = perf_counter()
+    for user_idx in range(sample):
+        scores = model.item_vectors @ model.user_vectors[user_idx]
+        seen = model.user_item_matrix[user_idx].indices
+        top_items = np.argsort(-scores)[: n + len(seen)]
+        [model.movie_ids[idx] for idx in top_items if idx not in seen][:n]
+    return sample / (perf_counter() - start)
+
+
+async def run(args) -> list:
+    results = []
+    for n_users in args.users:
+        model = SyntheticModel(n_users, args.items, args.factors, args.density)
+        baseline = per_user_baseline(model, args.k, args.baseline_sample)
+        stats = await precompute_recommendations(
+            model,
+            db=model.database(),
+            redis=NullRedis(),
+            model_type="als",
+            n=args.k,
+            block_size=args.block_size,
+            experiment=None,
+        )
+        results.append(
+            {
+                "users": n_users,
+                "items": args.items,
+                "block_size": args.block_size,
+                "bulk_users_per_second": round(stats["users_per_second"], 1),
+                "per_user_users_per_second": round(baseline, 1),
+                "speedup": round(stats["users_per_second"] / baseline, 1),
+            }
+        )
+        print(json.dumps(results[-1]))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--items", type=int, default=20000)
+    parser.add_argument("--factors", type=int, default=20)
+    parser.add_argument("--density", type=float, default=0.001)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--block-size", type=int, default=1024)
+    parser.add_argument("--baseline-sample", type=int, default=2000)
+    parser.add_argument("--output", help="Путь для JSON-отчёта")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Офлайн-реплей: качество и задержка ALS и LightFM без живой обратной связи.
+
+Взаимодействия делятся по времени: модели обучаются
+RecommendationModel.fit на всём, что было до границы, и оцениваются
+на взаимодействиях после неё (ml/replay.py) — precision/recall/NDCG@K
+по всем пользователям с отложенными фильмами и p50/p95/p99 задержки
+score_user. Сравниваются размерности факторов (--factors) и режимы
+ранжирования (--nprobe: 0 — точный скоринг, иначе ANN-индекс).
+
+С --mongo-url данные берутся из MongoDB (граница — --test-days дней назад),
+иначе генерируются: пользователи с предпочтениями по кластерам фильмов
+и временем взаимодействий, последняя --test-share доля — отложенная.
+
+Запуск: python -m benchmarks.bench_replay --users 20000 --factors 20 64 --nprobe 0 8
+"""
+
+import argparse
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from ml.id_index import IdIndex, unpack_uuids
+from ml.interactions import InteractionMatrix
+from ml.recommendation_model import RecommendationModel
+from ml.replay import heldout, replay, time_split
+
+
+def random_ids(n: int, rng: np.random.Generator) -> IdIndex:
+    return IdIndex.from_ids(
+        unpack_uuids(np.frombuffer(rng.bytes(16 * n), dtype="S16")).tolist()
+    )
+
+
+def synthetic_split(
+    n_users: int, n_items: int, per_user: int, clusters: int, test_share: float
+) -> tuple:
+    """(обучающая InteractionMatrix, матрица релевантности) на сгенерированных данных"""
+    rng = np.random.default_rng(42)
+    rows = np.repeat(np.arange(n_users), per_user)
+    # 80% взаимодействий — фильмы любимого кластера пользователя, остальные — любые
+    item_cluster = rng.integers(0, clusters, n_items)
+    by_cluster = [np.flatnonzero(item_cluster == c) for c in range(clusters)]
+    favourite = rng.integers(0, clusters, n_users)[rows]
+    cols = rng.integers(0, n_items, len(rows))
+    in_cluster = rng.random(len(rows)) < 0.8
+    for c, items in enumerate(by_cluster):
+        # Фильмов в кластере может не оказаться (мало --items на --clusters):
+        # у таких пользователей все взаимодействия остаются случайными
+        if items.size == 0:
+            continue
+        chosen = in_cluster & (favourite == c)
+        cols[chosen] = rng.choice(items, int(chosen.sum()))
+    timestamps = rng.random(len(rows))
+    cutoff = np.quantile(timestamps, 1 - test_share)
+
+    def matrix(mask):
+        data = np.ones(int(mask.sum()), dtype=np.float32)
+        return csr_matrix((data, (rows[mask], cols[mask])), shape=(n_users, n_items))
+
+    train = matrix(timestamps < cutoff)
+    train.sum_duplicates()
+    loaded = InteractionMatrix(
+        matrix=train,
+        users=random_ids(n_users, rng),
+        movies=random_ids(n_items, rng),
+        rows=int((timestamps < cutoff).sum()),
+        duration=0.0,
+    )
+    return loaded, heldout(train, matrix(timestamps >= cutoff))
+
+
+async def mongo_split(mongo_url: str, database: str, test_days: int) -> tuple:
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    db = AsyncIOMotorClient(mongo_url)[database]
+    cutoff = datetime.now(timezone.utc) - timedelta(days=test_days)
+    train, relevant = await time_split(db, cutoff)
+    item_features = await RecommendationModel(load=False).load_item_features(
+        db, train.movies
+    )
+    return train, relevant, item_features
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--per-user", type=int, default=30)
+    parser.add_argument("--clusters", type=int, default=50)
+    parser.add_argument("--test-share", type=float, default=0.2)
+    parser.add_argument("--mongo-url", help="Реплей по данным MongoDB")
+    parser.add_argument("--database", default="cinema")
+    parser.add_argument("--test-days", type=int, default=7)
+    parser.add_argument("--factors", type=int, nargs="+", default=[20])
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[0, 8])
+    parser.add_argument("--nlist", type=int, default=0)
+    parser.add_argument("--k", type=int, nargs="+", default=[3, 10])
+    parser.add_argument("--latency-users", type=int, default=1000)
+    parser.add_argument("--output", help="Путь для JSON-отчёта")
+    args = parser.parse_args()
+
+    item_features = None
+    if args.mongo_url:
+        train, relevant, item_features = asyncio.run(
+            mongo_split(args.mongo_url, args.database, args.test_days)
+        )
+    else:
+        train, relevant = synthetic_split(
+            args.users, args.items, args.per_user, args.clusters, args.test_share
+        )
+    print(
+        json.dumps(
+            {
+                "train_interactions": int(train.matrix.nnz),
+                "heldout_interactions": int(relevant.nnz),
+                "shape": list(train.matrix.shape),
+            }
+        )
+    )
+
+    model = RecommendationModel(load=False)
+    results = []
+    for factors in args.factors:
+        model.als_factors = model.lightfm_components = factors
+        for row in replay(
+            model,
+            train,
+            relevant,
+            sorted(args.k),
+            args.nprobe,
+            item_features,
+            args.nlist,
+            args.latency_users,
+        ):
+            results.append(row)
+            print(json.dumps(row))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Бенчмарк отзывчивости event loop под нагрузкой скоринга.
+
+clients корутин непрерывно запрашивают рекомендации (скоринг каталога
+и top-K), параллельно ещё одна корутина имитирует ответы из кэша: каждые
+несколько миллисекунд «получает» готовый ответ и меряет, через сколько он
+реально обработан. Сравнивается скоринг прямо в event loop (workers=0,
+прежнее поведение) с пулом потоков ScoringExecutor разного размера.
+
+Запуск: python -m benchmarks.bench_scoring_offload --items 200000 --workers 0 1 2 4
+"""
+
+import argparse
+import asyncio
+import json
+from time import perf_counter
+
+import numpy as np
+
+from ml.ranking import top_k_indices
+from ml.scoring import ScoringExecutor
+
+
+def score(user_vector: np.ndarray, item_vectors: np.ndarray, n: int) -> np.ndarray:
+    scores = item_vectors @ user_vector
+    return top_k_indices(scores, n)
+
+
+async def scoring_client(scoring, user_vectors, item_vectors, deadline, done: list):
+    rng = np.random.default_rng(len(done))
+    while perf_counter() < deadline:
+        await asyncio.sleep(0)  # Запросы к MongoDB/Redis перед скорингом
+        user = rng.integers(0, len(user_vectors))
+        await scoring.run(score, user_vectors[user], item_vectors, 10)
+        done.append(1)
+
+
+async def cache_hits(deadline: float, interval: float, latencies: list):
+    """Ответ из кэша готов через interval; задержка сверх него — простой loop"""
+    while perf_counter() < deadline:
+        start = perf_counter()
+        await asyncio.sleep(interval)
+        latencies.append(perf_counter() - start - interval)
+
+
+async def run(workers: int, clients: int, item_vectors, user_vectors, seconds: float):
+    scoring = ScoringExecutor(workers=workers, concurrency=workers)
+    deadline = perf_counter() + seconds
+    done, latencies = [], []
+    await asyncio.gather(
+        cache_hits(deadline, 0.005, latencies),
+        *(
+            scoring_client(scoring, user_vectors, item_vectors, deadline, done)
+            for _ in range(clients)
+        ),
+    )
+    scoring.shutdown()
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "workers": workers,
+        "scoring_per_s": round(len(done) / seconds),
+        "cache_hit_lag_p50_ms": round(float(np.percentile(latencies_ms, 50)), 2),
+        "cache_hit_lag_p99_ms": round(float(np.percentile(latencies_ms, 99)), 2),
+        "cache_hits_served": len(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=200000)
+    parser.add_argument("--factors", type=int, default=64)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 1, 2, 4])
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--output", help="Путь для JSON-отчёта")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    item_vectors = rng.standard_normal((args.items, args.factors), dtype=np.float32)
+    user_vectors = rng.standard_normal((1000, args.factors), dtype=np.float32)
+
+    results = []
+    for workers in args.workers:
+        results.append(
+            asyncio.run(
+                run(workers, args.clients, item_vectors, user_vectors, args.seconds)
+            )
+        )
+        print(json.dumps(results[-1]))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
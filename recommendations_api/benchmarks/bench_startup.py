@@ -0,0 +1,198 @@
+"""
+Бенчмарк старта API рекомендаций: время до первого ответа при загрузке
+моделей в фоне (lazy, main.py) против прежней загрузки при импорте (eager).
+
+Каждый прогон — отдельный процесс на заменителях MongoDB, Redis и MinIO
+(benchmarks/stand_ins.py). В реестр заранее публикуется синтетический
+снимок --users x --items, локальный кэш моделей пуст, поэтому старт
+скачивает и читает артефакт целиком. Отсчёт идёт от импорта main;
+замеряются первый ответ /health, первая выдача рекомендаций (в режиме
+lazy до загрузки — популярные фильмы), первая персональная выдача
+и готовность /ready.
+
+Запуск: python -m benchmarks.bench_startup --users 1000000 --items 20000 --repeat 3
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import subprocess
+import sys
+import tempfile
+import uuid
+from statistics import median
+from time import perf_counter, time
+
+import numpy as np
+
+MODES = ("lazy", "eager")
+STEPS = ("first_response", "first_recommendation", "first_personal", "ready")
+
+
+def publish_snapshot(n_users: int, n_items: int, factors: int) -> str:
+    """Публикует синтетический снимок в заменитель MinIO; возвращает id пользователя"""
+    from benchmarks.stand_ins import InMemoryMinio
+    from ml.id_index import IdIndex
+    from ml.registry import ModelRegistry
+    from ml.snapshot import ModelSnapshot
+
+    rng = np.random.default_rng(0)
+    users = IdIndex.from_ids([str(uuid.uuid4()) for _ in range(n_users)])
+    movies = IdIndex.from_ids([str(uuid.uuid4()) for _ in range(n_items)])
+    snapshot = ModelSnapshot.build(
+        "20240101T000000-bench",
+        users,
+        movies,
+        {
+            "als": (
+                rng.random((n_users, factors), dtype=np.float32),
+                rng.random((n_items, factors), dtype=np.float32),
+                None,
+            ),
+            "lightfm": (
+                rng.random((n_users, factors), dtype=np.float32),
+                rng.random((n_items, factors), dtype=np.float32),
+                rng.random(n_items, dtype=np.float32),
+            ),
+        },
+        ann_indexes={},
+    )
+    cache_dir = tempfile.mkdtemp(prefix="startup-publish-")
+    ModelRegistry(InMemoryMinio(), cache_dir=cache_dir).publish(snapshot)
+    return snapshot.users.ids_at([0])[0]
+
+
+async def probe(port: int, start: float, user_id: str, timeout: float):
+    """Опрашивает запущенный сервис и возвращает моменты первых ответов"""
+    import httpx
+    from jose import jwt
+
+    from core.config import settings
+
+    token = jwt.encode(
+        {"id": user_id, "exp": time() + 3600},
+        settings.secret_key,
+        algorithm=settings.algorithm,
+    )
+    url = f"http://127.0.0.1:{port}"
+    recommendations = f"{url}/api/recommend/v1/recommendations/{user_id}?model=als"
+    timings = {}
+    async with httpx.AsyncClient(timeout=timeout) as client:
+        while len(timings) < len(STEPS):
+            if perf_counter() - start > timeout:
+                raise TimeoutError(f"Service did not become ready: {timings}")
+            try:
+                if "first_response" not in timings:
+                    response = await client.get(f"{url}/health")
+                    if response.status_code == 200:
+                        timings["first_response"] = perf_counter() - start
+                    continue
+                response = await client.get(
+                    recommendations,
+                    headers={
+                        "Authorization": f"Bearer {token}",
+                        "X-Request-Id": uuid.uuid4().hex,
+                    },
+                )
+                now = perf_counter() - start
+                if response.status_code == 200:
+                    timings.setdefault("first_recommendation", now)
+                    if response.json()["source"] != "popular":
+                        timings.setdefault("first_personal", now)
+                if "ready" not in timings:
+                    response = await client.get(f"{url}/ready")
+                    if response.status_code == 200:
+                        timings["ready"] = perf_counter() - start
+            except httpx.TransportError:
+                await asyncio.sleep(0.005)
+    return timings
+
+
+async def run(mode: str, port: int, n_users: int, n_items: int, factors: int):
+    """Один старт сервиса в текущем процессе"""
+    from benchmarks.stand_ins import install_minio, install_mongo, redis_client
+
+    install_minio()
+    install_mongo()
+    import core.redis
+
+    core.redis.async_redis = redis_client(decode_responses=True)
+    user_id = publish_snapshot(n_users, n_items, factors)
+
+    import uvicorn
+
+    start = perf_counter()
+    from main import app
+    from ml.recommendation_model import recommendation_model
+
+    recommendation_model.registry.cache_dir = tempfile.mkdtemp(prefix="startup-")
+    import_seconds = perf_counter() - start
+    if mode == "eager":
+        # Прежнее поведение: модели загружаются до начала приёма запросов
+        recommendation_model.load_models()
+        recommendation_model.ready = True
+
+    config = uvicorn.Config(
+        app, host="127.0.0.1", port=port, log_level="warning", access_log=False
+    )
+    server = uvicorn.Server(config)
+    serving = asyncio.create_task(server.serve())
+    try:
+        timings = await probe(port, start, user_id, timeout=600)
+    finally:
+        server.should_exit = True
+        await serving
+    return {
+        "mode": mode,
+        "users": n_users,
+        "items": n_items,
+        "import_seconds": round(import_seconds, 4),
+        "load_seconds": round(recommendation_model.load_seconds, 4),
+        **{step: round(seconds, 4) for step, seconds in timings.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=200000)
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--factors", type=int, default=64)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8200)
+    parser.add_argument("--output", help="Путь для JSON-отчёта")
+    parser.add_argument("--run", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        # Журнал INFO на каждый запрос искажал бы время ответов
+        logging.disable(logging.INFO)
+        result = asyncio.run(
+            run(args.run, args.port, args.users, args.items, args.factors)
+        )
+        print(json.dumps(result))
+        return
+
+    # Каждый старт — в новом процессе: импорт и загрузка идут с нуля
+    results = []
+    for mode in args.modes:
+        runs = []
+        for _ in range(args.repeat):
+            command = [sys.executable, "-m", "benchmarks.bench_startup", "--run", mode]
+            command += ["--port", str(args.port), "--users", str(args.users)]
+            command += ["--items", str(args.items), "--factors", str(args.factors)]
+            output = subprocess.run(command, check=True, capture_output=True, text=True)
+            runs.append(json.loads(output.stdout.strip().splitlines()[-1]))
+        summary = {"mode": mode, "users": args.users, "items": args.items}
+        for key in ("import_seconds", "load_seconds") + STEPS:
+            summary[key] = round(median(run[key] for run in runs), 4)
+        results.append(summary)
+        print(json.dumps(summary))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Моделирование доли попаданий в кэш рекомендаций при выборе модели
+случайно (прежнее поведение) и по бакету пользователя (core/experiments.py).
+
+requests запросов без параметра model от users пользователей (частота —
+по степенному закону, как у возвращающихся пользователей); кэш хранит
+ключ recommendations:{user_id}:{model} до конца прогона. Печатаются доля
+попаданий и число ключей в кэше.
+
+Запуск: python -m benchmarks.bench_sticky_assignment --users 100000 --requests 1000000
+"""
+
+import argparse
+import json
+import random
+
+import numpy as np
+
+from core.experiments import choose_model, user_bucket
+
+
+def simulate(mode: str, user_ids: np.ndarray, split: dict, seed: int) -> dict:
+    rng = random.Random(seed)
+    models = list(split)
+    assigned = {}
+    cache = set()
+    hits = 0
+    for user_id in user_ids:
+        if mode == "random":
+            model_type = rng.choice(models)
+        else:
+            model_type = assigned.get(user_id)
+            if model_type is None:
+                model_type = assigned[user_id] = choose_model(
+                    split, user_bucket(str(user_id), "bench")
+                )
+        key = (user_id, model_type)
+        if key in cache:
+            hits += 1
+        else:
+            cache.add(key)
+    return {
+        "mode": mode,
+        "requests": len(user_ids),
+        "hit_rate": round(hits / len(user_ids), 4),
+        "cache_keys": len(cache),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--requests", type=int, default=1000000)
+    parser.add_argument("--output", help="Путь для JSON-отчёта")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    # Активность пользователей по степенному закону
+    weights = 1 / np.arange(1, args.users + 1) ** 0.8
+    user_ids = rng.choice(args.users, args.requests, p=weights / weights.sum())
+
+    split = {"als": 50, "lightfm": 50}
+    results = [simulate(mode, user_ids, split, 42) for mode in ("random", "sticky")]
+    for result in results:
+        print(json.dumps(result))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
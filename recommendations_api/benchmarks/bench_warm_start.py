@@ -0,0 +1,150 @@
+"""
+Бенчмарк полного переобучения ALS: с нуля против тёплого старта с факторов
+предыдущей версии (ml/incremental.warm_start_als), оба — с остановом по плато
+функции потерь (ml/convergence.fit_als_until_plateau).
+
+Предыдущая версия обучается на истории, новая — на истории с приращением
+(новые взаимодействия, пользователи и фильмы). Таблицы id новой версии
+перемешаны, поэтому факторы переносятся по id через IdIndex.map_to.
+
+Запуск: python -m benchmarks.bench_warm_start --users 100000 --deltas 0.01 0.1
+"""
+
+import argparse
+import json
+from time import perf_counter
+
+import implicit
+import numpy as np
+
+from benchmarks.bench_als_fold_in import random_interactions
+from ml.convergence import fit_als_until_plateau
+from ml.id_index import IdIndex, unpack_uuids
+from ml.incremental import warm_start_als
+
+
+def make_model(factors: int, max_iterations: int):
+    return implicit.als.AlternatingLeastSquares(
+        factors=factors, iterations=max_iterations, random_state=0
+    )
+
+
+def retrain(model, user_items, tolerance: float, patience: int) -> dict:
+    start = perf_counter()
+    durations, loss, _ = fit_als_until_plateau(model, user_items, tolerance, patience)
+    return {
+        "iterations": len(durations),
+        "seconds": perf_counter() - start,
+        "loss": loss,
+    }
+
+
+def bench(
+    n_users: int,
+    n_items: int,
+    per_user: int,
+    delta_share: float,
+    factors: int,
+    max_iterations: int,
+    tolerance: float,
+    patience: int,
+) -> dict:
+    rng = np.random.default_rng(42)
+    new_users, new_items = int(n_users * delta_share), max(1, n_items // 100)
+    user_ids = unpack_uuids(
+        np.frombuffer(rng.bytes(16 * (n_users + new_users)), dtype="S16")
+    ).tolist()
+    movie_ids = unpack_uuids(
+        np.frombuffer(rng.bytes(16 * (n_items + new_items)), dtype="S16")
+    ).tolist()
+
+    history = random_interactions(
+        np.repeat(np.arange(n_users), per_user), n_users, n_items, rng
+    )
+    previous = make_model(factors, max_iterations)
+    previous.iterations = 15  # Предыдущая версия обучена до сходимости
+    previous.fit(history, show_progress=False)
+
+    touched = rng.choice(
+        n_users + new_users, int((n_users + new_users) * delta_share), replace=False
+    )
+    delta = random_interactions(
+        np.repeat(touched, max(1, per_user // 4)),
+        n_users + new_users,
+        n_items + new_items,
+        rng,
+    )
+    history.resize(delta.shape)
+    user_items = (history + delta).tocsr()
+
+    # Новая версия: те же id в другом порядке строк и столбцов
+    user_order = rng.permutation(n_users + new_users)
+    movie_order = rng.permutation(n_items + new_items)
+    user_items = user_items[user_order][:, movie_order].tocsr()
+    users = IdIndex.from_ids([user_ids[i] for i in user_order])
+    movies = IdIndex.from_ids([movie_ids[i] for i in movie_order])
+    previous_users = IdIndex.from_ids(user_ids[:n_users])
+    previous_movies = IdIndex.from_ids(movie_ids[:n_items])
+
+    cold = retrain(make_model(factors, max_iterations), user_items, tolerance, patience)
+
+    warm_model = make_model(factors, max_iterations)
+    start = perf_counter()
+    warm_start_als(
+        warm_model,
+        previous.user_factors,
+        previous.item_factors,
+        users.map_to(previous_users),
+        movies.map_to(previous_movies),
+    )
+    align_seconds = perf_counter() - start
+    warm = retrain(warm_model, user_items, tolerance, patience)
+
+    return {
+        "users": n_users,
+        "delta_share": delta_share,
+        "cold_iterations": cold["iterations"],
+        "warm_iterations": warm["iterations"],
+        "cold_s": round(cold["seconds"], 2),
+        "warm_s": round(warm["seconds"] + align_seconds, 2),
+        "align_s": round(align_seconds, 3),
+        "cold_loss": round(cold["loss"], 5),
+        "warm_loss": round(warm["loss"], 5),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--per-user", type=int, default=20)
+    parser.add_argument("--deltas", type=float, nargs="+", default=[0.01, 0.1])
+    parser.add_argument("--factors", type=int, default=20)
+    parser.add_argument("--max-iterations", type=int, default=30)
+    parser.add_argument("--tolerance", type=float, default=0.001)
+    parser.add_argument("--patience", type=int, default=2)
+    parser.add_argument("--output", help="Путь для JSON-отчёта")
+    args = parser.parse_args()
+
+    results = []
+    for delta_share in args.deltas:
+        results.append(
+            bench(
+                args.users,
+                args.items,
+                args.per_user,
+                delta_share,
+                args.factors,
+                args.max_iterations,
+                args.tolerance,
+                args.patience,
+            )
+        )
+        print(json.dumps(results[-1]))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,406 @@
+"""
+Нагрузочный тест API рекомендаций и UGC со смешанным трафиком.
+
+Харнесс запускает recommendations_api/main.py и
+ugc_service/mongo_app/app/main.py в отдельных процессах (uvicorn,
+один процесс на сервис) с локальными заменителями MongoDB, Redis, MinIO
+и поиска movie_api (benchmarks/stand_ins.py). Сервис рекомендаций
+заполняет базу датасетом scripts/generate_dataset.py (--scale, --seed)
+и обучает модели до старта, поэтому чтения рекомендаций проходят
+через настоящий скоринг и кэш. --recommend-url и --ugc-url направляют
+нагрузку на уже запущенные сервисы вместо локальных.
+
+Виртуальные пользователи (--concurrency, замкнутый цикл без пауз,
+кроме --think-ms) берут пользователей датасета со степенным
+распределением активности, подписывают им JWT и выполняют операции
+в пропорциях --mix: чтение рекомендаций, genres_top, обратная связь
+по полученной сессии, лайки, закладки и отметки о просмотре.
+Отчёт — пропускная способность, p50/p95/p99 и доля ошибок по маршрутам.
+
+Несколько значений --concurrency — режим насыщения: уровни
+прогоняются по очереди, а колено кривой задержки — уровень
+с максимальной «мощностью» (пропускная способность / p95): дальше рост
+параллелизма добавляет задержку быстрее, чем пропускную способность.
+
+Нагрузку и сервисы нужно запускать на разных ядрах/машинах, иначе
+генератор конкурирует с ними за CPU.
+
+Запуск: python -m benchmarks.load_test --scale 0.05 --concurrency 1 4 16 64 --duration 30
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import uuid
+from collections import defaultdict, deque
+from datetime import datetime, timezone
+from time import perf_counter, time
+
+import numpy as np
+
+RECOMMEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+UGC_APP_DIR = os.path.join(
+    os.path.dirname(RECOMMEND_DIR), "ugc_service", "mongo_app", "app"
+)
+RECOMMEND_PREFIX = "/api/recommend/v1/recommendations"
+UGC_PREFIX = "/api/ugc_service/v1"
+
+# Маршрут -> (сервис, доля в трафике по умолчанию)
+ROUTES = {
+    "recommendations": ("recommend", 40),
+    "genres_top": ("recommend", 10),
+    "feedback": ("recommend", 10),
+    "likes": ("ugc", 15),
+    "bookmarks": ("ugc", 10),
+    "watched": ("ugc", 15),
+}
+HEALTH = {"recommend": "/health", "ugc": "/healthcheck"}
+INTERACTIONS = ("watched_movies", "likes", "bookmarks")
+
+
+async def serve_app(app, port: int):
+    import uvicorn
+
+    config = uvicorn.Config(
+        app, host="127.0.0.1", port=port, log_level="warning", access_log=False
+    )
+    await uvicorn.Server(config).serve()
+
+
+async def serve_recommend(port: int, movies_port: int, scale: float, seed: int):
+    """API рекомендаций на заменителях с данными и обученными моделями"""
+    from benchmarks.stand_ins import (
+        install_minio,
+        install_mongo,
+        movie_search_app,
+        populate,
+        redis_client,
+    )
+
+    install_minio()
+    install_mongo()
+    import core.redis
+    from core.config import db, settings
+    from scripts.generate_dataset import Dataset, DatasetSpec
+
+    core.redis.async_redis = redis_client(decode_responses=True)
+    await populate(
+        db,
+        Dataset(DatasetSpec(scale=scale, seed=seed)),
+        ("movies", "favourite_genres") + INTERACTIONS,
+    )
+    settings.url_movies_search = f"http://127.0.0.1:{movies_port}/api/v1/films/"
+
+    from ml.recommendation_model import recommendation_model
+
+    recommendation_model.registry.cache_dir = tempfile.mkdtemp(prefix="load-models-")
+    await recommendation_model.train(db)
+
+    from main import app
+
+    await asyncio.gather(
+        serve_app(app, port), serve_app(movie_search_app(db), movies_port)
+    )
+
+
+async def serve_ugc(port: int):
+    """API UGC на заменителе MongoDB"""
+    from benchmarks.stand_ins import install_mongo
+
+    install_mongo()
+    # Пакеты core, api и main сервиса UGC совпадают по именам с пакетами
+    # сервиса рекомендаций: каталог UGC должен быть единственным источником
+    sys.path[:] = [UGC_APP_DIR] + [
+        path for path in sys.path if os.path.abspath(path or ".") != RECOMMEND_DIR
+    ]
+    from main import app
+
+    await serve_app(app, port)
+
+
+def start_service(name: str, args) -> subprocess.Popen:
+    command = [sys.executable, "-m", "benchmarks.load_test", "--serve", name]
+    command += ["--port", str(args.port), "--scale", str(args.scale)]
+    command += ["--seed", str(args.seed)]
+    return subprocess.Popen(command, cwd=RECOMMEND_DIR)
+
+
+async def wait_ready(urls: dict, timeout: float):
+    import httpx
+
+    deadline = time() + timeout
+    async with httpx.AsyncClient() as client:
+        for service, url in urls.items():
+            while True:
+                try:
+                    response = await client.get(
+                        url + HEALTH[service], headers={"X-Request-Id": "load-test"}
+                    )
+                    if response.status_code == 200:
+                        break
+                except httpx.HTTPError:
+                    pass
+                if time() > deadline:
+                    raise TimeoutError(f"{service} is not ready at {url}")
+                await asyncio.sleep(0.5)
+
+
+def parse_mix(items: list) -> dict:
+    """["likes=20", ...] -> {маршрут: доля}; неуказанные маршруты — по умолчанию"""
+    mix = {route: weight for route, (_, weight) in ROUTES.items()}
+    for item in items or ():
+        route, _, weight = item.partition("=")
+        if route not in ROUTES:
+            raise ValueError(f"Unknown route {route}")
+        mix[route] = float(weight)
+    return mix
+
+
+class Traffic:
+    """Операции виртуальных пользователей над API рекомендаций и UGC"""
+
+    def __init__(self, urls: dict, mix: dict, scale: float, seed: int, users: int):
+        from jose import jwt
+
+        from core.config import settings
+        from scripts.generate_dataset import Dataset, DatasetSpec
+
+        self.urls = urls
+        routes = [route for route in mix if ROUTES[route][0] in urls and mix[route]]
+        weights = np.array([mix[route] for route in routes], dtype=float)
+        self.routes = routes
+        self.weights = weights / weights.sum()
+
+        dataset = Dataset(DatasetSpec(scale=scale, seed=seed))
+        rng = np.random.default_rng(seed)
+        self.user_ids = dataset.user_ids(dataset.active_users(rng, users))
+        self.movie_ids = dataset.movie_ids(np.arange(dataset.n_movies))
+        expires = time() + 24 * 3600
+        self.tokens = {
+            user_id: jwt.encode(
+                {"id": user_id, "exp": expires},
+                settings.secret_key,
+                algorithm=settings.algorithm,
+            )
+            for user_id in set(self.user_ids)
+        }
+        # Сессии полученных рекомендаций: обратная связь ссылается на них
+        self.sessions = deque(maxlen=10000)
+
+    def headers(self, user_id: str) -> dict:
+        return {
+            "Authorization": f"Bearer {self.tokens[user_id]}",
+            "X-Request-Id": uuid.uuid4().hex,
+        }
+
+    def pick(self, rng: np.random.Generator) -> str:
+        route = self.routes[rng.choice(len(self.routes), p=self.weights)]
+        if route == "feedback" and not self.sessions:
+            return "recommendations"
+        return route
+
+    async def call(self, client, route: str, rng: np.random.Generator) -> int:
+        """Выполняет операцию маршрута route; возвращает код ответа"""
+        user_id = self.user_ids[rng.integers(len(self.user_ids))]
+        movie_id = self.movie_ids[rng.integers(len(self.movie_ids))]
+        recommend, ugc = self.urls.get("recommend"), self.urls.get("ugc")
+
+        if route == "recommendations":
+            response = await client.get(
+                f"{recommend}{RECOMMEND_PREFIX}/{user_id}",
+                headers=self.headers(user_id),
+            )
+            if response.status_code == 200:
+                body = response.json()
+                if body.get("session_id") and body.get("recommendations"):
+                    self.sessions.append(
+                        (user_id, body["session_id"], body["recommendations"])
+                    )
+        elif route == "genres_top":
+            response = await client.get(
+                f"{recommend}{RECOMMEND_PREFIX}/genres_top/{user_id}",
+                headers=self.headers(user_id),
+            )
+        elif route == "feedback":
+            user_id, session_id, movies = self.sessions[
+                rng.integers(len(self.sessions))
+            ]
+            response = await client.post(
+                f"{recommend}{RECOMMEND_PREFIX}/feedback/{session_id}",
+                params={
+                    "movie_id": movies[rng.integers(len(movies))],
+                    "liked": bool(rng.random() < 0.6),
+                },
+                headers=self.headers(user_id),
+            )
+        elif route == "likes":
+            response = await client.post(
+                f"{ugc}{UGC_PREFIX}/likes/",
+                json={"movie_id": movie_id, "rating": int(rng.integers(1, 11))},
+                headers=self.headers(user_id),
+            )
+        elif route == "bookmarks":
+            response = await client.post(
+                f"{ugc}{UGC_PREFIX}/bookmarks/",
+                json={"user_id": user_id, "movie_id": movie_id},
+                headers=self.headers(user_id),
+            )
+        else:
+            response = await client.post(
+                f"{ugc}{UGC_PREFIX}/movies/movie_timestamp/",
+                json={
+                    "user_id": user_id,
+                    "movie_id": movie_id,
+                    "watched_at": datetime.now(timezone.utc).isoformat(),
+                    "complete": bool(rng.random() < 0.7),
+                },
+                headers=self.headers(user_id),
+            )
+        return response.status_code
+
+
+def summarize(samples: dict, elapsed: float) -> dict:
+    """{маршрут: [(задержка, ошибка)]} -> показатели по маршрутам и в сумме"""
+    samples = dict(samples)
+    samples["total"] = [sample for rows in samples.values() for sample in rows]
+    report = {}
+    for route, rows in samples.items():
+        if not rows:
+            continue
+        latencies = np.array([latency for latency, _ in rows]) * 1000
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        report[route] = {
+            "requests": len(rows),
+            "throughput_rps": round(len(rows) / elapsed, 1),
+            "error_rate": round(sum(error for _, error in rows) / len(rows), 4),
+            "p50_ms": round(float(p50), 2),
+            "p95_ms": round(float(p95), 2),
+            "p99_ms": round(float(p99), 2),
+        }
+    return report
+
+
+async def run_level(
+    traffic: Traffic,
+    concurrency: int,
+    duration: float,
+    warmup: float,
+    think: float,
+    seed: int,
+) -> dict:
+    """Замкнутый цикл concurrency пользователей; первые warmup секунд не учитываются"""
+    import httpx
+
+    samples = defaultdict(list)
+    start = perf_counter()
+    measure_from, deadline = start + warmup, start + warmup + duration
+
+    async def virtual_user(client, index: int):
+        rng = np.random.default_rng([seed, concurrency, index])
+        while perf_counter() < deadline:
+            route = traffic.pick(rng)
+            began = perf_counter()
+            try:
+                error = await traffic.call(client, route, rng) >= 400
+            except httpx.HTTPError:
+                error = True
+            if began >= measure_from:
+                samples[route].append((perf_counter() - began, error))
+            if think:
+                await asyncio.sleep(think)
+
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        await asyncio.gather(*(virtual_user(client, i) for i in range(concurrency)))
+    return summarize(samples, perf_counter() - measure_from)
+
+
+def knee(levels: list) -> dict:
+    """Уровень с максимальной мощностью: пропускная способность / p95"""
+    return max(
+        levels,
+        key=lambda level: level["total"]["throughput_rps"] / level["total"]["p95_ms"],
+    )
+
+
+async def drive(args, urls: dict) -> dict:
+    await wait_ready(urls, args.startup_timeout)
+    traffic = Traffic(urls, parse_mix(args.mix), args.scale, args.seed, args.users)
+    levels = []
+    for concurrency in args.concurrency:
+        report = await run_level(
+            traffic,
+            concurrency,
+            args.duration,
+            args.warmup,
+            args.think_ms / 1000,
+            args.seed,
+        )
+        levels.append({"concurrency": concurrency, **report})
+        print(json.dumps(levels[-1]))
+    result = {"levels": levels}
+    if len(levels) > 1:
+        best = knee(levels)
+        result["knee"] = {"concurrency": best["concurrency"], **best["total"]}
+        print(json.dumps({"knee": result["knee"]}))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--services", nargs="+", default=["recommend", "ugc"])
+    parser.add_argument("--recommend-url", help="Уже запущенный API рекомендаций")
+    parser.add_argument("--ugc-url", help="Уже запущенный API UGC")
+    parser.add_argument("--scale", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--mix", nargs="+", help="Доли маршрутов: likes=20 ...")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[16])
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--warmup", type=float, default=5.0)
+    parser.add_argument("--think-ms", type=float, default=0.0)
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--startup-timeout", type=float, default=600.0)
+    parser.add_argument("--output", help="Путь для JSON-отчёта")
+    parser.add_argument("--serve", choices=["recommend", "ugc"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # Журнал INFO на каждый запрос искажал бы задержки
+    logging.disable(logging.INFO)
+    # Порты: API рекомендаций, UGC, заменитель movie_api
+    ports = {"recommend": args.port, "ugc": args.port + 1, "movies": args.port + 2}
+    if args.serve == "recommend":
+        asyncio.run(
+            serve_recommend(ports["recommend"], ports["movies"], args.scale, args.seed)
+        )
+        return
+    if args.serve == "ugc":
+        asyncio.run(serve_ugc(ports["ugc"]))
+        return
+
+    external = {"recommend": args.recommend_url, "ugc": args.ugc_url}
+    urls, processes = {}, []
+    for service in args.services:
+        if external[service]:
+            urls[service] = external[service].rstrip("/")
+            continue
+        processes.append(start_service(service, args))
+        urls[service] = f"http://127.0.0.1:{ports[service]}"
+    try:
+        result = asyncio.run(drive(args, urls))
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait(30)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
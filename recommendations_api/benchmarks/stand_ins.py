@@ -0,0 +1,116 @@
+"""
+Локальные заменители MongoDB, Redis, MinIO и movie_api для бенчмарков
+(benchmarks/suite.py, benchmarks/load_test.py).
+
+MongoDB — mongomock-motor, Redis — fakeredis, MinIO — словарь объектов
+в памяти, поиск фильмов movie_api — приложение Starlette поверх
+коллекции movies. Зависимости заменителей: benchmarks/requirements.txt.
+install_minio() и install_mongo() нужно вызвать до импорта модулей
+сервиса: клиенты MinIO и MongoDB создаются при импорте.
+"""
+
+import io
+import shutil
+
+import minio
+from minio.error import S3Error
+
+
+class StoredObject(io.BytesIO):
+    def release_conn(self):
+        pass
+
+
+class InMemoryMinio:
+    """Подмножество API minio.Minio, которое использует реестр моделей"""
+
+    objects = {}  # (bucket, key) -> bytes, общее для всех клиентов
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def bucket_exists(self, bucket: str) -> bool:
+        return True
+
+    def make_bucket(self, bucket: str):
+        pass
+
+    def missing(self, bucket: str, key: str) -> S3Error:
+        return S3Error(
+            "NoSuchKey", "Object does not exist", key, None, None, None, bucket, key
+        )
+
+    def put_object(self, bucket: str, key: str, data, length: int, **kwargs):
+        self.objects[(bucket, key)] = data.read(length)
+
+    def fput_object(self, bucket: str, key: str, file_path: str, **kwargs):
+        with open(file_path, "rb") as f:
+            self.objects[(bucket, key)] = f.read()
+
+    def get_object(self, bucket: str, key: str, **kwargs) -> StoredObject:
+        if (bucket, key) not in self.objects:
+            raise self.missing(bucket, key)
+        return StoredObject(self.objects[(bucket, key)])
+
+    def fget_object(self, bucket: str, key: str, file_path: str, **kwargs):
+        with self.get_object(bucket, key) as source, open(file_path, "wb") as f:
+            shutil.copyfileobj(source, f)
+
+
+def install_minio():
+    minio.Minio = InMemoryMinio
+
+
+def install_mongo():
+    """Подменяет AsyncIOMotorClient: core.config создаёт клиент при импорте"""
+    import motor.motor_asyncio
+    from mongomock_motor import AsyncMongoMockClient
+
+    motor.motor_asyncio.AsyncIOMotorClient = AsyncMongoMockClient
+
+
+def mongo_database(name: str = "bench"):
+    from mongomock_motor import AsyncMongoMockClient
+
+    return AsyncMongoMockClient()[name]
+
+
+def redis_client(**kwargs):
+    import fakeredis
+
+    return fakeredis.FakeAsyncRedis(**kwargs)
+
+
+async def populate(db, dataset, collections):
+    """Записывает коллекции сгенерированного датасета (scripts/generate_dataset.py)"""
+    for collection in collections:
+        for index in range(dataset.spec.chunks(collection)):
+            for name, documents in dataset.chunk(collection, index).items():
+                await db[name].insert_many(documents)
+
+
+def movie_search_app(db):
+    """
+    Заменитель поиска фильмов movie_api (settings.url_movies_search):
+    фильмы жанра genre по убыванию рейтинга, page_size на страницу.
+    """
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse
+    from starlette.routing import Route
+
+    async def search(request):
+        genre = request.query_params.get("genre")
+        page_size = int(request.query_params.get("page_size", 50))
+        page_number = int(request.query_params.get("page_number", 1))
+        movies = (
+            await db.movies.find({"genres": genre} if genre else {})
+            .sort("rating", -1)
+            .skip((page_number - 1) * page_size)
+            .limit(page_size)
+            .to_list(None)
+        )
+        return JSONResponse(
+            [{"uuid": movie["_id"], "imdb_rating": movie["rating"]} for movie in movies]
+        )
+
+    return Starlette(routes=[Route("/api/v1/films/", search)])
@@ -0,0 +1,304 @@
+"""
+Набор микробенчмарков горячих путей сервиса рекомендаций.
+
+Замеряются RecommendationModel.train и partial_train, get_user_row,
+скоринг ALS и LightFM (score_user), сохранение и загрузка версии
+(save_models/load_models через реестр) и ответ эндпоинта из кэша
+(локальный уровень и Redis). Данные — scripts/generate_dataset.py
+для каждого масштаба --scales, MongoDB, Redis и MinIO — локальные
+заменители (benchmarks/stand_ins.py), поэтому абсолютные времена
+операций с базой отражают заменитель, а сравнивать имеет смысл
+результаты одного набора между коммитами.
+
+Каждый случай выполняется --repeat раз после подготовки, которая
+в замер не входит; время делится на число операций в случае.
+Результаты пишутся в --results-dir/<commit>.json; --compare сравнивает
+медианы с другим файлом результатов и помечает замедления больше
+--threshold.
+
+Запуск: python -m benchmarks.suite --scales 0.01 0.05 [--compare .benchmarks/<commit>.json]
+"""
+
+import argparse
+import asyncio
+import dataclasses
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+from statistics import median
+from time import perf_counter
+
+import numpy as np
+
+from benchmarks.stand_ins import install_minio, mongo_database, populate, redis_client
+from ml.artifacts import new_version
+from scripts.generate_dataset import Dataset, DatasetSpec
+
+CASES = {}
+INTERACTIONS = ("watched_movies", "likes", "bookmarks")
+USER_OPS = 100  # Операций в случаях «по пользователю», независимо от масштаба
+
+
+def case(name: str, ops: int = 1):
+    """Регистрирует случай: async-функция (env) выполняет ops операций"""
+
+    def register(func):
+        CASES[name] = (func, ops)
+        return func
+
+    return register
+
+
+class Environment:
+    """Данные и заменители для одного масштаба; модели обучаются лениво"""
+
+    def __init__(self, scale: float, sample: int):
+        self.scale = scale
+        self.spec = DatasetSpec(scale=scale, chunk_size=20000)
+        self.db = mongo_database()
+        self.redis = redis_client()
+        self.cache_dir = tempfile.mkdtemp(prefix="bench-models-")
+        self.sample = sample
+        self.model = None
+        # partial_train дообучает на взаимодействиях последней недели набора
+        self.cutoff = self.spec.end - timedelta(days=7)
+
+    async def populate(self):
+        dataset = Dataset(self.spec)
+        await populate(self.db, dataset, ("movies",) + INTERACTIONS)
+        rng = np.random.default_rng(0)
+        # На малых масштабах пользователей может быть меньше, чем --sample-users
+        users = rng.choice(
+            dataset.n_users, min(self.sample, dataset.n_users), replace=False
+        )
+        self.user_ids = dataset.user_ids(users)
+
+    async def trained(self):
+        """Модель, обученная на всех данных; обучается при первом обращении"""
+        if self.model is None:
+            from ml.recommendation_model import RecommendationModel
+
+            self.model = RecommendationModel(load=False)
+            self.model.registry.cache_dir = tempfile.mkdtemp(dir=self.cache_dir)
+            await self.model.train(self.db)
+        return self.model
+
+    def close(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+
+@case("train")
+async def bench_train(env: Environment):
+    model = await env.trained()
+    await model.train(env.db)
+
+
+@case("partial_train")
+async def bench_partial_train(env: Environment):
+    model = await env.trained()
+    await model.partial_train(env.db, env.cutoff)
+
+
+@case("get_user_row", ops=USER_OPS)
+async def bench_get_user_row(env: Environment):
+    model = await env.trained()
+    # Выборка повторяется по кругу, если пользователей меньше USER_OPS
+    for user_id in np.resize(np.array(env.user_ids, dtype=object), USER_OPS):
+        await model.get_user_row(user_id, env.db)
+
+
+async def bench_scoring(env: Environment, model_type: str):
+    model = await env.trained()
+    snapshot = model.snapshot
+    rows = snapshot.users.lookup(env.user_ids)
+    user_items = model.user_item_matrix
+    for row in np.resize(rows[rows >= 0], USER_OPS):
+        model.score_user(snapshot, int(row), model_type, set(), user_items[row], 10)
+
+
+@case("score_als", ops=USER_OPS)
+async def bench_score_als(env: Environment):
+    await bench_scoring(env, "als")
+
+
+@case("score_lightfm", ops=USER_OPS)
+async def bench_score_lightfm(env: Environment):
+    await bench_scoring(env, "lightfm")
+
+
+@case("save_load_models")
+async def bench_save_load(env: Environment):
+    model = await env.trained()
+    # Каждый круг публикует новую версию, как обучение: текущая открыта через mmap
+    snapshot = dataclasses.replace(model.snapshot, version=new_version())
+    model.save_models(snapshot)
+    # Загрузка идёт в новый пустой каталог кэша, то есть через MinIO. Прежний
+    # каталог удаляется целиком: файлы, открытые через mmap, остаются доступны
+    previous = model.registry.cache_dir
+    model.registry.cache_dir = tempfile.mkdtemp(dir=env.cache_dir)
+    assert model.load_models(with_training=True)
+    shutil.rmtree(previous, ignore_errors=True)
+
+
+async def serve_cached(env: Environment, clear_local: bool):
+    import httpx
+
+    from core.cache import cache_ttls, invalidator, recommendation_cache
+    from core.jwt import security_jwt
+    from core.redis import get_redis
+    from main import app
+
+    user_id = env.user_ids[0]
+    app.dependency_overrides[security_jwt] = lambda: {"id": user_id}
+    app.dependency_overrides[get_redis] = lambda: env.redis
+    value = {"source": "als", "recommendations": env.user_ids[:3], "session_id": "s"}
+    await recommendation_cache.set(
+        env.redis, f"recommendations:{user_id}:als", value, *cache_ttls()
+    )
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as c:
+        for _ in range(100):
+            if clear_local:
+                invalidator.clear_all()
+            response = await c.get(
+                f"/api/recommend/v1/recommendations/{user_id}",
+                params={"model": "als"},
+                headers={"X-Request-Id": "bench"},
+            )
+            assert response.status_code == 200, response.text
+    app.dependency_overrides.clear()
+
+
+@case("cache_hit_local", ops=100)
+async def bench_cache_hit_local(env: Environment):
+    await serve_cached(env, clear_local=False)
+
+
+@case("cache_hit_redis", ops=100)
+async def bench_cache_hit_redis(env: Environment):
+    await serve_cached(env, clear_local=True)
+
+
+async def run_case(env: Environment, name: str, repeat: int) -> dict:
+    func, ops = CASES[name]
+    await func(env)  # Прогрев: обучение модели, импорты, заполнение кэшей
+    durations = []
+    for _ in range(repeat):
+        start = perf_counter()
+        await func(env)
+        durations.append((perf_counter() - start) / ops)
+    return {
+        "case": name,
+        "scale": env.scale,
+        "ops": ops,
+        "repeat": repeat,
+        "min_s": min(durations),
+        "median_s": median(durations),
+        "max_s": max(durations),
+    }
+
+
+async def run_suite(scales: list, names: list, repeat: int, sample: int) -> list:
+    results = []
+    for scale in scales:
+        env = Environment(scale, sample)
+        try:
+            await env.populate()
+            for name in names:
+                results.append(await run_case(env, name, repeat))
+                print(json.dumps(results[-1]))
+        finally:
+            env.close()
+    return results
+
+
+def git_commit() -> tuple:
+    """(коммит, есть ли незакоммиченные изменения)"""
+    try:
+        commit = subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], text=True
+        ).strip()
+        dirty = bool(subprocess.check_output(["git", "status", "--porcelain"]))
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", True
+    return commit, dirty
+
+
+def compare(results: list, baseline_path: str, threshold: float) -> list:
+    """Строки сравнения медиан с baseline; замедления больше threshold помечены"""
+    with open(baseline_path) as f:
+        baseline = {(row["case"], row["scale"]): row for row in json.load(f)["results"]}
+    report = []
+    for row in results:
+        base = baseline.get((row["case"], row["scale"]))
+        if base is None:
+            continue
+        ratio = row["median_s"] / base["median_s"]
+        report.append(
+            {
+                "case": row["case"],
+                "scale": row["scale"],
+                "baseline_s": base["median_s"],
+                "median_s": row["median_s"],
+                "ratio": round(ratio, 3),
+                "regression": ratio > 1 + threshold,
+            }
+        )
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scales", type=float, nargs="+", default=[0.01, 0.05])
+    parser.add_argument("--cases", nargs="+", default=list(CASES), choices=CASES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--sample-users", type=int, default=100)
+    parser.add_argument("--results-dir", default=".benchmarks")
+    parser.add_argument("--compare", help="Файл результатов для сравнения")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args()
+
+    # Журнал INFO на каждый запрос и обучение искажал бы замеры
+    logging.disable(logging.INFO)
+    install_minio()
+    results = asyncio.run(
+        run_suite(args.scales, args.cases, args.repeat, args.sample_users)
+    )
+
+    commit, dirty = git_commit()
+    os.makedirs(args.results_dir, exist_ok=True)
+    path = os.path.join(args.results_dir, f"{commit}{'-dirty' if dirty else ''}.json")
+    with open(path, "w") as f:
+        json.dump(
+            {
+                "commit": commit,
+                "dirty": dirty,
+                "created": datetime.now(timezone.utc).isoformat(),
+                "machine": {
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "cpus": os.cpu_count(),
+                },
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+    print(f"Results saved to {path}")
+
+    if args.compare:
+        report = compare(results, args.compare, args.threshold)
+        for row in report:
+            print(json.dumps(row))
+        if any(row["regression"] for row in report):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+import asyncio
+import json
+import logging
+import random
+from collections import OrderedDict
+from contextlib import suppress
+from time import monotonic, time
+from uuid import uuid4
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from core.config import settings
+from core.metrics import (
+    CACHE_REFRESHES,
+    CACHE_REQUESTS,
+    CACHE_STALE_SERVED,
+    LOCAL_CACHE_ENTRIES,
+    LOCAL_CACHE_EVICTIONS,
+)
+from core.redis import get_redis
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+ALL_KEYS = "*"  # Ключ сообщения об инвалидации: очистить весь кэш
+
+
+class LocalCache:
+    """
+    Ограниченный in-process кэш (LRU + TTL) для горячих read-mostly значений.
+
+    Хранит уже декодированные значения, поэтому попадание не требует ни
+    сетевого запроса, ни json.loads. При переполнении вытесняется давно
+    не читавшийся ключ. max_size=0 отключает кэш.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_size: int = settings.LOCAL_CACHE_MAX_ENTRIES,
+        ttl: float = settings.LOCAL_CACHE_TTL,
+    ):
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (expires_at, value)
+
+    def get(self, key: str):
+        """Значение по ключу или MISSING"""
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] > monotonic():
+            self.entries.move_to_end(key)
+            CACHE_REQUESTS.labels(cache=self.name, tier="local", result="hit").inc()
+            return entry[1]
+        if entry is not None:
+            self.delete(key)
+        CACHE_REQUESTS.labels(cache=self.name, tier="local", result="miss").inc()
+        return MISSING
+
+    def set(self, key: str, value, ttl: float = None):
+        if self.max_size <= 0:
+            return
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        self.entries[key] = (monotonic() + ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            LOCAL_CACHE_EVICTIONS.labels(cache=self.name).inc()
+        LOCAL_CACHE_ENTRIES.labels(cache=self.name).set(len(self.entries))
+
+    def delete(self, key: str):
+        if self.entries.pop(key, None) is not None:
+            LOCAL_CACHE_ENTRIES.labels(cache=self.name).set(len(self.entries))
+
+    def clear(self):
+        self.entries.clear()
+        LOCAL_CACHE_ENTRIES.labels(cache=self.name).set(0)
+
+
+class CacheInvalidator:
+    """
+    Инвалидация локальных кэшей всех реплик через Redis pub/sub.
+
+    Писатель публикует в канал сообщение «узел кэш ключ»; каждая реплика
+    API слушает канал фоновой задачей и удаляет ключ из своего локального
+    кэша (ключ "*" — очистить кэш целиком). Свои сообщения реплика
+    пропускает: её локальная копия уже свежая. Пока подписка разорвана,
+    сообщения теряются, поэтому после переподключения локальные кэши
+    очищаются.
+    """
+
+    def __init__(
+        self,
+        channel: str = settings.CACHE_INVALIDATION_CHANNEL,
+        retry_interval: float = 1.0,
+    ):
+        self.channel = channel
+        self.retry_interval = retry_interval
+        self.node_id = uuid4().hex
+        self.caches = {}
+        self.task = None
+
+    def register(self, cache: LocalCache) -> LocalCache:
+        self.caches[cache.name] = cache
+        return cache
+
+    async def publish(self, redis: Redis, cache_name: str, key: str = ALL_KEYS):
+        try:
+            await redis.publish(self.channel, f"{self.node_id} {cache_name} {key}")
+        except RedisError as e:
+            logger.warning(f"Failed to publish invalidation of {cache_name}:{key}: {e}")
+
+    def handle(self, message: str):
+        node_id, cache_name, key = message.split(" ", 2)
+        cache = self.caches.get(cache_name)
+        if node_id == self.node_id or cache is None:
+            return
+        if key == ALL_KEYS:
+            cache.clear()
+        else:
+            cache.delete(key)
+
+    def clear_all(self):
+        for cache in self.caches.values():
+            cache.clear()
+
+    async def run(self):
+        while True:
+            pubsub = None
+            try:
+                redis = await get_redis()
+                pubsub = redis.pubsub(ignore_subscribe_messages=True)
+                await pubsub.subscribe(self.channel)
+                self.clear_all()
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self.handle(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Cache invalidation subscription lost: {e}")
+            finally:
+                if pubsub is not None:
+                    with suppress(Exception):
+                        await pubsub.aclose()
+            await asyncio.sleep(self.retry_interval)
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+        logger.info(f"Cache invalidation listener started on {self.channel}")
+
+    async def stop(self):
+        if self.task is None:
+            return
+        self.task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self.task
+        self.task = None
+
+
+def cache_ttls(
+    soft_ttl: int = settings.REDIS_CACHE_SOFT_TTL,
+    hard_ttl: int = settings.REDIS_CACHE_EXPIRE,
+    jitter: float = settings.REDIS_CACHE_JITTER,
+) -> tuple:
+    """
+    Мягкий и жёсткий TTL записи со случайным разбросом ±jitter.
+
+    Оба TTL умножаются на один множитель, поэтому мягкий остаётся короче
+    жёсткого, а ключи, записанные одним пакетом, устаревают вразнобой.
+    """
+    factor = 1 + random.uniform(-jitter, jitter)
+    return max(1, round(soft_ttl * factor)), max(1, round(hard_ttl * factor))
+
+
+def encode_entry(value, soft_ttl: int) -> str:
+    """JSON записи кэша: значение и момент, после которого оно устарело"""
+    return json.dumps({"value": value, "refresh_at": time() + soft_ttl})
+
+
+def decode_entry(cached: str) -> tuple:
+    """(значение, refresh_at); записи старого формата считаются свежими"""
+    entry = json.loads(cached)
+    if isinstance(entry, dict) and entry.keys() == {"value", "refresh_at"}:
+        return entry["value"], entry["refresh_at"]
+    return entry, float("inf")
+
+
+class TwoTierCache:
+    """
+    JSON-значения в Redis с локальным кэшем перед ним.
+
+    Чтение сначала идёт в локальный кэш, при промахе — в Redis; найденное
+    в Redis значение кладётся в локальный кэш. Запись обновляет оба уровня
+    и рассылает инвалидацию остальным репликам.
+
+    Запись живёт в Redis до жёсткого TTL, но после мягкого считается
+    устаревшей (stale-while-revalidate): get отдаёт её сразу с флагом stale,
+    а вызывающий запускает refresh — фоновый пересчёт, один на ключ
+    в процессе и, благодаря короткой блокировке в Redis, на все реплики.
+    """
+
+    def __init__(
+        self,
+        local: LocalCache,
+        invalidator: CacheInvalidator,
+        refresh_lock_ms: int = settings.CACHE_REFRESH_LOCK_MS,
+    ):
+        self.local = invalidator.register(local)
+        self.invalidator = invalidator
+        self.refresh_lock_ms = refresh_lock_ms
+        self.refreshing = {}
+
+    async def get(self, redis: Redis, key: str) -> tuple:
+        """(значение или None, устарело ли оно)"""
+        entry = self.local.get(key)
+        if entry is MISSING:
+            cached = await redis.get(key)
+            result = "hit" if cached else "miss"
+            CACHE_REQUESTS.labels(
+                cache=self.local.name, tier="redis", result=result
+            ).inc()
+            if not cached:
+                return None, False
+            entry = decode_entry(cached)
+            self.local.set(key, entry)
+
+        value, refresh_at = entry
+        stale = time() >= refresh_at
+        if stale:
+            CACHE_STALE_SERVED.labels(cache=self.local.name).inc()
+        return value, stale
+
+    async def set(self, redis: Redis, key: str, value, soft_ttl: int, hard_ttl: int):
+        await redis.setex(key, hard_ttl, encode_entry(value, soft_ttl))
+        self.local.set(key, (value, time() + soft_ttl), hard_ttl)
+        await self.invalidator.publish(redis, self.local.name, key)
+
+    def refresh(self, redis: Redis, key: str, func):
+        """Запускает func() в фоне, если ключ ещё не обновляется этим процессом"""
+        if key in self.refreshing:
+            return
+        task = asyncio.create_task(self.run_refresh(redis, key, func))
+        self.refreshing[key] = task
+        task.add_done_callback(lambda _: self.refreshing.pop(key, None))
+
+    async def run_refresh(self, redis: Redis, key: str, func):
+        name = self.local.name
+        try:
+            # Блокировка не снимается: до её истечения другие реплики отдают
+            # устаревшее значение, а не пересчитывают его повторно
+            if not await redis.set(
+                f"refresh:{key}",
+                self.invalidator.node_id,
+                nx=True,
+                px=self.refresh_lock_ms,
+            ):
+                CACHE_REFRESHES.labels(cache=name, result="skipped").inc()
+                return
+            await func()
+            CACHE_REFRESHES.labels(cache=name, result="success").inc()
+        except Exception as e:
+            CACHE_REFRESHES.labels(cache=name, result="error").inc()
+            logger.error(f"Error refreshing cache key {key}: {e}")
+
+
+invalidator = CacheInvalidator()
+recommendation_cache = TwoTierCache(LocalCache("recommendations"), invalidator)
+# Любимые жанры хранятся в MongoDB; локальный кэш снимает запрос на каждый /genres_top
+genres_cache = invalidator.register(
+    LocalCache("favourite_genres", ttl=settings.GENRES_CACHE_TTL)
+)
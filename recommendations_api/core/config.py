@@ -21,13 +21,104 @@ class Settings(BaseSettings):
 
     # Настройки Redis
     REDIS_URL: str = Field("redis://redis:6379/0", env="REDIS_URL")
+    # Кэш рекомендаций: жёсткий TTL ключа в Redis, мягкий TTL (после него значение
+    # отдаётся устаревшим и пересчитывается в фоне) и разброс обоих TTL (доля)
     REDIS_CACHE_EXPIRE: int = 3600
+    REDIS_CACHE_SOFT_TTL: int = 2700
+    REDIS_CACHE_JITTER: float = 0.1
+    CACHE_REFRESH_LOCK_MS: int = 30000  # Одна реплика обновляет ключ в этом окне
+    # Схлопывание одновременных промахов кэша по ключу; при SINGLE_FLIGHT_REDIS_LOCK
+    # ещё и между репликами через короткую блокировку в Redis
+    SINGLE_FLIGHT_REDIS_LOCK: bool = False
+    SINGLE_FLIGHT_LOCK_TTL_MS: int = 5000  # Время жизни блокировки и предел ожидания
+    SINGLE_FLIGHT_POLL_MS: int = 50  # Период проверки кэша ожидающей репликой
+    # Локальный (in-process) кэш перед Redis: записей на кэш (0 — отключён) и TTL, с
+    LOCAL_CACHE_MAX_ENTRIES: int = 10000
+    LOCAL_CACHE_TTL: float = 30.0
+    GENRES_CACHE_TTL: float = 300.0
+    # Канал Redis pub/sub для инвалидации локальных кэшей всех реплик
+    CACHE_INVALIDATION_CHANNEL: str = "cache-invalidation"
+
+    # Закрепление пользователей за моделями, если model не передан: доли трафика
+    # и соль хэша; переопределяются без деплоя JSON-ом в ключе MODEL_EXPERIMENT_KEY
+    MODEL_TRAFFIC_SPLIT: dict = {"als": 50, "lightfm": 50}
+    MODEL_EXPERIMENT_SALT: str = "model-split-v1"
+    MODEL_EXPERIMENT_KEY: str = "experiments:model_split"
+    MODEL_EXPERIMENT_RELOAD_INTERVAL: float = 30.0
+
+    # Фоновая пакетная запись recommendation_logs и feedback: ёмкость очереди,
+    # размер пачки insert_many, период сброса (с) и ожидание места в очереди (с)
+    LOG_WRITER_QUEUE_SIZE: int = 10000
+    LOG_WRITER_BATCH_SIZE: int = 500
+    LOG_WRITER_FLUSH_INTERVAL: float = 1.0
+    LOG_WRITER_OVERFLOW_WAIT: float = 0.0
+
+    # Хранение recommendation_logs: "documents" — документ со строковыми id,
+    # "timeseries" — time-series коллекция с двоичными UUID (после миграции
+    # scripts/migrate_recommendation_logs.py); срок хранения в днях, 0 — бессрочно
+    RECOMMENDATION_LOGS_LAYOUT: str = "documents"
+    RECOMMENDATION_LOGS_TTL_DAYS: int = 0
+
+    # Онлайн-оценка качества (ml/evaluate_metrics.py): период запуска (с), K для
+    # метрик @K, задержка (с), в течение которой к сессии ещё приходит обратная
+    # связь, и число сессий в одном запросе логов
+    EVALUATION_INTERVAL: float = 300.0
+    EVALUATION_K: list = [3, 5, 10]
+    EVALUATION_SETTLE_SECONDS: int = 3600
+    EVALUATION_BATCH_SIZE: int = 1000
+
+    # Загрузка взаимодействий для обучения: документов в одном блоке курсора
+    INTERACTIONS_BATCH_SIZE: int = 10000
+
+    # Дообучение ALS: "fold_in" — пересчёт только затронутых строк, "full" — fit
+    ALS_PARTIAL_MODE: str = "fold_in"
+    ALS_FOLD_IN_ITEMS: bool = True  # Пересчитывать и векторы затронутых фильмов
+    ALS_FOLD_IN_ITERATIONS: int = 2
+
+    # Полное обучение: старт с факторов предыдущей версии и останов по плато
+    TRAIN_WARM_START: bool = True
+    TRAIN_TOLERANCE: float = 0.001  # Минимальное относительное улучшение метрики
+    TRAIN_PATIENCE: int = 2  # Проверок без улучшения до останова
+    TRAIN_LOSS_EVERY: int = 2  # Loss ALS считается раз в столько итераций
+    TRAIN_HOLDOUT_USERS: int = 1000  # Пользователей в отложенной выборке LightFM
+    LIGHTFM_EPOCHS: int = 10  # Максимум эпох LightFM
+    ALS_FACTORS: int = 20  # Размерность латентных факторов ALS
+    LIGHTFM_COMPONENTS: int = 20  # Размерность эмбеддингов LightFM
+
+    # Скоринг запроса в пуле потоков: размер пула и лимит одновременных задач
+    # (0 — скоринг в event loop; SCORING_CONCURRENCY=0 — равен SCORING_WORKERS)
+    SCORING_WORKERS: int = 4
+    SCORING_CONCURRENCY: int = 0
+    # Micro-batching промахов кэша: ожидание пачки и её размер. Включается
+    # под высокой нагрузкой (например, 2 мс; подбирается по
+    # benchmarks/bench_micro_batching.py): при малом параллелизме каждый
+    # промах лишь ждёт пачку. 0 — без пачек
+    SCORING_BATCH_MAX_WAIT_MS: float = 0.0
+    SCORING_BATCH_MAX_SIZE: int = 64
+
+    # Разбивка времени запроса рекомендаций по этапам в ответе (заголовок
+    # Server-Timing), если клиент прислал заголовок STAGE_TIMING_HEADER
+    STAGE_TIMING_ENABLED: bool = True
+    STAGE_TIMING_HEADER: str = "X-Debug-Timing"
+
+    # Пакетный предрасчёт рекомендаций: пользователей в одном блоке скоринга
+    PRECOMPUTE_BLOCK_SIZE: int = 1024
+
+    # Приближённый поиск (IVF) по векторам фильмов
+    ANN_ENABLED: bool = False
+    ANN_NLIST: int = 0  # Число кластеров, 0 — sqrt(числа фильмов)
+    ANN_NPROBE: int = 8  # Просматриваемых кластеров на запрос: полнота vs задержка
 
     # Настройки Minio
     MINIO_ENDPOINT: str = Field("minio:9000", env="MINIO_ENDPOINT")
     MINIO_ACCESS_KEY: str = Field("minioadmin", env="MINIO_ACCESS_KEY")
     MINIO_SECRET_KEY: str = Field("miniopassword", env="MINIO_SECRET_KEY")
     MINIO_BUCKET: str = Field("models", env="MINIO_BUCKET")
+    # Локальный каталог скачанных артефактов моделей (файлы открываются через mmap)
+    MODEL_CACHE_DIR: str = Field("/tmp/recommendation_models", env="MODEL_CACHE_DIR")
+    MODEL_CACHE_KEEP: int = 2  # Сколько последних версий хранить локально
+    # Период проверки новых версий моделей в API (секунды), 0 — без горячей перезагрузки
+    MODEL_RELOAD_INTERVAL: int = 30
 
     # Настройки JWT
     secret_key: str = Field(
@@ -0,0 +1,109 @@
+import hashlib
+import json
+import logging
+from time import monotonic
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from core.config import settings
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MODEL_TYPES = ("als", "lightfm")
+BUCKETS = 10000
+
+
+def user_bucket(user_id: str, salt: str, buckets: int = BUCKETS) -> int:
+    """Детерминированный бакет пользователя в [0, buckets)"""
+    digest = hashlib.blake2b(f"{salt}:{user_id}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % buckets
+
+
+def choose_model(split: dict, bucket: int, buckets: int = BUCKETS) -> str:
+    """
+    Модель бакета по долям трафика split ({"als": 50, "lightfm": 50}).
+
+    Бакеты раздаются моделям подряд, поэтому при изменении долей модель
+    меняется только у пользователей на границе, а не у всех.
+    """
+    total = sum(split.values())
+    position = bucket / buckets * total
+    upper = 0
+    for model_type, weight in split.items():
+        upper += weight
+        if position < upper:
+            return model_type
+    return model_type
+
+
+def parse_split(config: dict) -> dict:
+    split = {
+        model_type: float(weight)
+        for model_type, weight in config["split"].items()
+        if float(weight) > 0
+    }
+    if not split or any(model_type not in MODEL_TYPES for model_type in split):
+        raise ValueError(f"invalid traffic split {config['split']}")
+    return split
+
+
+class ModelExperiment:
+    """
+    Закрепление пользователя за моделью (sticky bucketing).
+
+    Пользователь по хэшу user_id с солью попадает в бакет, бакет по долям
+    трафика — в модель. Один и тот же пользователь всегда получает одну
+    модель и, значит, один ключ кэша. Доли и соль можно поменять без
+    деплоя: JSON {"salt": ..., "split": {...}} в ключе Redis key
+    перечитывается не чаще раза в reload_interval секунд; при его отсутствии
+    или ошибке действуют последние корректные значения.
+    """
+
+    def __init__(
+        self,
+        split: dict = settings.MODEL_TRAFFIC_SPLIT,
+        salt: str = settings.MODEL_EXPERIMENT_SALT,
+        key: str = settings.MODEL_EXPERIMENT_KEY,
+        reload_interval: float = settings.MODEL_EXPERIMENT_RELOAD_INTERVAL,
+    ):
+        self.split = parse_split({"split": split})
+        self.salt = salt
+        self.key = key
+        self.reload_interval = reload_interval
+        self.next_reload = 0.0
+
+    async def reload(self, redis: Redis):
+        if monotonic() < self.next_reload:
+            return
+        self.next_reload = monotonic() + self.reload_interval
+        try:
+            raw = await redis.get(self.key)
+        except RedisError as e:
+            logger.warning(f"Failed to load experiment config {self.key}: {e}")
+            return
+        if not raw:
+            return
+        try:
+            config = json.loads(raw)
+            split = parse_split(config)
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            logger.error(f"Ignoring invalid experiment config {self.key}: {e}")
+            return
+        if split != self.split or config.get("salt", self.salt) != self.salt:
+            logger.info(f"Experiment config updated: {config}")
+        self.split = split
+        self.salt = config.get("salt", self.salt)
+
+    def model_for(self, user_id: str) -> str:
+        """Модель пользователя по текущим долям и соли, без перечитывания"""
+        return choose_model(self.split, user_bucket(user_id, self.salt))
+
+    async def assign(self, redis: Redis, user_id: str) -> str:
+        """Модель, за которой закреплён пользователь"""
+        await self.reload(redis)
+        return self.model_for(user_id)
+
+
+model_experiment = ModelExperiment()
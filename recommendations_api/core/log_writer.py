@@ -0,0 +1,151 @@
+import asyncio
+import logging
+from contextlib import suppress
+from time import monotonic, time
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from core.config import db, settings
+from core.metrics import (
+    LOG_WRITER_DROPPED,
+    LOG_WRITER_FLUSH_DURATION,
+    LOG_WRITER_QUEUE_DEPTH,
+    LOG_WRITER_WRITTEN,
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+STOP = object()  # Сигнал фоновой задаче: дописать очередь и завершиться
+
+
+class BufferedWriter:
+    """
+    Фоновая пакетная запись аналитических документов в MongoDB
+    (recommendation_logs, feedback).
+
+    Обработчик запроса только кладёт документ в ограниченную очередь
+    и не ждёт MongoDB. Фоновая задача пишет накопленное через insert_many
+    (ordered=False) пачками до batch_size документов или раз в flush_interval
+    секунд. Если очередь заполнена (MongoDB не успевает), документ ждёт места
+    не дольше overflow_wait секунд (0 — не ждёт) и затем отбрасывается —
+    аналитика не должна тормозить ответы. При остановке очередь дописывается.
+    Пока задача не запущена (скрипты, тесты), документы пишутся сразу.
+    """
+
+    def __init__(
+        self,
+        database: AsyncIOMotorDatabase,
+        queue_size: int = settings.LOG_WRITER_QUEUE_SIZE,
+        batch_size: int = settings.LOG_WRITER_BATCH_SIZE,
+        flush_interval: float = settings.LOG_WRITER_FLUSH_INTERVAL,
+        overflow_wait: float = settings.LOG_WRITER_OVERFLOW_WAIT,
+    ):
+        self.db = database
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow_wait = overflow_wait
+        self.queue = None
+        self.task = None
+
+    async def write(self, collection: str, document: dict) -> bool:
+        """Ставит документ в очередь; False — документ отброшен"""
+        if self.task is None:
+            await self.db[collection].insert_one(document)
+            LOG_WRITER_WRITTEN.labels(collection=collection).inc()
+            return True
+
+        item = (collection, document)
+        try:
+            if self.overflow_wait > 0:
+                await asyncio.wait_for(self.queue.put(item), self.overflow_wait)
+            else:
+                self.queue.put_nowait(item)
+        except (asyncio.QueueFull, asyncio.TimeoutError):
+            LOG_WRITER_DROPPED.labels(collection=collection, reason="overflow").inc()
+            return False
+        LOG_WRITER_QUEUE_DEPTH.set(self.queue.qsize())
+        return True
+
+    async def next_batch(self) -> tuple:
+        """(пачка документов, встречен ли STOP)"""
+        item = await self.queue.get()
+        if item is STOP:
+            return [], True
+        batch = [item]
+        deadline = monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                if self.queue.empty():
+                    timeout = deadline - monotonic()
+                    if timeout <= 0:
+                        break
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                else:
+                    item = self.queue.get_nowait()
+            except asyncio.TimeoutError:
+                break
+            if item is STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def flush(self, batch: list):
+        LOG_WRITER_QUEUE_DEPTH.set(self.queue.qsize())
+        by_collection = {}
+        for collection, document in batch:
+            by_collection.setdefault(collection, []).append(document)
+
+        start_time = time()
+        for collection, documents in by_collection.items():
+            try:
+                await self.db[collection].insert_many(documents, ordered=False)
+                written = len(documents)
+            except BulkWriteError as e:
+                written = e.details.get("nInserted", 0)
+                logger.error(f"Partial write to {collection}: {e.details}")
+            except PyMongoError as e:
+                written = 0
+                logger.error(f"Error writing {len(documents)} to {collection}: {e}")
+            LOG_WRITER_WRITTEN.labels(collection=collection).inc(written)
+            if written < len(documents):
+                LOG_WRITER_DROPPED.labels(collection=collection, reason="error").inc(
+                    len(documents) - written
+                )
+        LOG_WRITER_FLUSH_DURATION.observe(time() - start_time)
+
+    async def run(self):
+        while True:
+            batch, stop = await self.next_batch()
+            if batch:
+                await self.flush(batch)
+            if stop:
+                return
+
+    def start(self):
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.task = asyncio.create_task(self.run())
+        logger.info(f"Buffered log writer started (batch {self.batch_size})")
+
+    async def stop(self, timeout: float = 10.0):
+        """Дописывает очередь и останавливает фоновую задачу"""
+        if self.task is None:
+            return
+        task, self.task = self.task, None
+        # STOP встаёт за уже принятыми документами; write теперь пишет напрямую
+        await self.queue.put(STOP)
+        try:
+            await asyncio.wait_for(task, timeout)
+        except asyncio.TimeoutError:
+            LOG_WRITER_DROPPED.labels(collection="all", reason="shutdown").inc(
+                self.queue.qsize()
+            )
+            logger.error("Log writer did not flush before shutdown timeout")
+            with suppress(asyncio.CancelledError):
+                await task
+        logger.info("Buffered log writer stopped")
+
+
+log_writer = BufferedWriter(db)
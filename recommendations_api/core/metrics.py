@@ -1,13 +1,32 @@
 # recommendation_service/core/metrics.py
-from prometheus_client import Counter, Gauge, Histogram
+import logging
+import os
 
-# Метрики для HTTP-запросов
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    multiprocess,
+    start_http_server,
+)
+
+logger = logging.getLogger(__name__)
+
+# Метрики для HTTP-запросов (core/middleware.py); endpoint — шаблон маршрута
 REQUEST_COUNT = Counter(
     "http_requests_total", "Total HTTP Requests", ["method", "endpoint", "status"]
 )
 REQUEST_LATENCY = Histogram(
     "http_request_latency_seconds", "Request Latency", ["endpoint"]
 )
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being processed",
+    ["method"],
+    multiprocess_mode="livesum",
+)
 
 # Метрики для обучения моделей (если используются в recommendation_model.py)
 TRAIN_DURATION = Histogram(
@@ -17,11 +36,210 @@ TRAIN_COUNT = Counter("model_train_count_total", "Total Model Trainings", ["type
 MATRIX_SIZE = Gauge(
     "matrix_size_elements", "Number of Elements in User-Item Matrix", ["model"]
 )
+TRAIN_ITERATIONS = Gauge(
+    "model_train_iterations",
+    "Iterations (ALS) or epochs (LightFM) run by the last full training",
+    ["model"],
+)
+TRAIN_TIME_SAVED = Counter(
+    "model_train_time_saved_seconds_total",
+    "Training time saved by early stopping, estimated from mean iteration time",
+    ["model"],
+)
+TRAIN_CONVERGENCE = Gauge(
+    "model_train_convergence_value",
+    "Last ALS training loss or LightFM held-out hit rate@10",
+    ["model"],
+)
+TRAIN_WARM_START_RATIO = Gauge(
+    "model_train_warm_start_ratio",
+    "Share of users whose factors were carried over from the previous version",
+    ["model"],
+)
 
-# Метрики для качества моделей (если используются в evaluate_metrics.py)
+# Метрики качества моделей (ml/evaluate_metrics.py)
 ALS_PRECISION = Gauge("als_precision_at_3", "Precision@3 for ALS model")
 ALS_RECALL = Gauge("als_recall_at_3", "Recall@3 for ALS model")
 ALS_SAMPLES = Gauge("als_samples", "Number of ALS samples evaluated")
 LIGHTFM_PRECISION = Gauge("lightfm_precision_at_3", "Precision@3 for LightFM model")
 LIGHTFM_RECALL = Gauge("lightfm_recall_at_3", "Recall@3 for LightFM model")
 LIGHTFM_SAMPLES = Gauge("lightfm_samples", "Number of LightFM samples evaluated")
+RECOMMENDATION_QUALITY = Gauge(
+    "recommendation_quality",
+    "Online recommendation quality averaged over evaluated sessions",
+    ["model", "metric", "k"],
+)
+RECOMMENDATION_QUALITY_SAMPLES = Gauge(
+    "recommendation_quality_samples",
+    "Sessions with positive feedback evaluated per model",
+    ["model"],
+)
+EVALUATION_WATERMARK = Gauge(
+    "evaluation_watermark_timestamp_seconds",
+    "Recommendation log time up to which sessions are evaluated",
+)
+EVALUATION_DURATION = Histogram(
+    "evaluation_run_duration_seconds", "Duration of one online evaluation run"
+)
+
+# Этапы построения рекомендаций запроса (core/stages.py): чтение MongoDB,
+# исключение просмотренного, скоринг, подмешивание новых фильмов, запись
+# в кэш и в лог; корзины мельче стандартных — этапы длятся доли миллисекунды
+RECOMMENDATION_STAGE_DURATION = Histogram(
+    "recommendation_stage_duration_seconds",
+    "Time spent in one stage of building recommendations",
+    ["stage", "model_type"],
+    buckets=(
+        0.0001,
+        0.00025,
+        0.0005,
+        0.001,
+        0.0025,
+        0.005,
+        0.01,
+        0.025,
+        0.05,
+        0.1,
+        0.25,
+        0.5,
+        1.0,
+        2.5,
+    ),
+)
+
+# Метрики пакетного предрасчёта рекомендаций (workers/tasks.py)
+PRECOMPUTE_USERS = Counter(
+    "precompute_users_total", "Total users with precomputed recommendations", ["model"]
+)
+PRECOMPUTE_DURATION = Histogram(
+    "precompute_duration_seconds", "Bulk recommendations precompute duration", ["model"]
+)
+PRECOMPUTE_THROUGHPUT = Gauge(
+    "precompute_users_per_second",
+    "Throughput of the last bulk precompute run",
+    ["model"],
+)
+
+# Метрики горячей перезагрузки моделей в API (ml/registry.py)
+MODEL_RELOADS = Counter(
+    "model_reload_total", "Model snapshot reloads in the API", ["status"]
+)
+MODEL_RELOAD_DURATION = Histogram(
+    "model_reload_duration_seconds", "Time to download and publish a model version"
+)
+
+# Метрики загрузки взаимодействий для обучения (ml/interactions.py)
+INTERACTIONS_LOAD_THROUGHPUT = Gauge(
+    "interactions_load_rows_per_second", "Throughput of the last interactions load"
+)
+INTERACTIONS_LOAD_MEMORY = Gauge(
+    "interactions_load_peak_rss_growth_bytes",
+    "Peak process RSS growth during the last interactions load",
+)
+
+# Метрики пула скоринга запросов (ml/scoring.py)
+SCORING_QUEUE_DEPTH = Gauge(
+    "scoring_queue_depth", "Scoring requests waiting for a free executor slot"
+)
+SCORING_IN_FLIGHT = Gauge(
+    "scoring_in_flight", "Scoring requests currently running in the executor"
+)
+SCORING_QUEUE_WAIT = Histogram(
+    "scoring_queue_wait_seconds", "Time a scoring request waited for a free slot"
+)
+SCORING_BATCH_SIZE = Histogram(
+    "scoring_batch_size",
+    "Requests scored together in one micro-batch",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+
+# Схлопывание одновременных промахов кэша (core/single_flight.py)
+COALESCED_REQUESTS = Counter(
+    "recommendation_coalesced_requests_total",
+    "Cache-miss requests that waited for another request's computation",
+    ["scope"],
+)
+
+# Метрики двухуровневого кэша (core/cache.py)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Cache lookups by tier and result",
+    ["cache", "tier", "result"],
+)
+LOCAL_CACHE_ENTRIES = Gauge(
+    "local_cache_entries", "Entries in the in-process cache", ["cache"]
+)
+LOCAL_CACHE_EVICTIONS = Counter(
+    "local_cache_evictions_total",
+    "Entries evicted from the in-process cache",
+    ["cache"],
+)
+CACHE_STALE_SERVED = Counter(
+    "cache_stale_served_total",
+    "Cached values served after their soft TTL (stale-while-revalidate)",
+    ["cache"],
+)
+CACHE_REFRESHES = Counter(
+    "cache_refreshes_total",
+    "Background refreshes of stale cache values",
+    ["cache", "result"],
+)
+
+# Попадания в кэш рекомендаций по модели и способу её выбора (core/experiments.py)
+RECOMMENDATION_CACHE_LOOKUPS = Counter(
+    "recommendation_cache_lookups_total",
+    "Recommendation cache lookups by model, assignment and result",
+    ["model", "assignment", "result"],
+)
+
+# Метрики фоновой записи аналитики в MongoDB (core/log_writer.py)
+LOG_WRITER_WRITTEN = Counter(
+    "log_writer_documents_written_total",
+    "Analytics documents written to MongoDB",
+    ["collection"],
+)
+LOG_WRITER_DROPPED = Counter(
+    "log_writer_documents_dropped_total",
+    "Analytics documents dropped on queue overflow, write error or shutdown",
+    ["collection", "reason"],
+)
+LOG_WRITER_QUEUE_DEPTH = Gauge(
+    "log_writer_queue_depth", "Analytics documents waiting to be written"
+)
+LOG_WRITER_FLUSH_DURATION = Histogram(
+    "log_writer_flush_duration_seconds", "Time to write one batch of analytics"
+)
+
+
+def multiprocess_enabled() -> bool:
+    """
+    Режим нескольких воркеров uvicorn: значения метрик каждого процесса
+    пишутся в файлы каталога PROMETHEUS_MULTIPROC_DIR (его нужно очищать
+    перед запуском) и суммируются при сборе.
+    """
+    return "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+
+def start_metrics_server(port: int):
+    """
+    HTTP-сервер метрик. В режиме нескольких воркеров порт занимает первый
+    из них и отдаёт метрики всех процессов; остальные сервер не запускают.
+    """
+    registry = REGISTRY
+    if multiprocess_enabled():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    try:
+        start_http_server(port, registry=registry)
+    except OSError as e:
+        if not multiprocess_enabled():
+            raise
+        logger.info(f"Metrics port {port} is served by another worker: {e}")
+        return
+    logger.info(f"Prometheus metrics server started on port {port}.")
+
+
+def mark_process_dead():
+    """Убирает значения livesum-метрик завершившегося воркера"""
+    if multiprocess_enabled():
+        multiprocess.mark_process_dead(os.getpid())
@@ -0,0 +1,91 @@
+from time import perf_counter
+
+from fastapi import status
+from fastapi.responses import ORJSONResponse
+from starlette.datastructures import Headers
+from starlette.routing import Match
+
+from core.metrics import REQUEST_COUNT, REQUEST_LATENCY, REQUESTS_IN_FLIGHT
+
+UNMATCHED_ROUTE = "unmatched"  # Метка запросов, не совпавших ни с одним маршрутом
+
+
+def route_template(scope: dict, routes: list) -> str:
+    """
+    Шаблон маршрута запроса (/recommendations/{user_id}), а не его путь:
+    метки метрик не растут с числом пользователей и сессий.
+
+    FastAPI записывает совпавший маршрут в scope["route"] при маршрутизации;
+    если приложение до неё не дошло, маршрут ищется по routes.
+    """
+    route = scope.get("route")
+    if route is None:
+        for candidate in routes:
+            match, _ = candidate.matches(scope)
+            if match == Match.FULL:
+                route = candidate
+                break
+    return getattr(route, "path", UNMATCHED_ROUTE)
+
+
+class RequestIdMiddleware:
+    """Отклоняет HTTP-запросы без заголовка X-Request-Id (400), кроме путей exempt"""
+
+    def __init__(self, app, exempt: tuple = ()):
+        self.app = app
+        self.exempt = frozenset(exempt)
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] == "http"
+            and scope["path"] not in self.exempt
+            and not Headers(scope=scope).get("x-request-id")
+        ):
+            response = ORJSONResponse(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                content={"detail": "X-Request-Id is required"},
+            )
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+
+class MetricsMiddleware:
+    """
+    Метрики HTTP-запросов: число и задержка по методу, шаблону маршрута
+    и статусу, число выполняющихся запросов.
+
+    Чистый ASGI-middleware: в отличие от @app.middleware("http")
+    (BaseHTTPMiddleware) не создаёт на запрос отдельную задачу и поток
+    ответа. Задержка считается до отправки последнего фрагмента ответа.
+    """
+
+    def __init__(self, app, routes: list):
+        self.app = app
+        self.routes = routes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+        start = perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.labels(method=method).inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUESTS_IN_FLIGHT.labels(method=method).dec()
+            endpoint = route_template(scope, self.routes)
+            REQUEST_COUNT.labels(
+                method=method, endpoint=endpoint, status=str(status_code)
+            ).inc()
+            REQUEST_LATENCY.labels(endpoint=endpoint).observe(perf_counter() - start)
@@ -0,0 +1,118 @@
+import asyncio
+import logging
+from time import monotonic
+from uuid import uuid4
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from core.config import settings
+from core.metrics import COALESCED_REQUESTS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Снимает блокировку, только если она всё ещё принадлежит владельцу
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class SingleFlight:
+    """
+    Схлопывание одновременных промахов кэша по ключу.
+
+    Первый запрос по ключу (лидер) выполняет вычисление, остальные запросы
+    этого процесса ждут его результат. Вычисление не отменяется, если
+    отключился клиент лидера: результат нужен остальным и кэшу.
+
+    При redis_lock=True лидер дополнительно берёт короткую блокировку
+    в Redis (SET NX PX), чтобы по ключу считала одна реплика. Реплики,
+    не получившие блокировку, раз в poll_ms проверяют кэш через load();
+    если блокировка освободилась без результата или истекло lock_ttl_ms,
+    реплика считает сама. Ошибки Redis не мешают ответу — вычисление
+    выполняется без блокировки.
+    """
+
+    def __init__(
+        self,
+        redis_lock: bool = settings.SINGLE_FLIGHT_REDIS_LOCK,
+        lock_ttl_ms: int = settings.SINGLE_FLIGHT_LOCK_TTL_MS,
+        poll_ms: int = settings.SINGLE_FLIGHT_POLL_MS,
+    ):
+        self.redis_lock = redis_lock
+        self.lock_ttl_ms = lock_ttl_ms
+        self.poll = poll_ms / 1000
+        self.calls = {}
+
+    async def do(self, key: str, func, redis: Redis = None, load=None):
+        """
+        Результат func() для ключа key, один на все одновременные вызовы.
+
+        func и load — корутинные функции без аргументов; load читает готовый
+        результат из кэша (None — ещё нет), нужна только для блокировки в Redis.
+        """
+        call = self.calls.get(key)
+        if call is not None:
+            COALESCED_REQUESTS.labels(scope="local").inc()
+            return await asyncio.shield(call)
+
+        call = asyncio.ensure_future(self.lead(key, func, redis, load))
+        self.calls[key] = call
+        call.add_done_callback(lambda done: self.forget(key, done))
+        return await asyncio.shield(call)
+
+    def forget(self, key: str, call: asyncio.Future):
+        if self.calls.get(key) is call:
+            del self.calls[key]
+        if not call.cancelled():
+            call.exception()  # Ошибку уже получили ожидающие, если они были
+
+    async def lead(self, key: str, func, redis: Redis, load):
+        if not self.redis_lock or redis is None or load is None:
+            return await func()
+
+        lock_key = f"lock:{key}"
+        token = uuid4().hex
+        deadline = monotonic() + self.lock_ttl_ms / 1000
+        waited = False
+        while True:
+            try:
+                acquired = await redis.set(
+                    lock_key, token, nx=True, px=self.lock_ttl_ms
+                )
+            except RedisError as e:
+                logger.warning(f"Single-flight lock unavailable for {key}: {e}")
+                return await func()
+
+            if acquired:
+                try:
+                    # Другая реплика могла закончить между промахом и блокировкой
+                    cached = await load()
+                    return cached if cached is not None else await func()
+                finally:
+                    await self.release(redis, lock_key, token)
+
+            if not waited:
+                waited = True
+                COALESCED_REQUESTS.labels(scope="redis").inc()
+            await asyncio.sleep(self.poll)
+            cached = await load()
+            if cached is not None:
+                return cached
+            if monotonic() >= deadline:
+                logger.warning(f"Single-flight lock wait timed out for {key}")
+                return await func()
+
+    @staticmethod
+    async def release(redis: Redis, lock_key: str, token: str):
+        try:
+            await redis.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+        except RedisError as e:
+            logger.warning(f"Failed to release single-flight lock {lock_key}: {e}")
+
+
+single_flight = SingleFlight()
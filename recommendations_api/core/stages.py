@@ -0,0 +1,41 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from core.metrics import RECOMMENDATION_STAGE_DURATION
+
+# Разбивка текущего запроса по этапам: {этап: секунды}; None — не собирается.
+# Задачи asyncio копируют контекст, поэтому этапы из gather и single-flight
+# попадают в словарь запроса, который их запустил
+stage_breakdown: ContextVar[dict] = ContextVar("stage_breakdown", default=None)
+
+
+@contextmanager
+def stage(name: str, model_type: str):
+    """Замеряет этап построения рекомендаций: гистограмма и разбивка запроса"""
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        duration = perf_counter() - start
+        RECOMMENDATION_STAGE_DURATION.labels(stage=name, model_type=model_type).observe(
+            duration
+        )
+        breakdown = stage_breakdown.get()
+        if breakdown is not None:
+            breakdown[name] = breakdown.get(name, 0.0) + duration
+
+
+def collect_stages() -> dict:
+    """Включает разбивку по этапам для текущего запроса и возвращает её словарь"""
+    breakdown = {}
+    stage_breakdown.set(breakdown)
+    return breakdown
+
+
+def server_timing(breakdown: dict, total: float) -> str:
+    """Значение заголовка Server-Timing (миллисекунды) по разбивке запроса"""
+    entries = [
+        f"{name};dur={seconds * 1000:.2f}" for name, seconds in breakdown.items()
+    ]
+    return ", ".join(entries + [f"total;dur={total * 1000:.2f}"])
@@ -1,16 +1,21 @@
+import asyncio
 import logging
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
 from time import time
 
-from fastapi import FastAPI, Request, status
+from fastapi import FastAPI
 from fastapi.responses import ORJSONResponse
-from prometheus_client import start_http_server
 from starlette.middleware.sessions import SessionMiddleware
 
 from api.v1 import genres, recommend
+from core.cache import invalidator
 from core.config import db, settings
-from core.metrics import REQUEST_COUNT, REQUEST_LATENCY  # Импортируем метрики
+from core.log_writer import log_writer
+from core.metrics import mark_process_dead, start_metrics_server
+from core.middleware import MetricsMiddleware, RequestIdMiddleware
+from ml.recommendation_logs import ensure_recommendation_logs
 from ml.recommendation_model import recommendation_model
+from ml.registry import ModelWatcher
 from workers.tasks import train_model
 
 # Логгирование
@@ -18,32 +23,70 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
+async def warm_up(model_watcher: ModelWatcher):
+    """
+    Фоновая часть старта: загрузка моделей из MinIO, подготовка
+    recommendation_logs и постановка обучения, если моделей нет, а данные
+    есть. API отвечает уже во время неё (популярными фильмами), /ready
+    возвращает 503 до окончания загрузки моделей.
+    """
+    start_time = time()
+    await recommendation_model.load_async()
+    logger.info(
+        f"Startup model load finished in {time() - start_time:.2f}s "
+        f"(version {recommendation_model.version})"
+    )
+    # Горячая перезагрузка: новые версии моделей из MinIO подхватываются без рестарта;
+    # запускается после первой загрузки, чтобы не скачивать версию дважды
+    if settings.MODEL_RELOAD_INTERVAL > 0:
+        model_watcher.start()
+
+    # Формат и срок хранения recommendation_logs; ошибка не мешает работе API
+    try:
+        await ensure_recommendation_logs(db)
+    except Exception as e:
+        logger.error(f"Error preparing recommendation_logs: {e}")
+
     try:
         # Проверяем наличие записей в watched_movies
         watched_count = await db["watched_movies"].count_documents({})
         if watched_count == 0:
             logger.info("No records found in watched_movies. Skipping model training.")
-        else:
-            # Проверяем статус моделей и запускаем обучение, если они отсутствуют
-            if not (
-                recommendation_model.als_loaded and recommendation_model.lightfm_loaded
-            ):
-                logger.info(
-                    "One or both models are missing and data exists. Enqueuing training task..."
-                )
-                train_model(partial=False, train_als=True)  # Полное обучение при старте
-                logger.info("Training task enqueued successfully.")
-            # Запуск Prometheus-сервера
-            start_http_server(8001)
-            logger.info("Prometheus metrics server started on port 8001.")
+        # Проверяем статус моделей и запускаем обучение, если они отсутствуют
+        elif not (
+            recommendation_model.als_loaded and recommendation_model.lightfm_loaded
+        ):
+            logger.info(
+                "One or both models are missing and data exists. Enqueuing training task..."
+            )
+            train_model(partial=False, train_als=True)  # Полное обучение при старте
+            logger.info("Training task enqueued successfully.")
     except Exception as e:
         logger.error(f"Error during startup: {str(e)}")
-        raise
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    model_watcher = ModelWatcher(recommendation_model)
+    # Запуск Prometheus-сервера
+    start_metrics_server(8001)
+    # Модели и MongoDB не задерживают старт: приложение принимает запросы сразу
+    startup = asyncio.create_task(warm_up(model_watcher))
+    # Инвалидация локальных кэшей по сообщениям других реплик и воркеров
+    invalidator.start()
+    # Запись аналитики в MongoDB в фоне; при остановке очередь дописывается
+    log_writer.start()
 
     yield
     # Завершение приложения
+    startup.cancel()
+    with suppress(asyncio.CancelledError):
+        await startup
+    await log_writer.stop()
+    await invalidator.stop()
+    await model_watcher.stop()
+    recommendation_model.scoring.shutdown()
+    mark_process_dead()
     logger.info("Application shutting down")
 
 
@@ -57,32 +100,11 @@ app = FastAPI(
 )
 
 
-@app.middleware("http")
-async def before_request(request: Request, call_next):
-    start_time = time()
-    request_id = request.headers.get("X-Request-Id")
-    endpoint = request.url.path
-
-    if not request_id:
-        REQUEST_COUNT.labels(
-            method=request.method, endpoint=endpoint, status="400"
-        ).inc()
-        REQUEST_LATENCY.labels(endpoint=endpoint).observe(time() - start_time)
-        return ORJSONResponse(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            content={"detail": "X-Request-Id is required"},
-        )
-    response = await call_next(request)
-    # Логируем запросы
-    status_code = str(response.status_code)
-    REQUEST_COUNT.labels(
-        method=request.method, endpoint=endpoint, status=status_code
-    ).inc()
-    REQUEST_LATENCY.labels(endpoint=endpoint).observe(time() - start_time)
-    return response
-
-
 app.add_middleware(SessionMiddleware, secret_key=settings.secret_key)
+# Пробы health/ready оркестратора приходят без X-Request-Id
+app.add_middleware(RequestIdMiddleware, exempt=("/health", "/ready"))
+# Внешний слой: учитываются и ответы 400 без X-Request-Id
+app.add_middleware(MetricsMiddleware, routes=app.routes)
 app.include_router(
     recommend.router, prefix="/api/recommend/v1/recommendations", tags=["recommend"]
 )
@@ -93,3 +115,10 @@ app.include_router(genres.router, prefix="/api/recommend/v1/favorites", tags=["g
 @app.get("/health")
 async def health_check():
     return {"status": "OK"}
+
+
+# Готовность: первая загрузка моделей завершена; версия и время загрузки
+@app.get("/ready")
+async def readiness_check():
+    state = recommendation_model.readiness()
+    return ORJSONResponse(state, status_code=200 if state["ready"] else 503)
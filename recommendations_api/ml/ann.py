@@ -0,0 +1,148 @@
+import numpy as np
+
+from ml.ranking import top_k_indices
+
+# Размер блока при назначении векторов кластерам (ограничивает пиковую память)
+ASSIGN_CHUNK_SIZE = 65536
+
+
+def nearest_centroids(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Номер ближайшего (по L2) центроида для каждого вектора"""
+    centroid_norms = (centroids**2).sum(axis=1)
+    assignment = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), ASSIGN_CHUNK_SIZE):
+        end = start + ASSIGN_CHUNK_SIZE
+        chunk = vectors[start:end]
+        # ||x - c||^2 = ||x||^2 - 2 x·c + ||c||^2, ||x||^2 на argmin не влияет
+        distances = centroid_norms - 2 * chunk @ centroids.T
+        assignment[start:end] = distances.argmin(axis=1)
+    return assignment
+
+
+class IVFIndex:
+    """
+    Инвертированный индекс (IVF-flat) для приближённого поиска по скалярному
+    произведению над латентными векторами фильмов.
+
+    Векторы фильмов разбиваются k-means на nlist кластеров и хранятся
+    сгруппированными по кластерам. Запрос оценивает только центроиды и
+    фильмы из nprobe ближайших кластеров, поэтому стоимость поиска
+    ~ (nlist + n_items * nprobe / nlist) вместо n_items. nprobe — ручка
+    баланса полноты и задержки: при nprobe = nlist поиск точный.
+
+    Смещения фильмов (LightFM item_biases) учитываются дополнительной
+    координатой: [v, b] · [u, 1] = u·v + b.
+    """
+
+    def __init__(
+        self,
+        centroids: np.ndarray,
+        list_offsets: np.ndarray,
+        list_items: np.ndarray,
+        list_vectors: np.ndarray,
+        with_bias: bool,
+    ):
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_items = list_items
+        self.list_vectors = list_vectors
+        self.with_bias = with_bias
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @property
+    def n_items(self) -> int:
+        return len(self.list_items)
+
+    @classmethod
+    def build(
+        cls,
+        item_vectors: np.ndarray,
+        item_biases: np.ndarray = None,
+        nlist: int = None,
+        iterations: int = 10,
+        seed: int = 42,
+    ) -> "IVFIndex":
+        vectors = np.asarray(item_vectors, dtype=np.float32)
+        if item_biases is not None:
+            vectors = np.hstack([vectors, np.asarray(item_biases).reshape(-1, 1)])
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+
+        n_items = len(vectors)
+        nlist = max(1, min(nlist or int(np.sqrt(n_items)), n_items))
+        rng = np.random.default_rng(seed)
+        centroids = vectors[rng.choice(n_items, nlist, replace=False)].copy()
+
+        # k-means (Ллойд): пустые кластеры сохраняют прежний центроид
+        for _ in range(iterations):
+            assignment = nearest_centroids(vectors, centroids)
+            counts = np.bincount(assignment, minlength=nlist)
+            sums = np.stack(
+                [
+                    np.bincount(assignment, weights=vectors[:, dim], minlength=nlist)
+                    for dim in range(vectors.shape[1])
+                ],
+                axis=1,
+            )
+            non_empty = counts > 0
+            centroids[non_empty] = sums[non_empty] / counts[non_empty, None]
+
+        assignment = nearest_centroids(vectors, centroids)
+        order = np.argsort(assignment, kind="stable").astype(np.int32)
+        list_offsets = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignment, minlength=nlist), out=list_offsets[1:])
+
+        return cls(
+            centroids=centroids,
+            list_offsets=list_offsets,
+            list_items=order,
+            list_vectors=vectors[order],
+            with_bias=item_biases is not None,
+        )
+
+    def search(
+        self, query: np.ndarray, k: int, nprobe: int = 8, exclude: np.ndarray = None
+    ):
+        """
+        Возвращает (item_indices, scores) k лучших фильмов для вектора запроса.
+
+        exclude — индексы фильмов, которые нельзя рекомендовать (уже просмотренные).
+        """
+        query = np.asarray(query, dtype=np.float32)
+        if self.with_bias:
+            query = np.append(query, np.float32(1.0))
+
+        probe = top_k_indices(self.centroids @ query, min(nprobe, self.nlist))
+        candidates = np.concatenate(
+            [np.arange(self.list_offsets[c], self.list_offsets[c + 1]) for c in probe]
+        )
+        items = self.list_items[candidates]
+        scores = self.list_vectors[candidates] @ query
+        if exclude is not None and len(exclude):
+            scores[np.isin(items, exclude)] = -np.inf
+
+        top = top_k_indices(scores, k)
+        top = top[np.isfinite(scores[top])]
+        return items[top], scores[top]
+
+    def to_arrays(self) -> dict:
+        """Массивы индекса для сохранения в артефакт модели"""
+        return {
+            "centroids": self.centroids,
+            "list_offsets": self.list_offsets,
+            "list_items": self.list_items,
+            "list_vectors": self.list_vectors,
+            "with_bias": np.array(self.with_bias),
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays: dict) -> "IVFIndex":
+        return cls(
+            centroids=arrays["centroids"],
+            list_offsets=arrays["list_offsets"],
+            list_items=arrays["list_items"],
+            list_vectors=arrays["list_vectors"],
+            with_bias=bool(arrays["with_bias"]),
+        )
@@ -0,0 +1,152 @@
+"""
+Формат артефактов моделей в MinIO.
+
+Каждая версия хранится отдельным каталогом:
+
+    artifacts/<version>/manifest.json          — описание версии и список файлов
+    artifacts/<version>/<name>.npy             — массивы для инференса (факторы, id)
+    artifacts/<version>/training/<file>        — состояние, нужное только для дообучения
+    artifacts/latest.json                      — указатель на последнюю версию
+
+Массивы сохраняются в .npy без pickle, поэтому скачанные файлы открываются
+через np.load(mmap_mode="r"): загрузка сводится к вводу-выводу, а несколько
+процессов на одном хосте разделяют одни и те же страницы page cache.
+"""
+
+import io
+import json
+import logging
+import os
+import uuid
+from datetime import datetime, timezone
+
+import numpy as np
+from minio import Minio
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ARTIFACT_FORMAT_VERSION = 2
+ARTIFACTS_PREFIX = "artifacts"
+MANIFEST_NAME = "manifest.json"
+LATEST_KEY = f"{ARTIFACTS_PREFIX}/latest.json"
+TRAINING_DIR = "training"
+
+
+def new_version() -> str:
+    """Идентификатор версии: время создания + случайный суффикс (сортируется по времени)"""
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+    return f"{timestamp}-{uuid.uuid4().hex[:8]}"
+
+
+def write_artifact(
+    path: str, arrays: dict, training_files: list = (), metadata: dict = None
+) -> dict:
+    """
+    Сохраняет массивы инференса в каталог path и пишет manifest.json.
+
+    training_files — имена файлов, уже лежащих в path/training
+    (состояние для дообучения, в инференс не загружается).
+    """
+    os.makedirs(path, exist_ok=True)
+    files = {}
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        np.save(os.path.join(path, f"{name}.npy"), array, allow_pickle=False)
+        files[name] = {
+            "file": f"{name}.npy",
+            "dtype": array.dtype.str,
+            "shape": list(array.shape),
+        }
+    manifest = {
+        "format_version": ARTIFACT_FORMAT_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "arrays": files,
+        "training_files": [f"{TRAINING_DIR}/{name}" for name in training_files],
+        **(metadata or {}),
+    }
+    with open(os.path.join(path, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def read_manifest(path: str) -> dict:
+    with open(os.path.join(path, MANIFEST_NAME)) as f:
+        manifest = json.load(f)
+    if manifest.get("format_version") != ARTIFACT_FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported artifact format: {manifest.get('format_version')}"
+        )
+    return manifest
+
+
+def read_arrays(path: str, manifest: dict, mmap: bool = True) -> dict:
+    """Открывает массивы артефакта; при mmap=True — без копирования в память"""
+    return {
+        name: np.load(
+            os.path.join(path, info["file"]),
+            mmap_mode="r" if mmap else None,
+            allow_pickle=False,
+        )
+        for name, info in manifest["arrays"].items()
+    }
+
+
+def upload_artifact(client: Minio, bucket: str, version: str, path: str) -> None:
+    """
+    Загружает каталог версии в MinIO. manifest.json и указатель latest.json
+    пишутся последними, чтобы читатель никогда не увидел неполную версию.
+    """
+    manifest = read_manifest(path)
+    names = [info["file"] for info in manifest["arrays"].values()]
+    for name in names + manifest["training_files"] + [MANIFEST_NAME]:
+        client.fput_object(
+            bucket, f"{ARTIFACTS_PREFIX}/{version}/{name}", os.path.join(path, name)
+        )
+    pointer = json.dumps({"version": version}).encode()
+    client.put_object(bucket, LATEST_KEY, io.BytesIO(pointer), length=len(pointer))
+    logger.info(f"Model artifact {version} uploaded to MinIO")
+
+
+def get_latest_version(client: Minio, bucket: str) -> str:
+    response = client.get_object(bucket, LATEST_KEY)
+    try:
+        return json.loads(response.read())["version"]
+    finally:
+        response.close()
+        response.release_conn()
+
+
+def download_file(client: Minio, bucket: str, key: str, local_path: str) -> None:
+    """Скачивает файл атомарно: во временный файл, затем os.replace"""
+    if os.path.exists(local_path):
+        return
+    os.makedirs(os.path.dirname(local_path), exist_ok=True)
+    tmp_path = f"{local_path}.{os.getpid()}.tmp"
+    client.fget_object(bucket, key, tmp_path)
+    os.replace(tmp_path, local_path)
+
+
+def download_artifact(
+    client: Minio,
+    bucket: str,
+    version: str,
+    cache_dir: str,
+    with_training: bool = False,
+) -> str:
+    """
+    Скачивает версию в cache_dir/<version> (уже скачанные файлы переиспользуются)
+    и возвращает путь к локальному каталогу.
+    """
+    path = os.path.join(cache_dir, version)
+    prefix = f"{ARTIFACTS_PREFIX}/{version}"
+    manifest_path = os.path.join(path, MANIFEST_NAME)
+    download_file(client, bucket, f"{prefix}/{MANIFEST_NAME}", manifest_path)
+
+    manifest = read_manifest(path)
+    names = [info["file"] for info in manifest["arrays"].values()]
+    if with_training:
+        names += manifest["training_files"]
+    for name in names:
+        download_file(client, bucket, f"{prefix}/{name}", os.path.join(path, name))
+    return path
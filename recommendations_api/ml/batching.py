@@ -0,0 +1,129 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from core.config import settings
+from core.metrics import SCORING_BATCH_SIZE
+from ml.ranking import score_top_k
+from ml.scoring import ScoringExecutor
+from ml.snapshot import ModelSnapshot
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def score_batch(
+    snapshot: ModelSnapshot,
+    model_type: str,
+    users: np.ndarray,
+    excludes: list,
+    k: int,
+) -> list:
+    """
+    Top-k фильмов для блока пользователей одним матричным произведением.
+
+    excludes — индексы исключаемых фильмов для каждого пользователя.
+    Возвращает по массиву индексов фильмов на пользователя (без исключённых).
+    """
+    user_vectors, item_vectors, item_biases = snapshot.factors[model_type]
+    rows = np.repeat(np.arange(len(users)), [len(exclude) for exclude in excludes])
+    cols = np.concatenate(excludes) if excludes else np.empty(0, dtype=np.int64)
+    seen = csr_matrix(
+        (np.ones(len(cols), dtype=np.float32), (rows, cols)),
+        shape=(len(users), len(item_vectors)),
+    )
+    indices, scores = score_top_k(
+        user_vectors[users], item_vectors.T, k, item_biases=item_biases, user_items=seen
+    )
+    return [row[np.isfinite(row_scores)] for row, row_scores in zip(indices, scores)]
+
+
+@dataclass
+class Batch:
+    snapshot: ModelSnapshot
+    model_type: str
+    requests: list = field(default_factory=list)  # (user_idx, exclude, n, future)
+    timer: asyncio.TimerHandle = None
+
+
+class MicroBatcher:
+    """
+    Динамический micro-batching скоринга запросов.
+
+    Промахи кэша, пришедшие почти одновременно, собираются в пачку: она
+    отправляется в пул скоринга через max_wait_ms после первого запроса или
+    сразу при наборе max_batch запросов. Пачка считается одним произведением
+    блока пользователей на матрицу фильмов (как в пакетном предрасчёте),
+    каждый вызывающий получает свой top-K. Пачки собираются отдельно для
+    каждого снимка и модели: запрос всегда скорится на том снимке, который
+    он взял в начале.
+    """
+
+    def __init__(
+        self,
+        scoring: ScoringExecutor,
+        max_wait_ms: float = settings.SCORING_BATCH_MAX_WAIT_MS,
+        max_batch: int = settings.SCORING_BATCH_MAX_SIZE,
+    ):
+        self.scoring = scoring
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch = max_batch
+        self.batches = {}
+        self.tasks = set()
+
+    async def score(
+        self,
+        snapshot: ModelSnapshot,
+        model_type: str,
+        user_idx: int,
+        exclude: np.ndarray,
+        n: int,
+    ) -> np.ndarray:
+        """Индексы top-n фильмов пользователя; ждёт, пока пачка будет посчитана"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        key = (id(snapshot), model_type)
+        batch = self.batches.get(key)
+        if batch is None:
+            batch = self.batches[key] = Batch(snapshot, model_type)
+            batch.timer = loop.call_later(self.max_wait, self.flush, key)
+        batch.requests.append((user_idx, exclude, n, future))
+        if len(batch.requests) >= self.max_batch:
+            self.flush(key)
+        return await future
+
+    def flush(self, key: tuple):
+        batch = self.batches.pop(key, None)
+        if batch is None:
+            return
+        batch.timer.cancel()
+        SCORING_BATCH_SIZE.observe(len(batch.requests))
+        task = asyncio.get_running_loop().create_task(self.run_batch(batch))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def run_batch(self, batch: Batch):
+        requests = [request for request in batch.requests if not request[3].done()]
+        if not requests:
+            return  # Все вызывающие отменили ожидание
+        try:
+            results = await self.scoring.run(
+                score_batch,
+                batch.snapshot,
+                batch.model_type,
+                np.array([user_idx for user_idx, _, _, _ in requests]),
+                [exclude for _, exclude, _, _ in requests],
+                max(n for _, _, n, _ in requests),
+            )
+        except Exception as e:
+            logger.error(f"Error scoring batch of {len(requests)} requests: {e}")
+            for _, _, _, future in requests:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, _, n, future), top_items in zip(requests, results):
+            if not future.done():
+                future.set_result(top_items[:n])
@@ -0,0 +1,244 @@
+import logging
+from time import time
+
+import numpy as np
+from implicit.cpu._als import calculate_loss
+from implicit.cpu.als import AlternatingLeastSquares
+from implicit.utils import check_csr, check_random_state
+from lightfm import LightFM
+from scipy.sparse import csr_matrix
+
+from core.metrics import TRAIN_CONVERGENCE, TRAIN_ITERATIONS, TRAIN_TIME_SAVED
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class EarlyStopping:
+    """
+    Останов обучения по плато метрики.
+
+    Обучение останавливается, когда метрика patience раз подряд улучшилась
+    меньше чем на tolerance относительно лучшего значения (loss уменьшается,
+    метрики ранжирования — растут при maximize=True).
+    """
+
+    def __init__(self, tolerance: float, patience: int = 1, maximize: bool = False):
+        self.tolerance = tolerance
+        self.patience = patience
+        self.maximize = maximize
+        self.best = None
+        self.stalled = 0
+
+    def update(self, value: float) -> bool:
+        """Учитывает значение метрики очередной итерации; True — пора остановиться"""
+        if self.best is None:
+            self.best = value
+            return False
+        improvement = value - self.best if self.maximize else self.best - value
+        if improvement > self.tolerance * abs(self.best):
+            self.stalled = 0
+        else:
+            self.stalled += 1
+        if improvement > 0:
+            self.best = value
+        return self.stalled >= self.patience
+
+
+def holdout_split(matrix: csr_matrix, n_users: int, rng: np.random.Generator) -> tuple:
+    """
+    Откладывает по одному взаимодействию у n_users случайных пользователей
+    (только у тех, у кого их не меньше двух).
+
+    Возвращает (train, users, items): матрицу без отложенных взаимодействий
+    и отложенные пары пользователь-фильм.
+    """
+    counts = np.diff(matrix.indptr)
+    candidates = np.flatnonzero(counts >= 2)
+    users = np.sort(
+        rng.choice(candidates, min(n_users, len(candidates)), replace=False)
+    )
+    if not len(users):
+        return matrix, users, users
+
+    # Позиция отложенного взаимодействия в data/indices каждой выбранной строки
+    positions = matrix.indptr[users] + rng.integers(0, counts[users])
+    items = matrix.indices[positions]
+    keep = np.ones(matrix.nnz, dtype=bool)
+    keep[positions] = False
+
+    row_of = np.repeat(np.arange(matrix.shape[0]), counts)
+    train = csr_matrix(
+        (matrix.data[keep], (row_of[keep], matrix.indices[keep])), shape=matrix.shape
+    )
+    return train, users, items
+
+
+def hit_rate_at_k(
+    user_vectors: np.ndarray,
+    item_vectors: np.ndarray,
+    item_biases: np.ndarray,
+    train: csr_matrix,
+    users: np.ndarray,
+    items: np.ndarray,
+    k: int = 10,
+    block_size: int = 1024,
+) -> float:
+    """
+    Доля пользователей, у которых отложенный фильм попал в top-k.
+
+    user_vectors — векторы пользователей users (по строке на пользователя);
+    фильмы из train (уже известные взаимодействия) в ранжировании не участвуют.
+    """
+    if not len(users):
+        return 0.0
+    k = min(k, len(item_vectors))
+    hits = 0
+    for start in range(0, len(users), block_size):
+        end = start + block_size
+        scores = user_vectors[start:end] @ item_vectors.T
+        if item_biases is not None:
+            scores += item_biases
+        seen = train[users[start:end]].tocoo()
+        scores[seen.row, seen.col] = -np.inf
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        hits += int((top == items[start:end, None]).any(axis=1).sum())
+    return hits / len(users)
+
+
+def fit_als_until_plateau(
+    model: AlternatingLeastSquares,
+    user_items: csr_matrix,
+    tolerance: float,
+    patience: int,
+    loss_every: int = 1,
+) -> tuple:
+    """
+    Обучает ALS до плато функции потерь, не больше model.iterations итераций.
+
+    Итерации выполняет тот же решатель, что и fit, но матрица проверяется
+    и транспонируется один раз, а loss считается раз в loss_every итераций
+    (и после последней); patience считается в таких проверках. Отсутствующие
+    факторы инициализируются как в fit, перенесённые из предыдущей версии
+    продолжают обучение. Возвращает (длительности итераций, итоговый loss,
+    время подсчёта loss).
+    """
+    confidence = check_csr(user_items).astype(np.float32)
+    if model.alpha != 1.0:
+        confidence = model.alpha * confidence
+    confidence_t = confidence.T.tocsr()
+
+    random_state = check_random_state(model.random_state)
+    n_users, n_items = confidence.shape
+    if model.user_factors is None:
+        model.user_factors = (
+            random_state.random((n_users, model.factors), dtype=model.dtype) * 0.01
+        )
+    if model.item_factors is None:
+        model.item_factors = (
+            random_state.random((n_items, model.factors), dtype=model.dtype) * 0.01
+        )
+
+    stopping = EarlyStopping(tolerance, patience)
+    durations, loss, overhead = [], None, 0.0
+    for iteration in range(1, model.iterations + 1):
+        iteration_start = time()
+        for rows, factors, other_factors in (
+            (confidence, model.user_factors, model.item_factors),
+            (confidence_t, model.item_factors, model.user_factors),
+        ):
+            model.solver(
+                rows,
+                factors,
+                other_factors,
+                model.regularization,
+                num_threads=model.num_threads,
+            )
+        durations.append(time() - iteration_start)
+        if iteration % loss_every and iteration < model.iterations:
+            continue
+        loss_start = time()
+        loss = calculate_loss(
+            confidence,
+            model.user_factors,
+            model.item_factors,
+            model.regularization,
+            num_threads=model.num_threads,
+        )
+        overhead += time() - loss_start
+        if stopping.update(loss):
+            break
+    model._check_fit_errors()  # NaN в факторах, как после fit
+    return durations, loss, overhead
+
+
+def fit_lightfm_until_plateau(
+    model: LightFM,
+    user_items: csr_matrix,
+    item_features: csr_matrix,
+    max_epochs: int,
+    holdout_users: int,
+    tolerance: float,
+    patience: int,
+) -> tuple:
+    """
+    Обучает LightFM (fit_partial по эпохе) до плато hit rate@10 на отложенных
+    взаимодействиях, не больше max_epochs эпох. Возвращает (длительности
+    эпох, итоговый hit rate, время сверх эпох: оценка hit rate и финальная
+    эпоха).
+
+    Пока идёт подбор числа эпох, отложенные взаимодействия (по одному
+    у holdout_users пользователей) в обучение не попадают; после останова
+    модель проходит ещё одну эпоху по полной матрице, чтобы они не терялись.
+    Признаки пользователей единичные, поэтому представление пользователя
+    равно его эмбеддингу.
+    """
+    train, users, items = holdout_split(
+        user_items, holdout_users, np.random.default_rng(0)
+    )
+    interactions = train.tocoo()
+    stopping = EarlyStopping(tolerance, patience, maximize=True)
+    hit_rate, durations, overhead = 0.0, [], 0.0
+    for _ in range(max_epochs):
+        epoch_start = time()
+        model.fit_partial(interactions, item_features=item_features, epochs=1)
+        durations.append(time() - epoch_start)
+        if not len(users):
+            continue
+        eval_start = time()
+        item_biases, item_vectors = model.get_item_representations(item_features)
+        hit_rate = hit_rate_at_k(
+            model.user_embeddings[users], item_vectors, item_biases, train, users, items
+        )
+        overhead += time() - eval_start
+        if stopping.update(hit_rate):
+            break
+    if len(users):
+        final_start = time()
+        model.fit_partial(user_items.tocoo(), item_features=item_features, epochs=1)
+        overhead += time() - final_start
+    return durations, hit_rate, overhead
+
+
+def report_convergence(
+    model_type: str,
+    durations: list,
+    max_iterations: int,
+    value: float,
+    overhead: float = 0.0,
+):
+    """
+    Метрики обучения с ранним остановом: число итераций, итоговое значение
+    метрики сходимости и сэкономленное время — оценка по средней итерации
+    за вычетом overhead, времени на проверку сходимости (может быть < 0).
+    """
+    iterations = len(durations)
+    saved = (max_iterations - iterations) * float(np.mean(durations)) - overhead
+    TRAIN_ITERATIONS.labels(model=model_type).set(iterations)
+    TRAIN_CONVERGENCE.labels(model=model_type).set(value)
+    # Счётчик только растёт: проверки дороже сэкономленного видны лишь в журнале
+    TRAIN_TIME_SAVED.labels(model=model_type).inc(max(saved, 0.0))
+    logger.info(
+        f"{model_type.upper()} trained in {iterations}/{max_iterations} iterations "
+        f"(convergence metric {value:.4f}, ~{saved:.1f}s saved by early stopping)"
+    )
@@ -1,106 +1,263 @@
 import asyncio
 import logging
+import math
+from datetime import datetime, timedelta, timezone
+from time import time
 
-from prometheus_client import Gauge, start_http_server
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from prometheus_client import start_http_server
+from pymongo.errors import PyMongoError
 
-from core.config import db
+from core.config import db, settings
+from core.metrics import (
+    ALS_PRECISION,
+    ALS_RECALL,
+    ALS_SAMPLES,
+    EVALUATION_DURATION,
+    EVALUATION_WATERMARK,
+    LIGHTFM_PRECISION,
+    LIGHTFM_RECALL,
+    LIGHTFM_SAMPLES,
+    RECOMMENDATION_QUALITY,
+    RECOMMENDATION_QUALITY_SAMPLES,
+)
+from ml.recommendation_logs import COLLECTION, LOG_PROJECTION, decode_log, encode_id
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Метрики Prometheus
-ALS_PRECISION = Gauge("als_precision_at_3", "Precision@3 for ALS model")
-ALS_RECALL = Gauge("als_recall_at_3", "Recall@3 for ALS model")
-ALS_SAMPLES = Gauge("als_samples", "Number of ALS samples evaluated")
-LIGHTFM_PRECISION = Gauge("lightfm_precision_at_3", "Precision@3 for LightFM model")
-LIGHTFM_RECALL = Gauge("lightfm_recall_at_3", "Recall@3 for LightFM model")
-LIGHTFM_SAMPLES = Gauge("lightfm_samples", "Number of LightFM samples evaluated")
-
-
-async def calculate_metrics():
-
-    # Собираем все рекомендации и обратную связь
-    recommendation_logs = await db["recommendation_logs"].find().to_list(None)
-    feedback_logs = await db["feedback"].find().to_list(None)
-
-    # Группируем обратную связь по session_id
-    feedback_by_session = {}
-    for fb in feedback_logs:
-        session_id = fb["session_id"]
-        if session_id not in feedback_by_session:
-            feedback_by_session[session_id] = []
-        feedback_by_session[session_id].append(
-            {"movie_id": str(fb["movie_id"]), "liked": fb["liked"]}
+STATE_COLLECTION = "evaluation_state"
+STATE_ID = "online"
+# Прежние метрики @3 для дашбордов: модель -> (precision, recall, samples)
+LEGACY_GAUGES = {
+    "als": (ALS_PRECISION, ALS_RECALL, ALS_SAMPLES),
+    "lightfm": (LIGHTFM_PRECISION, LIGHTFM_RECALL, LIGHTFM_SAMPLES),
+}
+
+
+def session_metrics(recommended: list, liked: set, ks: list) -> dict:
+    """
+    Метрики одной сессии: {"precision@3": ..., "ndcg@3": ..., ...}.
+
+    Рекомендации берутся в порядке выдачи, релевантны понравившиеся фильмы.
+    """
+    discounts = [1 / math.log2(position + 2) for position in range(max(ks))]
+    gains = [movie in liked for movie in recommended[: max(ks)]]
+    metrics = {}
+    for k in ks:
+        hits = sum(gains[:k])
+        shown = min(k, len(recommended))
+        dcg = sum(discount for discount, gain in zip(discounts, gains[:k]) if gain)
+        idcg = sum(discounts[: min(k, len(liked))])
+        metrics[f"precision@{k}"] = hits / shown if shown else 0.0
+        metrics[f"recall@{k}"] = hits / len(liked)
+        metrics[f"ndcg@{k}"] = dcg / idcg
+        metrics[f"hit_rate@{k}"] = float(hits > 0)
+    return metrics
+
+
+def accumulate(totals: dict, model_type: str, metrics: dict):
+    """Добавляет метрики сессии к накопленным суммам модели"""
+    model_totals = totals.setdefault(model_type, {"samples": 0})
+    model_totals["samples"] += 1
+    for name, value in metrics.items():
+        model_totals[name] = model_totals.get(name, 0.0) + value
+
+
+def averages(totals: dict) -> dict:
+    """Средние по моделям: {"als": {"precision@3": ..., ...}}"""
+    return {
+        model_type: {
+            name: value / model_totals["samples"]
+            for name, value in model_totals.items()
+            if name != "samples"
+        }
+        for model_type, model_totals in totals.items()
+        if model_totals["samples"]
+    }
+
+
+class OnlineEvaluator:
+    """
+    Инкрементальная онлайн-оценка качества рекомендаций по моделям.
+
+    Каждая сессия (лог рекомендаций) оценивается ровно один раз — когда
+    с её записи прошло settle секунд и обратная связь по ней собрана.
+    Водяной знак (время лога, до которого сессии уже учтены) и суммы метрик
+    по моделям хранятся в MongoDB, поэтому запуск читает только обратную
+    связь новее водяного знака и логи сессий с лайками из нового окна —
+    стоимость пропорциональна новым данным, а не всей истории. Группировка
+    обратной связи выполняется в MongoDB; для формата documents там же
+    делается и соединение с логами ($lookup по индексу session_id).
+    Обратная связь, пришедшая позже settle, не учитывается.
+    """
+
+    def __init__(
+        self,
+        database: AsyncIOMotorDatabase,
+        ks: list = settings.EVALUATION_K,
+        settle: int = settings.EVALUATION_SETTLE_SECONDS,
+        interval: float = settings.EVALUATION_INTERVAL,
+        layout: str = settings.RECOMMENDATION_LOGS_LAYOUT,
+        batch_size: int = settings.EVALUATION_BATCH_SIZE,
+    ):
+        self.db = database
+        self.ks = sorted(ks)
+        self.settle = settle
+        self.interval = interval
+        self.layout = layout
+        self.batch_size = batch_size
+        self.watermark = None
+        self.totals = {}
+
+    async def ensure_indexes(self):
+        await self.db["feedback"].create_index("timestamp")
+        await self.db[COLLECTION].create_index("session_id")
+
+    async def load_state(self):
+        state = await self.db[STATE_COLLECTION].find_one({"_id": STATE_ID})
+        if state is None:
+            return
+        if state.get("ks") != self.ks:
+            # Суммы по другим K не сопоставимы с новыми: считаем заново
+            logger.warning(f"Evaluation K changed to {self.ks}, starting over")
+            return
+        self.watermark = state["watermark"].replace(tzinfo=timezone.utc)
+        self.totals = state["totals"]
+
+    async def save_state(self):
+        # Водяной знак и суммы пишутся одним документом — атомарно
+        await self.db[STATE_COLLECTION].replace_one(
+            {"_id": STATE_ID},
+            {"watermark": self.watermark, "ks": self.ks, "totals": self.totals},
+            upsert=True,
+        )
+
+    def feedback_pipeline(self, window: dict) -> list:
+        pipeline = [
+            {"$match": {"liked": True, "timestamp": {"$gt": window["$gt"]}}},
+            {"$group": {"_id": "$session_id", "liked": {"$addToSet": "$movie_id"}}},
+        ]
+        if self.layout == "documents":
+            pipeline += [
+                {
+                    "$lookup": {
+                        "from": COLLECTION,
+                        "localField": "_id",
+                        "foreignField": "session_id",
+                        "pipeline": [
+                            {"$match": {"timestamp": window}},
+                            {"$project": LOG_PROJECTION},
+                        ],
+                        "as": "logs",
+                    }
+                },
+                {"$match": {"logs": {"$ne": []}}},
+            ]
+        return pipeline
+
+    async def find_logs(self, sessions: dict, window: dict) -> list:
+        """
+        Логи сессий из окна для time-series формата: session_id там двоичный
+        и не сравнивается со строкой из feedback в $lookup
+        """
+        keys = list(sessions) + [encode_id(session_id) for session_id in sessions]
+        cursor = self.db[COLLECTION].find(
+            {"session_id": {"$in": keys}, "timestamp": window}, LOG_PROJECTION
+        )
+        return await cursor.to_list(None)
+
+    async def sessions(self, window: dict):
+        """(понравившиеся фильмы, логи) сессий с лайками из окна"""
+        batch = {}
+        cursor = self.db["feedback"].aggregate(
+            self.feedback_pipeline(window), allowDiskUse=True
+        )
+        async for group in cursor:
+            liked = {str(movie_id) for movie_id in group["liked"]}
+            if self.layout == "documents":
+                yield liked, group["logs"]
+                continue
+            batch[group["_id"]] = liked
+            if len(batch) >= self.batch_size:
+                for log in await self.find_logs(batch, window):
+                    yield batch[decode_log(log)["session_id"]], [log]
+                batch = {}
+        if batch:
+            for log in await self.find_logs(batch, window):
+                yield batch[decode_log(log)["session_id"]], [log]
+
+    async def run_once(self) -> int:
+        """Оценивает сессии нового окна; возвращает их число"""
+        upper = datetime.now(timezone.utc) - timedelta(seconds=self.settle)
+        if self.watermark is not None and upper <= self.watermark:
+            return 0
+        # Первый запуск без водяного знака проходит всю историю
+        lower = self.watermark or datetime.min.replace(tzinfo=timezone.utc)
+        window = {"$gt": lower, "$lte": upper}
+
+        start_time = time()
+        totals = {
+            model_type: dict(values) for model_type, values in self.totals.items()
+        }
+        evaluated = 0
+        async for liked, logs in self.sessions(window):
+            for log in logs:
+                rec = decode_log(log)
+                model_type = rec["source"] or rec["model_type"] or "unknown"
+                metrics = session_metrics(rec["recommendations"], liked, self.ks)
+                accumulate(totals, model_type, metrics)
+                evaluated += 1
+
+        self.totals, self.watermark = totals, upper
+        await self.save_state()
+        EVALUATION_DURATION.observe(time() - start_time)
+        self.publish()
+        logger.info(
+            f"Evaluated {evaluated} sessions up to {upper.isoformat()} "
+            f"in {time() - start_time:.2f}s"
         )
+        return evaluated
+
+    def publish(self):
+        if self.watermark is not None:
+            EVALUATION_WATERMARK.set(self.watermark.timestamp())
+        for model_type, metrics in averages(self.totals).items():
+            RECOMMENDATION_QUALITY_SAMPLES.labels(model=model_type).set(
+                self.totals[model_type]["samples"]
+            )
+            for name, value in metrics.items():
+                metric, k = name.split("@")
+                RECOMMENDATION_QUALITY.labels(model=model_type, metric=metric, k=k).set(
+                    value
+                )
+            if model_type in LEGACY_GAUGES and "precision@3" in metrics:
+                precision, recall, samples = LEGACY_GAUGES[model_type]
+                precision.set(metrics["precision@3"])
+                recall.set(metrics["recall@3"])
+                samples.set(self.totals[model_type]["samples"])
+            logger.info(
+                f"{model_type}: "
+                + ", ".join(f"{name}={value:.4f}" for name, value in metrics.items())
+            )
 
-    # Вычисляем метрики
-    als_precision, als_recall, als_count = 0, 0, 0
-    lightfm_precision, lightfm_recall, lightfm_count = 0, 0, 0
-    k = 3  # Precision@3 и Recall@3
-
-    for rec in recommendation_logs:
-        session_id = rec["session_id"]
-        model_type = rec.get("source", rec.get("model_type", "unknown"))  
-        # Используем source, с fallback на model_type
-        recommended = set(rec["recommendations"])
-        feedback = feedback_by_session.get(session_id, [])
-
-        if not feedback:
-            continue
-
-        liked = set(fb["movie_id"] for fb in feedback if fb["liked"])
-        total_liked = len(liked)
-
-        if not total_liked:
-            continue
-
-        # Precision@K
-        relevant = len(recommended.intersection(liked))
-        precision = relevant / min(k, len(recommended))
-
-        # Recall@K
-        recall = relevant / total_liked if total_liked > 0 else 0
-
-        if model_type == "als":
-            als_precision += precision
-            als_recall += recall
-            als_count += 1
-        else:  # lightfm
-            lightfm_precision += precision
-            lightfm_recall += recall
-            lightfm_count += 1
-        # Игнорируем "popular" или другие значения source
-
-    # Средние значения
-    als_precision = als_precision / als_count if als_count > 0 else 0
-    als_recall = als_recall / als_count if als_count > 0 else 0
-    lightfm_precision = lightfm_precision / lightfm_count if lightfm_count > 0 else 0
-    lightfm_recall = lightfm_recall / lightfm_count if lightfm_count > 0 else 0
-
-    # Обновляем метрики Prometheus
-    ALS_PRECISION.set(als_precision)
-    ALS_RECALL.set(als_recall)
-    ALS_SAMPLES.set(als_count)
-    LIGHTFM_PRECISION.set(lightfm_precision)
-    LIGHTFM_RECALL.set(lightfm_recall)
-    LIGHTFM_SAMPLES.set(lightfm_count)
-
-    logger.info(
-        f"ALS Precision@3: {als_precision:.4f}, Recall@3: {als_recall:.4f}, Samples: {als_count}"
-    )
-    logger.info(
-        f"LightFM Precision@3: {lightfm_precision:.4f}, Recall@3: {lightfm_recall:.4f}, Samples: {lightfm_count}"
-    )
-
-    # Ждём перед следующим вычислением (1 час)
-    await asyncio.sleep(3600)
+    async def run(self):
+        await self.ensure_indexes()
+        await self.load_state()
+        self.publish()
+        while True:
+            try:
+                await self.run_once()
+            except PyMongoError as e:
+                logger.error(f"Evaluation run failed: {e}")
+            await asyncio.sleep(self.interval)
 
 
 async def main():
     # Запускаем сервер Prometheus на порту 8002
     start_http_server(8002)
     logger.info("Started Prometheus metrics server on port 8002")
-    await calculate_metrics()
+    await OnlineEvaluator(db).run()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,306 @@
+import uuid
+
+import numpy as np
+
+UUID_LENGTH = 36
+# Позиции шестнадцатеричных символов в каноническом UUID (без дефисов)
+UUID_HEX_POSITIONS = np.array(
+    [i for i in range(UUID_LENGTH) if i not in (8, 13, 18, 23)], dtype=np.intp
+)
+UUID_DASH_POSITIONS = np.array([8, 13, 18, 23], dtype=np.intp)
+HEX_DIGITS = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)
+# ASCII-код -> значение полубайта, 255 — не шестнадцатеричная цифра
+HEX_VALUES = np.full(256, 255, dtype=np.uint8)
+HEX_VALUES[HEX_DIGITS] = np.arange(16, dtype=np.uint8)
+# Размер блока при упаковке (строки U37 занимают ~150 байт, ограничиваем пик памяти)
+PACK_CHUNK_SIZE = 1 << 20
+# Пачки до этого размера упаковываются через uuid.UUID: у numpy выше накладные расходы
+SMALL_BATCH_SIZE = 16
+UINT64_MASK = (1 << 64) - 1
+
+
+def pack_uuids(ids) -> tuple:
+    """
+    Упаковывает строки UUID в 16-байтовые ключи без цикла на Python.
+
+    Возвращает (packed, valid): массив dtype S16 и маску строк, которые
+    являются каноническими UUID (нижний регистр, с дефисами) — только они
+    однозначно восстанавливаются обратно.
+    """
+    ids = ids if isinstance(ids, list) else list(ids)
+    if len(ids) <= SMALL_BATCH_SIZE:
+        packed, valid = [], []
+        for id_ in ids:
+            try:
+                key = uuid.UUID(id_)
+                is_valid = str(key) == id_
+            except (AttributeError, TypeError, ValueError):
+                is_valid = False
+            packed.append(key.bytes if is_valid else bytes(16))
+            valid.append(is_valid)
+        return np.array(packed, dtype="S16"), np.array(valid, dtype=bool)
+
+    if len(ids) > PACK_CHUNK_SIZE:
+        chunks = []
+        for start in range(0, len(ids), PACK_CHUNK_SIZE):
+            end = start + PACK_CHUNK_SIZE
+            chunks.append(pack_uuids(ids[start:end]))
+        return (
+            np.concatenate([packed for packed, _ in chunks]),
+            np.concatenate([valid for _, valid in chunks]),
+        )
+
+    # U37: более длинные строки не обрезаются до 36 символов незаметно
+    text = np.asarray(ids, dtype=f"U{UUID_LENGTH + 1}")
+    codes = text.view(np.uint32).reshape(len(text), UUID_LENGTH + 1)
+
+    nibbles = HEX_VALUES[np.minimum(codes[:, UUID_HEX_POSITIONS], 255)]
+    valid = (
+        (np.char.str_len(text) == UUID_LENGTH)
+        & (codes[:, UUID_DASH_POSITIONS] == ord("-")).all(axis=1)
+        & (nibbles != 255).all(axis=1)
+    )
+    packed = (nibbles[:, 0::2] << 4) | nibbles[:, 1::2]
+    packed[~valid] = 0
+    return np.ascontiguousarray(packed).view("S16").ravel(), valid
+
+
+def unpack_uuids(packed: np.ndarray) -> np.ndarray:
+    """Обратное к pack_uuids: 16-байтовые ключи -> строки UUID (dtype U36)"""
+    raw = np.frombuffer(
+        np.ascontiguousarray(packed, dtype="S16").tobytes(), dtype=np.uint8
+    ).reshape(len(packed), 16)
+    chars = np.full((len(packed), UUID_LENGTH), ord("-"), dtype=np.uint8)
+    chars[:, UUID_HEX_POSITIONS[0::2]] = HEX_DIGITS[raw >> 4]
+    chars[:, UUID_HEX_POSITIONS[1::2]] = HEX_DIGITS[raw & 0x0F]
+    return chars.view(f"S{UUID_LENGTH}").ravel().astype(f"U{UUID_LENGTH}")
+
+
+def split_uuid_keys(packed: np.ndarray) -> tuple:
+    """16-байтовые ключи -> старшие и младшие 8 байт как uint64 (порядок сохраняется)"""
+    words = np.frombuffer(
+        np.ascontiguousarray(packed, dtype="S16").tobytes(), dtype=">u8"
+    ).astype(np.uint64)
+    return np.ascontiguousarray(words[0::2]), np.ascontiguousarray(words[1::2])
+
+
+def join_uuid_keys(hi: np.ndarray, lo: np.ndarray) -> np.ndarray:
+    words = np.empty((len(hi), 2), dtype=">u8")
+    words[:, 0] = hi
+    words[:, 1] = lo
+    return words.view("S16").ravel()
+
+
+def index_dtype(size: int):
+    return np.int32 if size < np.iinfo(np.int32).max else np.int64
+
+
+class IdIndex:
+    """
+    Компактная таблица соответствия строковых id и индексов строк модели.
+
+    Ключи хранятся отсортированными: UUID — двумя массивами uint64 (старшие
+    и младшие 8 байт), прочие id — строками байт фиксированной длины.
+    positions переводит позицию в сортировке в индекс, ranks — обратно.
+    Пачка id ищется бинарным поиском (np.searchsorted) по отсортированным
+    запросам. Итого 24 байта на UUID вместо ~120 у list + dict, а все
+    массивы сохраняются в артефакт и открываются через mmap без построения
+    словарей при загрузке.
+    """
+
+    def __init__(
+        self,
+        keys: np.ndarray,
+        lo: np.ndarray,
+        positions: np.ndarray,
+        ranks: np.ndarray,
+    ):
+        self.keys = keys
+        self.lo = lo  # None для строковых ключей
+        self.positions = positions
+        self.ranks = ranks
+
+    @property
+    def packed_uuids(self) -> bool:
+        return self.lo is not None
+
+    @classmethod
+    def from_keys(cls, keys: np.ndarray, lo: np.ndarray = None) -> "IdIndex":
+        """Таблица по ключам, перечисленным в порядке индексов"""
+        if lo is not None:
+            order = np.lexsort((lo, keys))
+        else:
+            order = np.argsort(keys, kind="stable")
+        dtype = index_dtype(len(keys))
+        ranks = np.empty(len(keys), dtype=dtype)
+        ranks[order] = np.arange(len(keys), dtype=dtype)
+        return cls(
+            keys[order],
+            None if lo is None else lo[order],
+            order.astype(dtype),
+            ranks,
+        )
+
+    @classmethod
+    def from_ids(cls, ids) -> "IdIndex":
+        ids = list(ids)
+        packed, valid = pack_uuids(ids)
+        if valid.all():
+            return cls.from_keys(*split_uuid_keys(packed))
+        return cls.from_keys(np.array([id_.encode() for id_ in ids], dtype="S"))
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(array.nbytes for array in self.to_arrays().values())
+
+    def __contains__(self, id_) -> bool:
+        return self.get(id_) is not None
+
+    def __iter__(self):
+        return iter(self.ids_at(np.arange(len(self))))
+
+    def encode(self, ids: list) -> tuple:
+        """(keys, lo, valid) для пачки id в формате таблицы"""
+        if self.packed_uuids:
+            packed, valid = pack_uuids(ids)
+            return (*split_uuid_keys(packed), valid)
+        keys = np.array([id_.encode() for id_ in ids], dtype="S")
+        return keys, None, np.ones(len(ids), dtype=bool)
+
+    def lookup(self, ids) -> np.ndarray:
+        """Индексы для пачки id; -1 для отсутствующих"""
+        ids = list(ids)
+        if not ids or not len(self):
+            return np.full(len(ids), -1, dtype=np.int64)
+        return self.lookup_keys(*self.encode(ids))
+
+    def lookup_keys(
+        self, keys: np.ndarray, lo: np.ndarray = None, valid: np.ndarray = None
+    ) -> np.ndarray:
+        """Индексы для ключей в формате таблицы (см. encode); -1 для отсутствующих"""
+        result = np.full(len(keys), -1, dtype=np.int64)
+        if not len(keys) or not len(self):
+            return result
+        if valid is None:
+            valid = np.ones(len(keys), dtype=bool)
+
+        # Отсортированные запросы обходят таблицу последовательно (кэш процессора)
+        query_order = np.argsort(keys, kind="stable")
+        queries = keys[query_order]
+        found_at = np.minimum(np.searchsorted(self.keys, queries), len(self) - 1)
+        found = self.keys[found_at] == queries
+        if lo is not None:
+            query_lo = lo[query_order]
+            lo_match = self.lo[found_at] == query_lo
+            # Разные UUID с одинаковыми старшими 8 байтами: ищем среди них по младшим
+            for i in np.flatnonzero(found & ~lo_match):
+                start = found_at[i]
+                end = np.searchsorted(self.keys, queries[i], side="right")
+                offset = np.searchsorted(self.lo[start:end], query_lo[i])
+                if start + offset < end and self.lo[start + offset] == query_lo[i]:
+                    found_at[i] = start + offset
+                    lo_match[i] = True
+            found &= lo_match
+        found &= valid[query_order]
+
+        result[query_order[found]] = self.positions[found_at[found]]
+        return result
+
+    def get(self, id_, default=None):
+        """Индекс одного id (путь запроса: без создания промежуточных массивов)"""
+        if self.packed_uuids:
+            try:
+                key = uuid.UUID(id_)
+            except (AttributeError, TypeError, ValueError):
+                return default
+            if str(key) != id_:
+                return default
+            hi, lo = np.uint64(key.int >> 64), np.uint64(key.int & UINT64_MASK)
+        else:
+            hi, lo = id_.encode(), None
+
+        position = int(np.searchsorted(self.keys, hi))
+        while position < len(self) and self.keys[position] == hi:
+            if lo is None or self.lo[position] == lo:
+                return int(self.positions[position])
+            position += 1
+        return default
+
+    def map_to(self, other: "IdIndex") -> np.ndarray:
+        """
+        Индекс в other для каждого индекса этой таблицы, -1 — id в other нет.
+
+        Таблицы одного формата сопоставляются по ключам без декодирования id
+        (перенос факторов между версиями моделей).
+        """
+        if self.packed_uuids != other.packed_uuids:
+            return other.lookup(list(self))
+        return other.lookup_keys(self.keys, self.lo)[self.ranks]
+
+    def ids_at(self, indices) -> list:
+        """id по индексам строк модели"""
+        sorted_at = self.ranks[np.asarray(indices, dtype=np.int64)]
+        if self.packed_uuids:
+            packed = join_uuid_keys(self.keys[sorted_at], self.lo[sorted_at])
+            return unpack_uuids(packed).tolist()
+        return [key.decode() for key in self.keys[sorted_at]]
+
+    def extend(self, new_ids) -> "IdIndex":
+        """
+        Новая таблица с добавленными в конец id (индексы старых не меняются).
+
+        Отсутствующие id дописываются в порядке первого появления; новые
+        ключи вставляются в отсортированные массивы слиянием за O(n) без
+        полной пересортировки.
+        """
+        new_ids = list(dict.fromkeys(new_ids))
+        new_ids = [id_ for id_, idx in zip(new_ids, self.lookup(new_ids)) if idx < 0]
+        if not new_ids:
+            return self
+        if self.packed_uuids and not pack_uuids(new_ids)[1].all():
+            # Появились id не в формате UUID — переходим на строковые ключи
+            return IdIndex.from_ids(list(self) + new_ids)
+
+        new_keys, new_lo, _ = self.encode(new_ids)
+        if new_lo is not None:
+            new_order = np.lexsort((new_lo, new_keys))
+        else:
+            new_order = np.argsort(new_keys, kind="stable")
+        insert_at = np.searchsorted(self.keys, new_keys[new_order], side="right")
+
+        # Для строковых ключей ширина dtype растёт до самого длинного id
+        dtype = np.promote_types(self.keys.dtype, new_keys.dtype)
+        keys = np.insert(self.keys.astype(dtype), insert_at, new_keys[new_order])
+        size = len(keys)
+        positions = np.insert(
+            np.asarray(self.positions, dtype=index_dtype(size)),
+            insert_at,
+            new_order + len(self),
+        )
+        lo = None
+        if new_lo is not None:
+            lo = np.insert(self.lo, insert_at, new_lo[new_order])
+            # Вставка по старшим 8 байтам не упорядочивает UUID, совпадающие по ним
+            if ((keys[1:] == keys[:-1]) & (lo[1:] < lo[:-1])).any():
+                by_index = np.argsort(positions)
+                return IdIndex.from_keys(keys[by_index], lo[by_index])
+
+        ranks = np.empty(size, dtype=positions.dtype)
+        ranks[positions] = np.arange(size, dtype=positions.dtype)
+        return IdIndex(keys, lo, positions, ranks)
+
+    def to_arrays(self) -> dict:
+        """Массивы таблицы для сохранения в артефакт модели"""
+        arrays = {"keys": self.keys, "positions": self.positions, "ranks": self.ranks}
+        if self.packed_uuids:
+            arrays["lo"] = self.lo
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays: dict) -> "IdIndex":
+        return cls(
+            arrays["keys"], arrays.get("lo"), arrays["positions"], arrays["ranks"]
+        )
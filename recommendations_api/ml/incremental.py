@@ -0,0 +1,189 @@
+import logging
+from time import time
+
+import numpy as np
+from implicit.cpu.als import AlternatingLeastSquares
+from implicit.utils import check_random_state
+from lightfm import LightFM
+from scipy.sparse import csr_matrix
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def pad_rows(array: np.ndarray, size: int) -> np.ndarray:
+    """Дополняет матрицу нулевыми строками до size строк"""
+    if len(array) >= size:
+        return array
+    padding = np.zeros((size - len(array), *array.shape[1:]), dtype=array.dtype)
+    return np.concatenate([array, padding])
+
+
+def touched_rows(matrix: csr_matrix) -> np.ndarray:
+    """Индексы непустых строк CSR-матрицы"""
+    return np.flatnonzero(np.diff(matrix.indptr))
+
+
+def solve_rows(
+    model: AlternatingLeastSquares,
+    rows: np.ndarray,
+    confidence: csr_matrix,
+    factors: np.ndarray,
+    other_factors: np.ndarray,
+):
+    """
+    Пересчитывает строки rows матрицы factors при фиксированных other_factors.
+
+    Используется тот же решатель, что и в fit (по умолчанию сопряжённые
+    градиенты, начиная с текущих значений строк): Cholesky из
+    partial_fit_users/partial_fit_items требует положительной
+    определённости, которой нет при весах взаимодействий меньше 1.
+    """
+    block = np.ascontiguousarray(factors[rows])
+    if model.alpha != 1.0:
+        confidence = model.alpha * confidence
+    model.solver(
+        confidence.astype(np.float32),
+        block,
+        other_factors,
+        model.regularization,
+        num_threads=model.num_threads,
+    )
+    factors[rows] = block
+
+
+def fold_in_als(
+    model: AlternatingLeastSquares,
+    user_items: csr_matrix,
+    delta: csr_matrix,
+    fold_in_items: bool = True,
+    iterations: int = 2,
+) -> dict:
+    """
+    Дообучение ALS только по строкам и столбцам, затронутым новыми данными.
+
+    user_items — накопленная матрица взаимодействий, delta — её приращение.
+    Факторы дополняются нулевыми строками под новых пользователей и фильмы,
+    затем для затронутых фильмов (если fold_in_items) и пользователей
+    решаются задачи наименьших квадратов при зафиксированных факторах другой
+    стороны. Фильмы пересчитываются первыми, чтобы новые фильмы получили
+    векторы раньше, чем по ним пересчитают пользователей. Остальные строки
+    не меняются, поэтому время растёт с размером приращения, а не всей истории.
+    """
+    start_time = time()
+    n_users, n_items = user_items.shape
+    model.user_factors = pad_rows(model.user_factors, n_users)
+    model.item_factors = pad_rows(model.item_factors, n_items)
+
+    users = touched_rows(delta)
+    items = np.unique(delta.indices) if fold_in_items else np.empty(0, dtype=int)
+    # Выбор столбцов CSR — один линейный проход по матрице, без решения задач
+    item_users = user_items[:, items].T.tocsr()
+    user_rows = user_items[users]
+    for _ in range(iterations):
+        if len(items):
+            solve_rows(model, items, item_users, model.item_factors, model.user_factors)
+        if len(users):
+            solve_rows(model, users, user_rows, model.user_factors, model.item_factors)
+
+    duration = time() - start_time
+    logger.info(
+        f"ALS fold-in: {len(users)} users, {len(items)} items in {duration:.2f}s"
+    )
+    return {"users": len(users), "items": len(items), "duration": duration}
+
+
+def new_lightfm_rows(model: LightFM, size: int) -> dict:
+    """Состояние size новых признаков LightFM, инициализированное как в _initialize"""
+    shape = (size, model.no_components)
+    gradient_init = 1.0 if model.learning_schedule == "adagrad" else 0.0
+    return {
+        "embeddings": (
+            (model.random_state.rand(*shape) - 0.5) / model.no_components
+        ).astype(np.float32),
+        "embedding_gradients": np.full(shape, gradient_init, dtype=np.float32),
+        "embedding_momentum": np.zeros(shape, dtype=np.float32),
+        "biases": np.zeros(size, dtype=np.float32),
+        "bias_gradients": np.full(size, gradient_init, dtype=np.float32),
+        "bias_momentum": np.zeros(size, dtype=np.float32),
+    }
+
+
+def grow_lightfm(model: LightFM, n_user_features: int, n_item_features: int):
+    """
+    Добавляет эмбеддинги для новых признаков пользователей и фильмов.
+
+    Без матриц признаков LightFM использует единичные (признак = id), поэтому
+    для новых пользователей и фильмов нужны новые строки эмбеддингов;
+    fit_partial сам их не создаёт.
+    """
+    if model.user_embeddings is None:
+        return  # Модель ещё не обучалась: fit_partial инициализирует всё сам
+    for prefix, size in (("user", n_user_features), ("item", n_item_features)):
+        extra = size - len(getattr(model, f"{prefix}_embeddings"))
+        if extra <= 0:
+            continue
+        for name, new_rows in new_lightfm_rows(model, extra).items():
+            attribute = f"{prefix}_{name}"
+            setattr(
+                model, attribute, np.concatenate([getattr(model, attribute), new_rows])
+            )
+
+
+def aligned_rows(previous: np.ndarray, mapping: np.ndarray, init: np.ndarray):
+    """init со строками previous для сохранившихся id (mapping[i] >= 0)"""
+    known = mapping >= 0
+    init[known] = previous[mapping[known]]
+    return init
+
+
+def warm_start_als(
+    model: AlternatingLeastSquares,
+    user_vectors: np.ndarray,
+    item_vectors: np.ndarray,
+    user_map: np.ndarray,
+    item_map: np.ndarray,
+) -> bool:
+    """
+    Начальные факторы ALS из предыдущей версии: строки сохранившихся
+    пользователей и фильмов переносятся по id, новые инициализируются
+    случайно, как в implicit (random * 0.01). fit продолжит с этих значений.
+    """
+    if user_vectors.shape[1] != model.factors:
+        return False
+    rng = check_random_state(model.random_state)
+    model.user_factors, model.item_factors = (
+        aligned_rows(
+            previous,
+            mapping,
+            rng.random((len(mapping), model.factors), dtype=np.float32) * 0.01,
+        )
+        for previous, mapping in ((user_vectors, user_map), (item_vectors, item_map))
+    )
+    return True
+
+
+def warm_start_lightfm(
+    model: LightFM, previous: LightFM, user_map: np.ndarray, item_map: np.ndarray
+) -> bool:
+    """
+    Начальное состояние LightFM из предыдущей модели: эмбеддинги, смещения
+    и аккумуляторы adagrad сохранившихся признаков (пользователей и жанров),
+    новые признаки инициализируются как в _initialize. fit_partial продолжит
+    с этого состояния.
+    """
+    if (
+        previous.item_embeddings is None
+        or previous.no_components != model.no_components
+        or previous.learning_schedule != model.learning_schedule
+    ):
+        return False
+    for prefix, mapping in (("user", user_map), ("item", item_map)):
+        for name, init in new_lightfm_rows(model, len(mapping)).items():
+            attribute = f"{prefix}_{name}"
+            setattr(
+                model,
+                attribute,
+                aligned_rows(getattr(previous, attribute), mapping, init),
+            )
+    return True
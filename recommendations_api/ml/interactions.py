@@ -0,0 +1,239 @@
+import asyncio
+import logging
+import resource
+from dataclasses import dataclass
+from time import time
+
+import numpy as np
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from scipy.sparse import csr_matrix
+
+from core.config import settings
+from core.metrics import INTERACTIONS_LOAD_MEMORY, INTERACTIONS_LOAD_THROUGHPUT
+from ml.id_index import IdIndex, pack_uuids, split_uuid_keys, unpack_uuids
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def watched_weights(docs: list) -> np.ndarray:
+    return np.where([doc["complete"] for doc in docs], 1.0, 0.5)
+
+
+def like_weights(docs: list) -> np.ndarray:
+    return np.array([doc["rating"] for doc in docs], dtype=np.float32) / 10.0
+
+
+def bookmark_weights(docs: list) -> np.ndarray:
+    return np.full(len(docs), 0.3)
+
+
+# Коллекция -> (проекция, веса взаимодействий для блока документов)
+INTERACTION_SOURCES = {
+    "watched_movies": ({"complete": 1}, watched_weights),
+    "likes": ({"rating": 1}, like_weights),
+    "bookmarks": ({}, bookmark_weights),
+}
+
+
+def current_rss() -> int:
+    """Текущий RSS процесса в байтах (Linux, /proc/self/statm)"""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * resource.getpagesize()
+
+
+def peak_rss() -> int:
+    """Пик RSS процесса (VmHWM) в байтах с последнего сброса"""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) * 1024
+    raise OSError("VmHWM is not available")
+
+
+class MemoryGrowth:
+    """
+    Прирост RSS процесса за время загрузки, а не пик за всю жизнь процесса
+    (ru_maxrss в API и воркере отражал бы самый тяжёлый из прошлых этапов).
+
+    В начале пик RSS (VmHWM) сбрасывается до текущего значения, в конце
+    из него вычитается RSS начала. Если сбросить пик нельзя, считается
+    прирост RSS к концу загрузки (нижняя оценка пика); без /proc — 0.
+    """
+
+    def __init__(self):
+        try:
+            self.start = current_rss()
+        except OSError:
+            self.start = None
+            return
+        try:
+            with open("/proc/self/clear_refs", "w") as f:
+                f.write("5")  # Сброс VmHWM
+            self.peak_reset = True
+        except OSError:
+            self.peak_reset = False
+
+    def peak(self) -> int:
+        if self.start is None:
+            return 0
+        end = peak_rss() if self.peak_reset else current_rss()
+        return max(end - self.start, 0)
+
+
+class IdColumn:
+    """
+    Колонка id, заполняемая блоками в заранее выделенный массив.
+
+    Пока встречаются только UUID, id хранятся упакованными в 16 байт;
+    при первом id другого формата колонка переходит на строки байт.
+    """
+
+    def __init__(self, capacity: int):
+        self.keys = np.empty(capacity, dtype="S16")
+        self.size = 0
+        self.packed_uuids = True
+
+    def values(self) -> np.ndarray:
+        return self.keys[: self.size]
+
+    def decode(self, keys: np.ndarray) -> list:
+        if self.packed_uuids:
+            return unpack_uuids(keys).tolist()
+        return [key.decode() for key in keys]
+
+    def append(self, ids: list):
+        if self.packed_uuids:
+            keys, valid = pack_uuids(ids)
+            if not valid.all():
+                self.keys = np.array(
+                    [id_.encode() for id_ in self.decode(self.values())], dtype="S"
+                )
+                self.packed_uuids = False
+        if not self.packed_uuids:
+            keys = np.array([id_.encode() for id_ in ids], dtype="S")
+
+        start, end = self.size, self.size + len(keys)
+        dtype = np.promote_types(self.keys.dtype, keys.dtype)
+        if end > len(self.keys) or dtype != self.keys.dtype:
+            # Документы могли добавиться после подсчёта — расширяем массив
+            grown = np.empty(max(end, 2 * len(self.keys)), dtype=dtype)
+            grown[:start] = self.values()
+            self.keys = grown
+        self.keys[start:end] = keys
+        self.size = end
+
+    def to_index(self, base: IdIndex = None) -> tuple:
+        """
+        Таблица id и индексы строк для значений колонки.
+
+        Без base таблица строится из уникальных ключей колонки; иначе
+        base дополняется новыми id (индексы существующих не меняются).
+        """
+        unique, rows = np.unique(self.values(), return_inverse=True)
+        if base is None or not len(base):
+            if self.packed_uuids:
+                # Уникальные ключи отсортированы: индекс в таблице = позиция в unique
+                return IdIndex.from_keys(*split_uuid_keys(unique)), rows
+            return IdIndex.from_keys(unique), rows
+        ids = self.decode(unique)
+        index = base.extend(ids)
+        return index, index.lookup(ids)[rows]
+
+
+@dataclass
+class InteractionMatrix:
+    """Матрица взаимодействий пользователь × фильм и таблицы id её строк и столбцов"""
+
+    matrix: csr_matrix
+    users: IdIndex
+    movies: IdIndex
+    rows: int  # Загружено взаимодействий (до суммирования повторов)
+    duration: float
+
+
+async def count_interactions(db: AsyncIOMotorDatabase, query: dict) -> int:
+    counts = await asyncio.gather(
+        *(db[collection].count_documents(query) for collection in INTERACTION_SOURCES)
+    )
+    return sum(counts)
+
+
+async def read_source(
+    db: AsyncIOMotorDatabase,
+    collection: str,
+    query: dict,
+    users: IdColumn,
+    movies: IdColumn,
+    weights: list,
+    batch_size: int,
+):
+    projection, weight_func = INTERACTION_SOURCES[collection]
+    cursor = (
+        db[collection]
+        .find(query, {"_id": 0, "user_id": 1, "movie_id": 1, **projection})
+        .batch_size(batch_size)
+    )
+    while docs := await cursor.to_list(length=batch_size):
+        # Блок заполняется без await: параллельные курсоры не перемешивают строки
+        users.append([str(doc["user_id"]) for doc in docs])
+        movies.append([str(doc["movie_id"]) for doc in docs])
+        weights.append(weight_func(docs).astype(np.float32))
+
+
+async def load_interaction_matrix(
+    db: AsyncIOMotorDatabase,
+    query: dict = None,
+    users: IdIndex = None,
+    movies: IdIndex = None,
+    batch_size: int = settings.INTERACTIONS_BATCH_SIZE,
+) -> InteractionMatrix:
+    """
+    Загружает взаимодействия (просмотры, лайки, закладки) сразу в CSR-матрицу.
+
+    Три курсора читаются параллельно блоками по batch_size документов
+    с проекцией только нужных полей. id складываются в заранее выделенные
+    колонки (UUID — по 16 байт), веса — в массивы float32; кортежи
+    и списки на каждое взаимодействие не создаются. Повторные пары
+    пользователь-фильм суммируются, как и раньше.
+
+    users/movies — таблицы id текущей модели для дообучения: новые id
+    добавляются в их конец, индексы старых строк и столбцов не меняются.
+    """
+    start_time = time()
+    memory = MemoryGrowth()
+    query = query or {}
+
+    capacity = await count_interactions(db, query)
+    user_column, movie_column, weights = IdColumn(capacity), IdColumn(capacity), []
+    await asyncio.gather(
+        *(
+            read_source(
+                db, collection, query, user_column, movie_column, weights, batch_size
+            )
+            for collection in INTERACTION_SOURCES
+        )
+    )
+
+    user_index, rows = user_column.to_index(users)
+    movie_index, cols = movie_column.to_index(movies)
+    data = np.concatenate(weights) if weights else np.empty(0, dtype=np.float32)
+    matrix = csr_matrix((data, (rows, cols)), shape=(len(user_index), len(movie_index)))
+
+    duration = time() - start_time
+    rows_per_second = user_column.size / duration if duration > 0 else 0.0
+    peak_growth = memory.peak()
+    INTERACTIONS_LOAD_THROUGHPUT.set(rows_per_second)
+    INTERACTIONS_LOAD_MEMORY.set(peak_growth)
+    logger.info(
+        f"Loaded {user_column.size} interactions in {duration:.2f}s "
+        f"({rows_per_second:.0f} rows/sec, "
+        f"peak RSS growth {peak_growth / 2**20:.0f} MB)"
+    )
+    return InteractionMatrix(
+        matrix=matrix,
+        users=user_index,
+        movies=movie_index,
+        rows=user_column.size,
+        duration=duration,
+    )
@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import uuid
+from time import time
+
+import numpy as np
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from redis.asyncio import Redis
+from scipy.sparse import csr_matrix
+
+from core.cache import cache_ttls, encode_entry
+from core.config import settings
+from core.experiments import ModelExperiment, model_experiment
+from core.metrics import PRECOMPUTE_DURATION, PRECOMPUTE_THROUGHPUT, PRECOMPUTE_USERS
+from ml.ranking import mix_new_movies, score_top_k
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Коллекции, фильмы из которых не попадают в выдачу, как в
+# RecommendationModel.excluded_items: ALS исключает все взаимодействия,
+# LightFM — только просмотренные фильмы
+EXCLUDED_SOURCES = {
+    "als": ("watched_movies", "likes", "bookmarks"),
+    "lightfm": ("watched_movies",),
+}
+
+
+async def load_seen(
+    db: AsyncIOMotorDatabase, snapshot, user_ids: list, model_type: str
+) -> tuple:
+    """
+    Исключаемые фильмы блока пользователей: CSR-маска (строка — пользователь
+    блока, столбец — фильм снимка) и множества id просмотренных фильмов
+    для отбора новых фильмов, как в онлайн-пути.
+    """
+    positions = {user_id: row for row, user_id in enumerate(user_ids)}
+    sources = EXCLUDED_SOURCES[model_type]
+    results = await asyncio.gather(
+        *(
+            db[collection]
+            .find(
+                {"user_id": {"$in": user_ids}}, {"_id": 0, "user_id": 1, "movie_id": 1}
+            )
+            .to_list(None)
+            for collection in sources
+        )
+    )
+
+    watched = [set() for _ in user_ids]
+    rows, movie_ids = [], []
+    for collection, docs in zip(sources, results):
+        for doc in docs:
+            row, movie_id = positions[str(doc["user_id"])], str(doc["movie_id"])
+            rows.append(row)
+            movie_ids.append(movie_id)
+            if collection == "watched_movies":
+                watched[row].add(movie_id)
+
+    cols = snapshot.movies.lookup(movie_ids)
+    known = cols >= 0
+    rows = np.asarray(rows, dtype=np.int64)[known]
+    seen = csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, cols[known])),
+        shape=(len(user_ids), len(snapshot.movies)),
+    )
+    return seen, watched
+
+
+async def precompute_recommendations(
+    model,
+    db: AsyncIOMotorDatabase,
+    redis: Redis,
+    model_type: str = "als",
+    n: int = settings.RECOMMENDATIONS_LIMITS,
+    block_size: int = settings.PRECOMPUTE_BLOCK_SIZE,
+    soft_ttl: int = settings.REDIS_CACHE_SOFT_TTL,
+    hard_ttl: int = settings.REDIS_CACHE_EXPIRE,
+    experiment: ModelExperiment = model_experiment,
+) -> dict:
+    """
+    Пакетный предрасчёт рекомендаций для пользователей, закреплённых
+    за моделью (core/experiments.py): API отдаёт пользователю выдачу
+    только этой модели, ключи другой модели не читались бы.
+    experiment=None — предрасчёт для всех пользователей снимка.
+
+    Пользователи обрабатываются блоками: взаимодействия блока читаются
+    из MongoDB одним запросом на коллекцию (исключаются те же фильмы,
+    что и в онлайн-пути), оценки считаются одним матричным произведением
+    латентных факторов, top-K выбирается через argpartition, а результаты
+    пишутся в Redis одним pipeline на блок.
+    TTL каждого ключа получает случайный разброс, чтобы записанные одним
+    прогоном ключи не устаревали одновременно.
+    """
+    start_time = time()
+
+    snapshot = model.snapshot
+    user_vectors, item_vectors, item_biases = snapshot.factors[model_type]
+
+    n_users = min(user_vectors.shape[0], len(snapshot.users))
+    # Каталог фильмов небольшой — раскодируем id один раз на весь прогон
+    movie_ids = np.array(
+        snapshot.movies.ids_at(np.arange(item_vectors.shape[0])), dtype=object
+    )
+
+    # Новые фильмы запрашиваются один раз, просмотренные отсеиваются по пользователю
+    new_movies = await model.get_new_movies(db, snapshot=snapshot)
+    if experiment is not None:
+        await experiment.reload(redis)  # Те же доли и соль, что у API
+
+    written = 0
+    for block_start in range(0, n_users, block_size):
+        block_end = min(block_start + block_size, n_users)
+        rows = np.arange(block_start, block_end)
+        user_ids = snapshot.users.ids_at(rows)
+        if experiment is not None:
+            assigned = [
+                experiment.model_for(user_id) == model_type for user_id in user_ids
+            ]
+            rows = rows[np.array(assigned, dtype=bool)]
+            user_ids = [user_id for user_id, keep in zip(user_ids, assigned) if keep]
+        if not user_ids:
+            continue
+        seen, watched = await load_seen(db, snapshot, user_ids, model_type)
+        indices, scores = score_top_k(
+            user_vectors[rows],
+            item_vectors.T,
+            n,
+            item_biases=item_biases,
+            user_items=seen,
+        )
+
+        pipe = redis.pipeline(transaction=False)
+        for row, user_id in enumerate(user_ids):
+            recommendations = movie_ids[indices[row][np.isfinite(scores[row])]].tolist()
+            unwatched = [movie for movie in new_movies if movie not in watched[row]]
+            recommendations = mix_new_movies(recommendations, unwatched, n)
+            payload = {
+                "source": model_type,
+                "recommendations": recommendations,
+                "session_id": str(uuid.uuid4()),
+            }
+            soft, hard = cache_ttls(soft_ttl, hard_ttl)
+            pipe.setex(
+                f"recommendations:{user_id}:{model_type}",
+                hard,
+                encode_entry(payload, soft),
+            )
+        await pipe.execute()
+        written += len(user_ids)
+        PRECOMPUTE_USERS.labels(model=model_type).inc(len(user_ids))
+
+    duration = time() - start_time
+    users_per_second = written / duration if duration > 0 else 0.0
+    PRECOMPUTE_DURATION.labels(model=model_type).observe(duration)
+    PRECOMPUTE_THROUGHPUT.labels(model=model_type).set(users_per_second)
+    logger.info(
+        f"Precomputed {model_type} recommendations for {written} users "
+        f"in {duration:.2f}s ({users_per_second:.0f} users/sec)"
+    )
+    return {
+        "model_type": model_type,
+        "users": written,
+        "duration": duration,
+        "users_per_second": users_per_second,
+    }
@@ -0,0 +1,76 @@
+import random
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Возвращает индексы k лучших элементов, отсортированные по убыванию score.
+
+    Работает как для вектора (один пользователь), так и для матрицы
+    (блок пользователей × каталог). Вместо полного argsort по каталогу
+    выполняется argpartition (O(n)) и сортируется только найденный top-K.
+    """
+    n_items = scores.shape[-1]
+    k = min(k, n_items)
+    if k <= 0:
+        return np.empty(scores.shape[:-1] + (0,), dtype=np.int64)
+
+    if k < n_items:
+        candidates = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    else:
+        candidates = np.broadcast_to(np.arange(n_items), scores.shape).copy()
+
+    candidate_scores = np.take_along_axis(scores, candidates, axis=-1)
+    order = np.argsort(-candidate_scores, axis=-1, kind="stable")
+    return np.take_along_axis(candidates, order, axis=-1)
+
+
+def mask_seen_items(scores: np.ndarray, user_items: csr_matrix) -> np.ndarray:
+    """
+    Исключает из выдачи фильмы, с которыми пользователи уже взаимодействовали.
+
+    scores — блок оценок (n_users × n_items), user_items — строки матрицы
+    взаимодействий для тех же пользователей. Маскирование выполняется
+    одной векторной операцией без цикла по пользователям.
+    """
+    user_items = csr_matrix(user_items)
+    rows = np.repeat(np.arange(user_items.shape[0]), np.diff(user_items.indptr))
+    scores[rows, user_items.indices] = -np.inf
+    return scores
+
+
+def score_top_k(
+    user_vectors: np.ndarray,
+    item_vectors_t: np.ndarray,
+    k: int,
+    item_biases: np.ndarray = None,
+    user_items: csr_matrix = None,
+):
+    """
+    Считает оценки для блока пользователей одним матричным произведением
+    и выбирает top-K для каждого.
+
+    item_vectors_t — транспонированная (factors × n_items) матрица фильмов.
+    Возвращает (indices, scores); позиции с -inf (уже просмотренные фильмы,
+    если каталог меньше k) вызывающий код должен отбросить.
+    """
+    scores = np.atleast_2d(user_vectors) @ item_vectors_t
+    if item_biases is not None:
+        scores += item_biases
+    if user_items is not None:
+        mask_seen_items(scores, user_items)
+    indices = top_k_indices(scores, k)
+    return indices, np.take_along_axis(scores, indices, axis=-1)
+
+
+def mix_new_movies(recommendations: list, new_movies: list, n: int) -> list:
+    """Подмешивает в выдачу новые фильмы (минимум 1, максимум треть от n)"""
+    n_unwatched = min(1, max(1, n // 3))
+    if new_movies and len(recommendations) >= n_unwatched:
+        recommendations = recommendations[:-n_unwatched]  # Убираем последние элементы
+        recommendations.extend(
+            random.sample(new_movies, min(n_unwatched, len(new_movies)))
+        )
+    return recommendations
@@ -0,0 +1,181 @@
+import logging
+import struct
+from datetime import datetime
+
+from bson import Binary
+from bson.binary import UUID_SUBTYPE
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import OperationFailure
+
+from core.config import settings
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+COLLECTION = "recommendation_logs"
+LAYOUTS = ("documents", "timeseries")
+# Поля, нужные для оценки качества, в обоих форматах
+LOG_PROJECTION = {
+    "_id": 0,
+    "session_id": 1,
+    "recommendations": 1,
+    "source": 1,
+    "model_type": 1,
+    "meta": 1,
+    "timestamp": 1,
+}
+
+
+def format_uuid(key: bytes) -> str:
+    """16 байт -> каноническая строка UUID (быстрее, чем str(uuid.UUID(bytes=...)))"""
+    text = key.hex()
+    return "-".join((text[:8], text[8:12], text[12:16], text[16:20], text[20:]))
+
+
+def uuid_key(id_) -> bytes:
+    """16 байт канонического UUID (нижний регистр, с дефисами) или None"""
+    if not isinstance(id_, str) or len(id_) != 36:
+        return None
+    if id_[8] != "-" or id_[13] != "-" or id_[18] != "-" or id_[23] != "-":
+        return None
+    text = id_.replace("-", "")
+    try:
+        key = bytes.fromhex(text)
+    except ValueError:
+        return None
+    # Сверка с hex() отсекает верхний регистр и пробелы, которые fromhex пропускает
+    return key if key.hex() == text else None
+
+
+def encode_id(id_: str):
+    """UUID -> Binary (16 байт вместо 36 символов); прочие id остаются строками"""
+    key = uuid_key(id_)
+    return id_ if key is None else Binary(key, UUID_SUBTYPE)
+
+
+def decode_id(value) -> str:
+    if isinstance(value, Binary) and value.subtype == UUID_SUBTYPE:
+        return format_uuid(value)
+    return value
+
+
+def pack_ids(ids: list):
+    """Список UUID фильмов -> один Binary из 16-байтовых ключей подряд"""
+    keys = [uuid_key(id_) for id_ in ids]
+    if None in keys:
+        return list(ids)
+    return Binary(b"".join(keys))
+
+
+def unpack_ids(value) -> list:
+    if isinstance(value, bytes):
+        return [format_uuid(key) for (key,) in struct.iter_unpack("16s", value)]
+    return list(value)
+
+
+def recommendation_log(
+    user_id: str,
+    model_type: str,
+    result: dict,
+    timestamp: datetime,
+    layout: str = settings.RECOMMENDATION_LOGS_LAYOUT,
+) -> dict:
+    """Документ recommendation_logs в формате layout"""
+    if layout == "documents":
+        return {
+            "user_id": user_id,
+            "model_type": model_type,
+            "source": result["source"],
+            "recommendations": result["recommendations"],
+            "session_id": result["session_id"],
+            "timestamp": timestamp,
+        }
+    # Time-series: модель и источник — метаполе бакета, id — в двоичном виде
+    return {
+        "timestamp": timestamp,
+        "meta": {"model": model_type, "source": result["source"]},
+        "user_id": encode_id(user_id),
+        "session_id": encode_id(result["session_id"]),
+        "recommendations": pack_ids(result["recommendations"]),
+    }
+
+
+def decode_log(doc: dict) -> dict:
+    """Документ любого формата -> поля со строковыми id, как в формате documents"""
+    meta = doc.get("meta")
+    decoded = {
+        "session_id": decode_id(doc.get("session_id")),
+        "recommendations": unpack_ids(doc.get("recommendations", [])),
+        "timestamp": doc.get("timestamp"),
+    }
+    if meta is not None:
+        decoded["model_type"] = meta.get("model")
+        decoded["source"] = meta.get("source")
+    else:
+        decoded["model_type"] = doc.get("model_type")
+        decoded["source"] = doc.get("source")
+    if "user_id" in doc:
+        decoded["user_id"] = decode_id(doc["user_id"])
+    return decoded
+
+
+def timeseries_options(ttl_days: int = settings.RECOMMENDATION_LOGS_TTL_DAYS) -> dict:
+    """Параметры create_collection для time-series коллекции логов"""
+    options = {
+        "timeseries": {
+            "timeField": "timestamp",
+            "metaField": "meta",
+            "granularity": "minutes",
+        }
+    }
+    if ttl_days > 0:
+        options["expireAfterSeconds"] = ttl_days * 86400
+    return options
+
+
+async def ensure_recommendation_logs(
+    db: AsyncIOMotorDatabase,
+    layout: str = settings.RECOMMENDATION_LOGS_LAYOUT,
+    ttl_days: int = settings.RECOMMENDATION_LOGS_TTL_DAYS,
+):
+    """
+    Готовит коллекцию логов под layout и срок хранения ttl_days (0 — бессрочно).
+
+    timeseries: создаёт time-series коллекцию или обновляет её
+    expireAfterSeconds. documents: TTL-индекс по timestamp. Существующая
+    обычная коллекция в time-series не превращается — для этого
+    scripts/migrate_recommendation_logs.py.
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown recommendation logs layout {layout}")
+
+    cursor = await db.list_collections(filter={"name": COLLECTION})
+    info = await cursor.to_list(None)
+    is_timeseries = bool(info) and info[0].get("type") == "timeseries"
+
+    if layout == "timeseries" and not info:
+        await db.create_collection(COLLECTION, **timeseries_options(ttl_days))
+        logger.info(f"Created time-series collection {COLLECTION}")
+        return
+    if is_timeseries:
+        await db.command(
+            "collMod", COLLECTION, expireAfterSeconds=ttl_days * 86400 or "off"
+        )
+    elif layout == "timeseries":
+        logger.warning(
+            f"{COLLECTION} is a regular collection; "
+            "run scripts/migrate_recommendation_logs.py to convert it"
+        )
+
+    if not is_timeseries and ttl_days > 0:
+        try:
+            await db[COLLECTION].create_index(
+                "timestamp", expireAfterSeconds=ttl_days * 86400, name="timestamp_ttl"
+            )
+        except OperationFailure:
+            # Индекс уже есть с другим сроком хранения
+            await db.command(
+                "collMod",
+                COLLECTION,
+                index={"name": "timestamp_ttl", "expireAfterSeconds": ttl_days * 86400},
+            )
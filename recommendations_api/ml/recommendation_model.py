@@ -1,9 +1,11 @@
-import io
+import asyncio
+import json
 import logging
+import os
 import pickle
-import random
 import uuid
-from datetime import datetime, timedelta
+import warnings
+from datetime import datetime, timedelta, timezone
 from time import time
 
 import implicit
@@ -12,17 +14,50 @@ from lightfm import LightFM
 from minio import Minio
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from prometheus_client import Counter, Gauge, Histogram
-from scipy.sparse import coo_matrix, csr_matrix
+from scipy.sparse import coo_matrix, csr_matrix, load_npz, save_npz
 from sklearn.preprocessing import MultiLabelBinarizer
 
 from core.config import settings
-from core.metrics import MATRIX_SIZE, TRAIN_COUNT, TRAIN_DURATION
+from core.metrics import (
+    MATRIX_SIZE,
+    TRAIN_COUNT,
+    TRAIN_DURATION,
+    TRAIN_WARM_START_RATIO,
+)
+from core.stages import stage
+from ml.artifacts import new_version
+from ml.batching import MicroBatcher
+from ml.convergence import (
+    fit_als_until_plateau,
+    fit_lightfm_until_plateau,
+    report_convergence,
+)
+from ml.id_index import IdIndex
+from ml.incremental import (
+    fold_in_als,
+    grow_lightfm,
+    pad_rows,
+    warm_start_als,
+    warm_start_lightfm,
+)
+from ml.interactions import (
+    InteractionMatrix,
+    count_interactions,
+    load_interaction_matrix,
+)
+from ml.ranking import mix_new_movies, top_k_indices
+from ml.registry import ModelRegistry
+from ml.scoring import ScoringExecutor
+from ml.snapshot import MODEL_TYPES, ModelSnapshot
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-ALS_MODEL_KEY = "als_model.pkl"
-LIGHTFM_MODEL_KEY = "lightfm_model.pkl"
+# Файлы состояния для дообучения (в инференс не загружаются)
+USER_ITEMS_FILE = "user_items.npz"
+ITEM_FEATURES_FILE = "item_features.npz"
+GENRES_FILE = "genres.json"  # Словарь жанров — столбцы item_features
+LIGHTFM_STATE_FILE = "lightfm_model.pkl"  # Модель с аккумуляторами adagrad
 
 # Новые метрики для рекомендаций
 
@@ -44,214 +79,284 @@ MODEL_STATUS = Gauge(
 )
 
 
+def movie_genres(movie: dict) -> list:
+    genres = movie.get("genres") or []
+    return genres if isinstance(genres, list) else [genres]
+
+
 class RecommendationModel:
-    def __init__(self):
-        self.als_model = implicit.als.AlternatingLeastSquares(factors=20, iterations=10)
-        self.lightfm_model = LightFM(no_components=20, learning_rate=0.05, loss="warp")
-        self.user_ids = []
-        self.movie_ids = []
-        self.user_to_idx = {}
-        self.movie_to_idx = {}
-        self.idx_to_movie = {}
-        self.als_user_item_matrix = None
-        self.lightfm_user_item_matrix = None
+    def __init__(self, load: bool = True):
+        """
+        load=False — без обращения к MinIO: модели загружаются позже
+        (load_async в API и задачах RQ) или не нужны (ml/replay.py)
+        """
+        self.als_factors = settings.ALS_FACTORS
+        self.lightfm_components = settings.LIGHTFM_COMPONENTS
+        self.reset_models()
+        # Состояние для дообучения (используется только воркером RQ)
+        self.user_item_matrix = None
         self.item_features = None
+        self.genres = None
+        # Текущая версия моделей для инференса; заменяется только целиком (publish)
+        self.snapshot = ModelSnapshot()
+        self.scoring = ScoringExecutor()
+        self.batcher = (
+            MicroBatcher(self.scoring)
+            if settings.SCORING_BATCH_MAX_WAIT_MS > 0
+            else None
+        )
         self.minio_client = Minio(
             settings.MINIO_ENDPOINT,
             access_key=settings.MINIO_ACCESS_KEY,
             secret_key=settings.MINIO_SECRET_KEY,
             secure=False,
         )
-        self.ensure_bucket()
-        # Сохраняем статус загрузки моделей
-        self.als_loaded = self.load_model(ALS_MODEL_KEY, "als")
-        self.lightfm_loaded = self.load_model(LIGHTFM_MODEL_KEY, "lightfm")
+        self.registry = ModelRegistry(self.minio_client)
+        # Готовность: первая загрузка из реестра завершена (успешно или нет)
+        self.ready = False
+        self.load_seconds = None
+        self.loaded_at = None
+        if load:
+            self.ensure_bucket()
+            self.load_models()
+            self.ready = True
 
         # Устанавливаем начальные значения статуса моделей
         MODEL_STATUS.labels(model_type="als").set(1 if self.als_loaded else 0)
         MODEL_STATUS.labels(model_type="lightfm").set(1 if self.lightfm_loaded else 0)
 
+    def reset_models(self):
+        """Необученные модели с параметрами по умолчанию"""
+        self.als_model = implicit.als.AlternatingLeastSquares(
+            factors=self.als_factors, iterations=10
+        )
+        self.lightfm_model = LightFM(
+            no_components=self.lightfm_components, learning_rate=0.05, loss="warp"
+        )
+
+    @property
+    def version(self) -> str:
+        return self.snapshot.version
+
+    @property
+    def als_loaded(self) -> bool:
+        return self.snapshot.is_loaded("als")
+
+    @property
+    def lightfm_loaded(self) -> bool:
+        return self.snapshot.is_loaded("lightfm")
+
     def ensure_bucket(self):
         if not self.minio_client.bucket_exists(settings.MINIO_BUCKET):
             self.minio_client.make_bucket(settings.MINIO_BUCKET)
             logger.info(f"Created MinIO bucket: {settings.MINIO_BUCKET}")
 
-    def save_models(self):
-        als_data = {
-            "model": self.als_model,
-            "user_ids": self.user_ids,
-            "movie_ids": self.movie_ids,
-            "user_to_idx": self.user_to_idx,
-            "movie_to_idx": self.movie_to_idx,
-            "idx_to_movie": self.idx_to_movie,
-            "user_item_matrix": self.als_user_item_matrix,
-        }
-        buffer = io.BytesIO()
-        pickle.dump(als_data, buffer)
-        buffer.seek(0)
-        self.minio_client.put_object(
-            settings.MINIO_BUCKET,
-            ALS_MODEL_KEY,
-            buffer,
-            length=buffer.getbuffer().nbytes,
-        )
-        logger.info(f"ALS model saved to MinIO: {ALS_MODEL_KEY}")
-        MODEL_STATUS.labels(model_type="als").set(1)  # Модель загружена
-
-        lightfm_data = {
-            "model": self.lightfm_model,
-            "user_ids": self.user_ids,
-            "movie_ids": self.movie_ids,
-            "user_to_idx": self.user_to_idx,
-            "movie_to_idx": self.movie_to_idx,
-            "idx_to_movie": self.idx_to_movie,
-            "user_item_matrix": self.lightfm_user_item_matrix,
-            "item_features": self.item_features,
-        }
-        buffer = io.BytesIO()
-        pickle.dump(lightfm_data, buffer)
-        buffer.seek(0)
-        self.minio_client.put_object(
-            settings.MINIO_BUCKET,
-            LIGHTFM_MODEL_KEY,
-            buffer,
-            length=buffer.getbuffer().nbytes,
-        )
-        logger.info(f"LightFM model saved to MinIO: {LIGHTFM_MODEL_KEY}")
-        MODEL_STATUS.labels(model_type="lightfm").set(1)  # Модель загружена
+    def publish(self, snapshot: ModelSnapshot, load_seconds: float = None):
+        """
+        Делает снимок текущим одной заменой ссылки; load_seconds — время
+        загрузки снимка из реестра (для /ready)
+        """
+        self.snapshot = snapshot
+        if load_seconds is not None:
+            self.load_seconds = load_seconds
+            self.loaded_at = datetime.now(timezone.utc)
+        for model_type in MODEL_TYPES:
+            MODEL_STATUS.labels(model_type=model_type).set(
+                1 if snapshot.is_loaded(model_type) else 0
+            )
+
+    def save_models(self, snapshot: ModelSnapshot):
+        """
+        Сохраняет снимок новой версией в MinIO и делает его текущим.
 
-    def load_model(self, key: str, model_type: str) -> bool:
+        Для инференса пишутся только массивы снимка: таблицы id (одна на обе
+        модели), факторы ALS, представления LightFM и ANN-индексы. Матрица
+        взаимодействий, признаки фильмов и LightFM с аккумуляторами adagrad
+        нужны лишь для дообучения и лежат отдельно в training/.
+        """
+        # Бакет создаётся при первой записи: при импорте MinIO не вызывается
+        self.ensure_bucket()
+        training_path = self.registry.training_path(snapshot.version)
+        os.makedirs(training_path, exist_ok=True)
+
+        training_files = [USER_ITEMS_FILE, LIGHTFM_STATE_FILE]
+        save_npz(os.path.join(training_path, USER_ITEMS_FILE), self.user_item_matrix)
+        with open(os.path.join(training_path, LIGHTFM_STATE_FILE), "wb") as f:
+            pickle.dump(self.lightfm_model, f)
+        if self.item_features is not None:
+            save_npz(
+                os.path.join(training_path, ITEM_FEATURES_FILE), self.item_features
+            )
+            training_files.append(ITEM_FEATURES_FILE)
+        if self.genres is not None:
+            with open(os.path.join(training_path, GENRES_FILE), "w") as f:
+                json.dump(self.genres, f)
+            training_files.append(GENRES_FILE)
+
+        self.registry.publish(snapshot, training_files)
+        self.publish(snapshot)
+        self.registry.prune_local(protect=(snapshot.version,))
+        logger.info(f"Models saved to MinIO as version {snapshot.version}")
+
+    def load_models(self, with_training: bool = False) -> bool:
+        """
+        Загружает последнюю версию из реестра моделей в MinIO.
+
+        Массивы отображаются в память (mmap) без копирования. with_training=True
+        дополнительно загружает состояние для дообучения (нужно воркеру RQ).
+        """
+        start_time = time()
         try:
-            obj = self.minio_client.get_object(settings.MINIO_BUCKET, key)
-            data = pickle.load(obj)
-            if model_type == "als":
-                self.als_model = data["model"]
-                self.user_ids = data["user_ids"]
-                self.movie_ids = data["movie_ids"]
-                self.user_to_idx = data["user_to_idx"]
-                self.movie_to_idx = data["movie_to_idx"]
-                self.idx_to_movie = data["idx_to_movie"]
-                self.als_user_item_matrix = data.get("user_item_matrix")
-                logger.info(f"ALS model loaded from MinIO: {key}")
-            elif model_type == "lightfm":
-                self.lightfm_model = data["model"]
-                self.user_ids = data["user_ids"]
-                self.movie_ids = data["movie_ids"]
-                self.user_to_idx = data["user_to_idx"]
-                self.movie_to_idx = data["movie_to_idx"]
-                self.idx_to_movie = data["idx_to_movie"]
-                self.lightfm_user_item_matrix = data.get("user_item_matrix")
-                self.item_features = data.get("item_features")
-                logger.info(f"LightFM model loaded from MinIO: {key}")
-            return True
+            version = self.registry.latest_version()
+            if version is None:
+                logger.info("No model versions found in MinIO")
+                return False
+            snapshot = self.registry.load(version, with_training=with_training)
         except Exception as e:
-            logger.info(
-                f"No {model_type.upper()} model found in MinIO or error loading: {e}"
-            )
+            logger.info(f"No model artifact found in MinIO or error loading: {e}")
             return False
 
+        self.publish(snapshot, load_seconds=time() - start_time)
+        if with_training:
+            self.load_training_state(self.registry.training_path(version))
+        self.registry.prune_local(protect=(version,))
+        logger.info(f"Models loaded from MinIO: version {version}")
+        return True
+
+    async def load_async(self) -> bool:
+        """
+        Первая загрузка последней версии без блокировки event loop: обращения
+        к MinIO и чтение артефакта идут в потоке. Пока она не завершилась,
+        get_recommendations отдаёт популярные фильмы. Повторные вызовы
+        после готовности ничего не делают (новые версии подхватывает
+        ModelWatcher).
+        """
+        if self.ready:
+            return self.snapshot.version is not None
+        try:
+            return await asyncio.to_thread(self.load_models)
+        finally:
+            self.ready = True
+
+    def readiness(self) -> dict:
+        """Состояние загрузки моделей для /ready"""
+        return {
+            "ready": self.ready,
+            "version": self.snapshot.version,
+            "models": {
+                model_type: self.snapshot.is_loaded(model_type)
+                for model_type in MODEL_TYPES
+            },
+            "load_seconds": self.load_seconds,
+            "loaded_at": self.loaded_at.isoformat() if self.loaded_at else None,
+        }
+
+    def load_training_state(self, training_path: str):
+        self.user_item_matrix = load_npz(
+            os.path.join(training_path, USER_ITEMS_FILE)
+        ).tocsr()
+        with open(os.path.join(training_path, LIGHTFM_STATE_FILE), "rb") as f:
+            self.lightfm_model = pickle.load(f)
+        item_features_path = os.path.join(training_path, ITEM_FEATURES_FILE)
+        self.item_features = (
+            load_npz(item_features_path).tocsr()
+            if os.path.exists(item_features_path)
+            else None
+        )
+        genres_path = os.path.join(training_path, GENRES_FILE)
+        self.genres = None
+        if os.path.exists(genres_path):
+            with open(genres_path) as f:
+                self.genres = json.load(f)
+        # ALS продолжает обучение с сохранённых факторов (копии: mmap только для чтения)
+        user_vectors, item_vectors, _ = self.snapshot.factors["als"]
+        self.als_model.user_factors = np.array(user_vectors)
+        self.als_model.item_factors = np.array(item_vectors)
+
     async def partial_train(self, db: AsyncIOMotorDatabase, last_timestamp=None):
         """Инкрементальное дообучение моделей на основе новых взаимодействий"""
 
         logger.info("Starting partial model training...")
         start_time = time()
 
-        # Получаем новые взаимодействия с момента последнего обучения
+        # Новые взаимодействия с момента последнего обучения
         query = {"timestamp": {"$gt": last_timestamp}} if last_timestamp else {}
-        watched_movies = await db["watched_movies"].find(query).to_list(None)
-        likes = await db["likes"].find(query).to_list(None)
-        bookmarks = await db["bookmarks"].find(query).to_list(None)
-
-        if not (watched_movies or likes or bookmarks):
+        if not await count_interactions(db, query):
             logger.info("No new interactions found for partial training.")
             return
 
-        # Новые взаимодействия
-        new_interactions = (
-            [
-                (
-                    str(wm["user_id"]),
-                    str(wm["movie_id"]),
-                    1.0 if wm["complete"] else 0.5,
-                )
-                for wm in watched_movies
-            ]
-            + [
-                (str(like["user_id"]), str(like["movie_id"]), like["rating"] / 10.0)
-                for like in likes
-            ]
-            + [(str(bm["user_id"]), str(bm["movie_id"]), 0.3) for bm in bookmarks]
-        )
+        # Дообучение продолжает последнюю сохранённую версию
+        if self.user_item_matrix is None:
+            self.load_models(with_training=True)
 
-        # Обновляем списки пользователей и фильмов
-        new_users = set(
-            user_id
-            for user_id, _, _ in new_interactions
-            if user_id not in self.user_to_idx
+        # Новые id получают индексы в конце таблиц, индексы старых не меняются.
+        # Таблицы дополняются копиями: текущий снимок могут читать запросы
+        loaded = await load_interaction_matrix(
+            db, query, users=self.snapshot.users, movies=self.snapshot.movies
         )
-        new_movies = set(
-            movie_id
-            for _, movie_id, _ in new_interactions
-            if movie_id not in self.movie_to_idx
-        )
-
-        if new_users:
-            self.user_ids.extend(new_users)
-            self.user_to_idx.update(
-                {
-                    uid: idx
-                    for idx, uid in enumerate(self.user_ids, len(self.user_to_idx))
-                }
-            )
-        if new_movies:
-            self.movie_ids.extend(new_movies)
-            self.movie_to_idx.update(
-                {
-                    mid: idx
-                    for idx, mid in enumerate(self.movie_ids, len(self.movie_to_idx))
-                }
-            )
-            self.idx_to_movie.update(
-                {idx: mid for mid, idx in self.movie_to_idx.items()}
-            )
-
-        # Обновляем матрицы
-        rows = [self.user_to_idx[uid] for uid, _, _ in new_interactions]
-        cols = [self.movie_to_idx[mid] for _, mid, _ in new_interactions]
-        data = [weight for _, _, weight in new_interactions]
-
-        new_als_matrix = csr_matrix(
-            (data, (rows, cols)), shape=(len(self.user_ids), len(self.movie_ids))
-        )
-        new_lightfm_matrix = coo_matrix(
-            (data, (rows, cols)), shape=(len(self.user_ids), len(self.movie_ids))
-        )
-
-        if self.als_user_item_matrix is not None:
-            self.als_user_item_matrix = self.als_user_item_matrix + new_als_matrix
-        else:
-            self.als_user_item_matrix = new_als_matrix
-
-        if self.lightfm_user_item_matrix is not None:
-            self.lightfm_user_item_matrix = (
-                self.lightfm_user_item_matrix + new_lightfm_matrix
-            )
+        user_index, movie_index = loaded.users, loaded.movies
+        shape = (len(user_index), len(movie_index))
+        new_matrix = loaded.matrix
+
+        if self.user_item_matrix is not None:
+            self.user_item_matrix.resize(
+                shape
+            )  # Место под новых пользователей и фильмы
+            self.user_item_matrix = self.user_item_matrix + new_matrix
         else:
-            self.lightfm_user_item_matrix = new_lightfm_matrix
+            self.user_item_matrix = new_matrix
 
         # Обновляем метрики размера матрицы
-        MATRIX_SIZE.labels(model="als").set(self.als_user_item_matrix.nnz)
-        MATRIX_SIZE.labels(model="lightfm").set(self.lightfm_user_item_matrix.nnz)
+        MATRIX_SIZE.labels(model="als").set(self.user_item_matrix.nnz)
+        MATRIX_SIZE.labels(model="lightfm").set(self.user_item_matrix.nnz)
+
+        if settings.ALS_PARTIAL_MODE == "full" or self.als_model.item_factors is None:
+            # fit создаёт факторы заново, только если их нет: сохранённые
+            # дополняются нулевыми строками под новых пользователей и фильмы
+            if self.als_model.item_factors is not None:
+                self.als_model.user_factors = pad_rows(
+                    self.als_model.user_factors, shape[0]
+                )
+                self.als_model.item_factors = pad_rows(
+                    self.als_model.item_factors, shape[1]
+                )
+            self.als_model.fit(self.user_item_matrix)
+        else:
+            # Пересчёт только пользователей и фильмов из новых взаимодействий
+            fold_in_als(
+                self.als_model,
+                self.user_item_matrix,
+                new_matrix,
+                fold_in_items=settings.ALS_FOLD_IN_ITEMS,
+                iterations=settings.ALS_FOLD_IN_ITERATIONS,
+            )
 
-        # Полное обучение ALS (нет fit_partial)
-        self.als_model.fit(self.als_user_item_matrix)
+        # Признаки новых фильмов и эмбеддинги новых пользователей для LightFM
+        if self.item_features is not None and self.genres is None:
+            # Версия без словаря жанров: у новых фильмов признаков нет
+            self.item_features.resize((len(movie_index), self.item_features.shape[1]))
+        else:
+            self.item_features = await self.load_item_features(db, movie_index)
+        grow_lightfm(
+            self.lightfm_model,
+            len(user_index),
+            (
+                len(movie_index)
+                if self.item_features is None
+                else self.item_features.shape[1]
+            ),
+        )
 
         # Инкрементальное обучение LightFM
         self.lightfm_model.fit_partial(
-            self.lightfm_user_item_matrix, item_features=self.item_features, epochs=5
+            self.user_item_matrix.tocoo(), item_features=self.item_features, epochs=5
         )
 
-        self.save_models()
+        self.save_models(
+            ModelSnapshot.build(
+                new_version(), user_index, movie_index, self.compute_factors()
+            )
+        )
         duration = time() - start_time
         TRAIN_DURATION.labels(type="partial").observe(duration)
         TRAIN_COUNT.labels(type="partial").inc()
@@ -261,81 +366,215 @@ class RecommendationModel:
         logger.info("Starting model training...")
         start_time = time()
 
-        watched_movies = await db["watched_movies"].find().to_list(None)
-        likes = await db["likes"].find().to_list(None)
-        bookmarks = await db["bookmarks"].find().to_list(None)
+        previous = self.load_previous_version() if settings.TRAIN_WARM_START else None
 
-        if not watched_movies and not likes and not bookmarks:
+        loaded = await load_interaction_matrix(db)
+        if not loaded.rows:
             logger.warning("No interaction data available for training.")
             return
 
-        interactions = (
-            [
-                (
-                    str(wm["user_id"]),
-                    str(wm["movie_id"]),
-                    1.0 if wm["complete"] else 0.5,
-                )
-                for wm in watched_movies
-            ]
-            + [
-                (str(like["user_id"]), str(like["movie_id"]), like["rating"] / 10.0)
-                for like in likes
-            ]
-            + [(str(bm["user_id"]), str(bm["movie_id"]), 0.3) for bm in bookmarks]
+        # Словарь жанров строится заново по текущему каталогу
+        self.genres = None
+        item_features = await self.load_item_features(db, loaded.movies)
+
+        self.save_models(self.fit(loaded, item_features, previous))
+        duration = time() - start_time
+        TRAIN_DURATION.labels(type="full").observe(duration)
+        TRAIN_COUNT.labels(type="full").inc()
+        logger.info("Model training completed for ALS and LightFM.")
+
+    def fit(
+        self,
+        loaded: InteractionMatrix,
+        item_features: csr_matrix = None,
+        previous: tuple = None,
+    ) -> ModelSnapshot:
+        """
+        Обучает ALS и LightFM на матрице взаимодействий и собирает снимок
+        новой версии. Снимок не сохраняется и не публикуется.
+        """
+        self.user_item_matrix = loaded.matrix
+        self.item_features = item_features
+
+        # Обновляем метрики размера матрицы
+        MATRIX_SIZE.labels(model="als").set(self.user_item_matrix.nnz)
+        MATRIX_SIZE.labels(model="lightfm").set(self.user_item_matrix.nnz)
+
+        self.reset_models()
+        if previous is not None:
+            self.warm_start(previous, loaded.users, loaded.movies)
+        self.fit_als()
+        self.fit_lightfm()
+        return ModelSnapshot.build(
+            new_version(), loaded.users, loaded.movies, self.compute_factors()
         )
 
-        self.user_ids = sorted(set(user_id for user_id, _, _ in interactions))
-        self.movie_ids = sorted(set(movie_id for _, movie_id, _ in interactions))
-        self.user_to_idx = {uid: idx for idx, uid in enumerate(self.user_ids)}
-        self.movie_to_idx = {mid: idx for idx, mid in enumerate(self.movie_ids)}
-        self.idx_to_movie = {idx: mid for mid, idx in self.movie_to_idx.items()}
-
-        rows = [self.user_to_idx[uid] for uid, _, _ in interactions]
-        cols = [self.movie_to_idx[mid] for _, mid, _ in interactions]
-        data = [weight for _, _, weight in interactions]
-        self.als_user_item_matrix = csr_matrix(
-            (data, (rows, cols)), shape=(len(self.user_ids), len(self.movie_ids))
+    def load_previous_version(self) -> tuple:
+        """
+        (снимок, модель LightFM, словарь жанров) последней версии для тёплого
+        старта полного обучения или None, если версий ещё нет.
+        """
+        if not self.load_models(with_training=True):
+            return None
+        self.user_item_matrix = None  # Матрица собирается заново из базы
+        return self.snapshot, self.lightfm_model, self.genres
+
+    def warm_start(self, previous: tuple, users: IdIndex, movies: IdIndex):
+        """
+        Начальные факторы моделей из предыдущей версии.
+
+        Строки переносятся по id для пользователей, фильмов и жанров, которые
+        есть в обеих версиях; остальные инициализируются как при обучении
+        с нуля. Обучение с такого старта сходится за меньшее число итераций.
+        """
+        snapshot, lightfm_model, genres = previous
+        user_map = users.map_to(snapshot.users)
+        movie_map = movies.map_to(snapshot.movies)
+        ratio = float((user_map >= 0).mean()) if len(user_map) else 0.0
+
+        als_warm = "als" in snapshot.factors and warm_start_als(
+            self.als_model, *snapshot.factors["als"][:2], user_map, movie_map
         )
-        self.lightfm_user_item_matrix = coo_matrix(
-            (data, (rows, cols)), shape=(len(self.user_ids), len(self.movie_ids))
+        genre_positions = {genre: i for i, genre in enumerate(genres or [])}
+        genre_map = np.array(
+            [genre_positions.get(genre, -1) for genre in self.genres], dtype=np.int64
+        )
+        lightfm_warm = warm_start_lightfm(
+            self.lightfm_model, lightfm_model, user_map, genre_map
         )
 
-        # Обновляем метрики размера матрицы
-        MATRIX_SIZE.labels(model="als").set(self.als_user_item_matrix.nnz)
-        MATRIX_SIZE.labels(model="lightfm").set(self.lightfm_user_item_matrix.nnz)
-
-        # Подготовка item_features в формате CSR
-        movies = await db["movies"].find().to_list(None)
-        genres = [
-            movie["genres"] if isinstance(movie["genres"], list) else [movie["genres"]]
-            for movie in movies
-        ]
-        mlb = MultiLabelBinarizer(sparse_output=True)  # Возвращаем разреженную матрицу
-        sparse_features = mlb.fit_transform(genres)
-        self.item_features = sparse_features.tocsr()  # Преобразуем в CSR
-
-        # Проверка соответствия размеров
-        if self.item_features.shape[0] != len(self.movie_ids):
-            logger.warning(
-                "Mismatch between item_features and movie_ids. Adjusting item_features..."
+        for model_type, warm in (("als", als_warm), ("lightfm", lightfm_warm)):
+            TRAIN_WARM_START_RATIO.labels(model=model_type).set(ratio if warm else 0)
+        logger.info(
+            f"Warm start from version {snapshot.version}: {ratio:.1%} of users known "
+            f"(ALS: {als_warm}, LightFM: {lightfm_warm})"
+        )
+
+    def fit_als(self):
+        """Обучение ALS до плато функции потерь (ml/convergence.py)"""
+        durations, loss, overhead = fit_als_until_plateau(
+            self.als_model,
+            self.user_item_matrix,
+            settings.TRAIN_TOLERANCE,
+            settings.TRAIN_PATIENCE,
+            settings.TRAIN_LOSS_EVERY,
+        )
+        report_convergence("als", durations, self.als_model.iterations, loss, overhead)
+
+    def fit_lightfm(self):
+        """Обучение LightFM до плато hit rate@10 на отложенной выборке"""
+        durations, hit_rate, overhead = fit_lightfm_until_plateau(
+            self.lightfm_model,
+            self.user_item_matrix,
+            self.item_features,
+            settings.LIGHTFM_EPOCHS,
+            settings.TRAIN_HOLDOUT_USERS,
+            settings.TRAIN_TOLERANCE,
+            settings.TRAIN_PATIENCE,
+        )
+        report_convergence(
+            "lightfm", durations, settings.LIGHTFM_EPOCHS, hit_rate, overhead
+        )
+
+    async def load_item_features(
+        self, db: AsyncIOMotorDatabase, movies: IdIndex
+    ) -> csr_matrix:
+        """
+        Признаки фильмов (жанры) для LightFM: строка i — фильм с индексом i
+        в таблице movies, у фильмов без карточки в каталоге признаков нет.
+
+        Словарь жанров (self.genres) фиксируется при полном обучении: при
+        дообучении число признаков LightFM меняться не может, поэтому новые
+        жанры до следующего полного обучения пропускаются.
+        """
+        catalog = await db["movies"].find({}, {"genres": 1}).to_list(None)
+        genres = [movie_genres(movie) for movie in catalog]
+        if self.genres is None:
+            self.genres = sorted({genre for movie in genres for genre in movie})
+
+        mlb = MultiLabelBinarizer(classes=self.genres, sparse_output=True)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")  # Неизвестные жанры пропускаются
+            encoded = mlb.fit_transform(genres).tocsr()
+
+        rows = movies.lookup([str(movie["_id"]) for movie in catalog])
+        known = np.flatnonzero(rows >= 0)
+        # Перестановка строк каталога в порядок индексов таблицы фильмов
+        placement = csr_matrix(
+            (
+                np.ones(len(known), dtype=np.float32),
+                (rows[known], np.arange(len(known))),
+            ),
+            shape=(len(movies), len(known)),
+        )
+        return (placement @ encoded[known]).astype(np.float32).tocsr()
+
+    def compute_factors(self) -> dict:
+        """
+        Латентные представления обученных моделей для снимка.
+
+        Для каждой модели — (user_vectors, item_vectors, item_biases): оценка
+        фильма для пользователя равна user_vectors[u] @ item_vectors.T + item_biases.
+        Для LightFM представления фильмов строятся из item_features, как в predict;
+        смещение пользователя на ранжирование не влияет и не сохраняется.
+
+        Массивы приводятся к непрерывным float32, поэтому скоринг запроса
+        сводится к одному скалярному произведению.
+        """
+        _, lightfm_user_vectors = self.lightfm_model.get_user_representations()
+        lightfm_item_biases, lightfm_item_vectors = (
+            self.lightfm_model.get_item_representations(self.item_features)
+        )
+        factors = {
+            "als": (self.als_model.user_factors, self.als_model.item_factors, None),
+            "lightfm": (
+                lightfm_user_vectors,
+                lightfm_item_vectors,
+                lightfm_item_biases,
+            ),
+        }
+        return {
+            model_type: tuple(
+                None if array is None else np.ascontiguousarray(array, np.float32)
+                for array in arrays
             )
-            # Если нужно, можно дополнить или обрезать item_features до нужного размера
-            self.item_features = self.item_features[: len(self.movie_ids), :]
+            for model_type, arrays in factors.items()
+        }
 
-        self.als_model.fit(self.als_user_item_matrix)
-        self.lightfm_model.fit(
-            self.lightfm_user_item_matrix, item_features=self.item_features, epochs=10
+    def get_factors(self, model_type: str = "als"):
+        """Латентные представления модели из текущего снимка"""
+        return self.snapshot.factors[model_type]
+
+    async def get_new_movies(
+        self,
+        db: AsyncIOMotorDatabase,
+        exclude: set = frozenset(),
+        snapshot: ModelSnapshot = None,
+    ) -> list:
+        """Новые фильмы (за последний месяц), по которым ещё нет взаимодействий"""
+        movies = (snapshot or self.snapshot).movies
+        one_month_ago = datetime.utcnow() - timedelta(days=30)
+        all_movies = (
+            await db["movies"]
+            .find({"creation_date": {"$gte": one_month_ago}})
+            .to_list(None)
         )
-        self.save_models()
-        duration = time() - start_time
-        TRAIN_DURATION.labels(type="full").observe(duration)
-        TRAIN_COUNT.labels(type="full").inc()
-        logger.info("Model training completed for ALS and LightFM.")
+        movie_ids = [str(movie["_id"]) for movie in all_movies]
+        return [
+            movie_id
+            for movie_id, idx in zip(movie_ids, movies.lookup(movie_ids))
+            if idx < 0  # Нет взаимодействий
+            and movie_id not in exclude  # Не просмотрен пользователем
+        ]
 
     async def get_user_row(
-        self, user_id: str, db: AsyncIOMotorDatabase, model_type: str = "als"
+        self,
+        user_id: str,
+        db: AsyncIOMotorDatabase,
+        model_type: str = "als",
+        snapshot: ModelSnapshot = None,
     ) -> csr_matrix:
+        movies = (snapshot or self.snapshot).movies
         watched = await db["watched_movies"].find({"user_id": user_id}).to_list(None)
         likes = await db["likes"].find({"user_id": user_id}).to_list(None)
         bookmarks = await db["bookmarks"].find({"user_id": user_id}).to_list(None)
@@ -352,13 +591,101 @@ class RecommendationModel:
             if movie_id not in movie_weights:
                 movie_weights[movie_id] = 0.3
 
-        cols = [
-            self.movie_to_idx[mid] for mid in movie_weights if mid in self.movie_to_idx
-        ]
-        data = [movie_weights[mid] for mid in movie_weights if mid in self.movie_to_idx]
+        cols = movies.lookup(movie_weights)
+        known = cols >= 0
+        data = np.fromiter(movie_weights.values(), dtype=np.float32)[known]
+        cols = cols[known]
         rows = np.zeros(len(cols))
         matrix = csr_matrix if model_type == "als" else coo_matrix
-        return matrix((data, (rows, cols)), shape=(1, len(self.movie_ids)))
+        return matrix((data, (rows, cols)), shape=(1, len(movies)))
+
+    @staticmethod
+    def excluded_items(
+        snapshot: ModelSnapshot, model_type: str, watched: set, user_row: csr_matrix
+    ) -> np.ndarray:
+        """Индексы фильмов, которые не попадают в выдачу пользователя"""
+        exclude = snapshot.movies.lookup(watched)
+        exclude = exclude[exclude >= 0]
+        if model_type == "als":
+            # ALS исключает все взаимодействия
+            exclude = np.concatenate([exclude, user_row.indices])
+        return exclude
+
+    async def rank_user(
+        self,
+        snapshot: ModelSnapshot,
+        user_idx: int,
+        model_type: str,
+        watched: set,
+        user_row: csr_matrix,
+        n: int,
+    ) -> list:
+        """
+        Top-n фильмов пользователя: через micro-batching (ml/batching.py),
+        если он включён, иначе отдельной задачей в пуле скоринга. Поиск
+        по ANN-индексу выполняется по одному пользователю.
+        """
+        with stage("filtering", model_type):
+            exclude = self.excluded_items(snapshot, model_type, watched, user_row)
+        with stage("scoring", model_type):
+            if self.batcher is None or model_type in snapshot.ann_indexes:
+                return await self.scoring.run(
+                    self.score_excluding, snapshot, user_idx, model_type, exclude, n
+                )
+            top_items = await self.batcher.score(
+                snapshot, model_type, user_idx, exclude, n
+            )
+            return snapshot.movies.ids_at(top_items)
+
+    def score_user(
+        self,
+        snapshot: ModelSnapshot,
+        user_idx: int,
+        model_type: str,
+        watched: set,
+        user_row: csr_matrix,
+        n: int,
+        nprobe: int = None,
+    ) -> list:
+        """
+        Top-n фильмов пользователя по факторам снимка, без просмотренных.
+
+        Чисто вычислительный этап запроса: выполняется в пуле потоков
+        (ml/scoring.py), чтобы не блокировать event loop. nprobe — число
+        просматриваемых кластеров ANN-индекса (по умолчанию ANN_NPROBE).
+        """
+        exclude = self.excluded_items(snapshot, model_type, watched, user_row)
+        return self.score_excluding(snapshot, user_idx, model_type, exclude, n, nprobe)
+
+    def score_excluding(
+        self,
+        snapshot: ModelSnapshot,
+        user_idx: int,
+        model_type: str,
+        exclude: np.ndarray,
+        n: int,
+        nprobe: int = None,
+    ) -> list:
+        """Top-n фильмов пользователя без индексов exclude (см. score_user)"""
+        user_vectors, item_vectors, item_biases = snapshot.factors[model_type]
+
+        if model_type in snapshot.ann_indexes:
+            # Приближённый поиск по ANN-индексу вместо скоринга всего каталога
+            top_items, _ = snapshot.ann_indexes[model_type].search(
+                user_vectors[user_idx],
+                n,
+                nprobe=nprobe or settings.ANN_NPROBE,
+                exclude=exclude,
+            )
+            return snapshot.movies.ids_at(top_items)
+
+        scores = item_vectors @ user_vectors[user_idx]
+        if item_biases is not None:
+            scores += item_biases
+        scores[exclude] = -np.inf
+
+        top_items = top_k_indices(scores, n)
+        return snapshot.movies.ids_at(top_items[np.isfinite(scores[top_items])])
 
     async def get_recommendations(
         self,
@@ -369,24 +696,23 @@ class RecommendationModel:
     ) -> dict:
 
         start_time = time()
+        # Весь запрос работает с одним снимком, даже если модель перезагрузят
+        snapshot = self.snapshot
 
-        watched = await db["watched_movies"].find({"user_id": user_id}).to_list(None)
+        with stage("mongo_fetch", model_type):
+            watched = (
+                await db["watched_movies"].find({"user_id": user_id}).to_list(None)
+            )
         watched = set(str(w["movie_id"]) for w in watched)
 
-        if model_type == "als":
-            user_item_matrix = self.als_user_item_matrix
-            model = self.als_model
-        else:
-            user_item_matrix = self.lightfm_user_item_matrix
-            model = self.lightfm_model
-
-        if user_item_matrix is None or not self.user_ids:
+        if not snapshot.is_loaded(model_type):
 
-            popular = (
-                await db["movies"]
-                .aggregate([{"$sort": {"rating": -1}}, {"$limit": n}])
-                .to_list(n)
-            )
+            with stage("mongo_fetch", "popular"):
+                popular = (
+                    await db["movies"]
+                    .aggregate([{"$sort": {"rating": -1}}, {"$limit": n}])
+                    .to_list(n)
+                )
 
             recommendations = (
                 [str(movie["_id"]) for movie in popular] if popular else []
@@ -399,7 +725,9 @@ class RecommendationModel:
             )
             duration = time() - start_time
             RECOMMENDATION_DURATION.labels(model_type="popular").observe(duration)
-            POPULAR_RECOMMENDATIONS.labels(reason="no_model").inc()
+            POPULAR_RECOMMENDATIONS.labels(
+                reason="no_model" if self.ready else "loading"
+            ).inc()
 
             return {
                 "source": "popular",
@@ -407,13 +735,15 @@ class RecommendationModel:
                 "session_id": session_id,
             }
 
-        if user_id not in self.user_to_idx:
+        user_idx = snapshot.users.get(user_id)
+        if user_idx is None:
 
-            popular = (
-                await db["movies"]
-                .aggregate([{"$sort": {"rating": -1}}, {"$limit": n}])
-                .to_list(n)
-            )
+            with stage("mongo_fetch", "popular"):
+                popular = (
+                    await db["movies"]
+                    .aggregate([{"$sort": {"rating": -1}}, {"$limit": n}])
+                    .to_list(n)
+                )
 
             recommendations = (
                 [str(movie["_id"]) for movie in popular] if popular else []
@@ -434,57 +764,21 @@ class RecommendationModel:
                 "session_id": session_id,
             }
 
-        user_idx = self.user_to_idx[user_id]
-        user_row = await self.get_user_row(user_id, db, model_type)
-
-        if model_type == "als":
-            recommended_ids, _ = model.recommend(user_idx, user_row, N=n + len(watched))
-            recommendations = [
-                self.idx_to_movie[idx]
-                for idx in recommended_ids
-                if idx in self.idx_to_movie and self.idx_to_movie[idx] not in watched
-            ][:n]
-        else:
-            scores = model.predict(
-                user_idx,
-                np.arange(len(self.movie_ids)),
-                item_features=self.item_features,
-            )
+        with stage("mongo_fetch", model_type):
+            user_row = await self.get_user_row(user_id, db, model_type, snapshot)
 
-            top_items = np.argsort(-scores)[: n + len(watched)]
-            recommendations = [
-                self.idx_to_movie[idx]
-                for idx in top_items
-                if self.idx_to_movie[idx] not in watched
-            ][:n]
+        async def new_movies():
+            with stage("new_movie_mix", model_type):
+                return await self.get_new_movies(db, watched, snapshot)
 
-        # Подмешивание новых непросмотренных фильмов (добавленных за последний месяц)
-        one_month_ago = datetime.utcnow() - timedelta(days=30)
-        all_movies = (
-            await db["movies"]
-            .find({"creation_date": {"$gte": one_month_ago}})
-            .to_list(None)
+        # Скоринг идёт в пуле потоков, параллельно с запросом новых фильмов
+        recommendations, new_unwatched_movies = await asyncio.gather(
+            self.rank_user(snapshot, user_idx, model_type, watched, user_row, n),
+            new_movies(),
         )
-        new_unwatched_movies = [
-            str(movie["_id"])
-            for movie in all_movies
-            if str(movie["_id"]) not in self.movie_to_idx  # Нет взаимодействий
-            and str(movie["_id"]) not in watched  # Не просмотрен пользователем
-        ]
-
-        # Определяем количество новых фильмов для добавления (минимум 1, максимум треть от n)
-        n_unwatched = min(1, max(1, n // 3))
-        if new_unwatched_movies and len(recommendations) >= n_unwatched:
-            recommendations = recommendations[
-                :-n_unwatched
-            ]  # Убираем последние элементы
-            selected_new_movies = random.sample(
-                new_unwatched_movies, min(n_unwatched, len(new_unwatched_movies))
-            )
-            recommendations.extend(selected_new_movies)
-            logger.info(
-                f"Added {len(selected_new_movies)} new unwatched movies to recommendations for user {user_id}"
-            )
+        # Подмешивание новых непросмотренных фильмов (добавленных за последний месяц)
+        with stage("new_movie_mix", model_type):
+            recommendations = mix_new_movies(recommendations, new_unwatched_movies, n)
 
         session_id = str(uuid.uuid4())
         duration = time() - start_time
@@ -501,4 +795,6 @@ class RecommendationModel:
         }
 
 
-recommendation_model = RecommendationModel()
+# Модели загружаются не при импорте, а в фоне при старте API (main.py)
+# или в задаче RQ, которой они нужны
+recommendation_model = RecommendationModel(load=False)
@@ -0,0 +1,176 @@
+import asyncio
+import logging
+import os
+import shutil
+from contextlib import suppress
+from datetime import datetime, timezone
+from time import time
+
+from minio import Minio
+from minio.error import S3Error
+
+from core.config import settings
+from core.metrics import MODEL_RELOAD_DURATION, MODEL_RELOADS
+from ml.artifacts import (
+    TRAINING_DIR,
+    download_artifact,
+    get_latest_version,
+    read_arrays,
+    read_manifest,
+    upload_artifact,
+    write_artifact,
+)
+from ml.snapshot import ModelSnapshot
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ModelRegistry:
+    """
+    Реестр версий моделей в MinIO.
+
+    Каждая версия — отдельный артефакт artifacts/<version>/, последняя
+    опубликованная версия указана в artifacts/latest.json. Локальные копии
+    хранятся в cache_dir/<version>.
+    """
+
+    def __init__(
+        self,
+        client: Minio,
+        bucket: str = settings.MINIO_BUCKET,
+        cache_dir: str = settings.MODEL_CACHE_DIR,
+    ):
+        self.client = client
+        self.bucket = bucket
+        self.cache_dir = cache_dir
+
+    def local_path(self, version: str) -> str:
+        return os.path.join(self.cache_dir, version)
+
+    def training_path(self, version: str) -> str:
+        return os.path.join(self.local_path(version), TRAINING_DIR)
+
+    def latest_version(self) -> str:
+        """Последняя опубликованная версия или None, если моделей ещё нет"""
+        try:
+            return get_latest_version(self.client, self.bucket)
+        except S3Error as e:
+            if e.code == "NoSuchKey":
+                return None
+            raise
+
+    def publish(self, snapshot: ModelSnapshot, training_files: list = ()) -> None:
+        """
+        Записывает снимок в локальный каталог версии и загружает его в MinIO.
+
+        training_files — файлы, заранее сохранённые в training_path(version).
+        """
+        path = self.local_path(snapshot.version)
+        write_artifact(
+            path,
+            snapshot.to_arrays(),
+            training_files,
+            {"version": snapshot.version, "models": list(snapshot.factors)},
+        )
+        upload_artifact(self.client, self.bucket, snapshot.version, path)
+
+    def load(self, version: str, with_training: bool = False) -> ModelSnapshot:
+        """Скачивает версию (если её нет локально) и открывает массивы через mmap"""
+        path = download_artifact(
+            self.client,
+            self.bucket,
+            version,
+            self.cache_dir,
+            with_training=with_training,
+        )
+        manifest = read_manifest(path)
+        return ModelSnapshot.from_arrays(
+            version, read_arrays(path, manifest), manifest["models"]
+        )
+
+    def created_at(self, version: str) -> datetime:
+        """Момент создания локальной версии: created_at манифеста или mtime каталога"""
+        path = self.local_path(version)
+        with suppress(OSError, ValueError, KeyError):
+            return datetime.fromisoformat(read_manifest(path)["created_at"])
+        with suppress(OSError):
+            return datetime.fromtimestamp(os.path.getmtime(path), timezone.utc)
+        return datetime.min.replace(tzinfo=timezone.utc)
+
+    def prune_local(
+        self, keep: int = settings.MODEL_CACHE_KEEP, protect: tuple = ()
+    ) -> None:
+        """
+        Удаляет старые локальные версии, оставляя keep последних по времени
+        создания. Версии protect (текущая, только что опубликованная)
+        не удаляются никогда. По имени версии не сортируются: у версий,
+        созданных в одну секунду, порядок задаёт случайный суффикс.
+
+        Файлы версии, которую ещё читают через mmap, остаются доступны
+        до закрытия отображения, поэтому удаление безопасно.
+        """
+        if not os.path.isdir(self.cache_dir):
+            return
+        versions = sorted(
+            os.listdir(self.cache_dir),
+            key=lambda version: (self.created_at(version), version),
+            reverse=True,
+        )
+        for version in versions[keep:]:
+            if version in protect:
+                continue
+            shutil.rmtree(self.local_path(version), ignore_errors=True)
+            logger.info(f"Removed cached model version {version}")
+
+
+class ModelWatcher:
+    """
+    Фоновая задача API: опрашивает реестр и при появлении новой версии
+    загружает её в пуле потоков (не блокируя event loop), после чего
+    публикует снимок одной заменой ссылки.
+    """
+
+    def __init__(self, model, interval: float = settings.MODEL_RELOAD_INTERVAL):
+        self.model = model
+        self.interval = interval
+        self.task = None
+
+    async def check(self) -> bool:
+        """Проверяет реестр один раз; возвращает True, если модель обновлена"""
+        registry = self.model.registry
+        version = await asyncio.to_thread(registry.latest_version)
+        if version is None or version == self.model.snapshot.version:
+            return False
+
+        start_time = time()
+        snapshot = await asyncio.to_thread(registry.load, version)
+        load_seconds = time() - start_time
+        self.model.publish(snapshot, load_seconds=load_seconds)
+        await asyncio.to_thread(registry.prune_local, protect=(version,))
+
+        MODEL_RELOAD_DURATION.observe(load_seconds)
+        MODEL_RELOADS.labels(status="success").inc()
+        logger.info(f"Model hot-reloaded to version {version}")
+        return True
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.check()
+            except Exception as e:
+                MODEL_RELOADS.labels(status="error").inc()
+                logger.error(f"Error reloading models: {e}")
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+        logger.info(f"Model watcher started (interval {self.interval}s)")
+
+    async def stop(self):
+        if self.task is None:
+            return
+        self.task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self.task
+        self.task = None
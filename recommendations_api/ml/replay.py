@@ -0,0 +1,198 @@
+import dataclasses
+import logging
+from datetime import datetime
+from functools import partial
+from time import perf_counter
+
+import numpy as np
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from scipy.sparse import csr_matrix
+
+from ml.ann import IVFIndex
+from ml.interactions import InteractionMatrix, load_interaction_matrix
+from ml.ranking import score_top_k
+from ml.snapshot import MODEL_TYPES, ModelSnapshot
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def time_split(db: AsyncIOMotorDatabase, cutoff: datetime) -> tuple:
+    """
+    Разбиение взаимодействий по времени: (обучающая InteractionMatrix,
+    отложенная матрица в индексах обучающей).
+
+    Пользователи и фильмы, которых до cutoff не было (холодный старт),
+    и повторы уже известных пар из отложенной выборки исключаются —
+    модели их ранжировать не могут.
+    """
+    train = await load_interaction_matrix(db, {"timestamp": {"$lt": cutoff}})
+    test = await load_interaction_matrix(
+        db, {"timestamp": {"$gte": cutoff}}, users=train.users, movies=train.movies
+    )
+    n_users, n_movies = train.matrix.shape
+    return train, heldout(train.matrix, test.matrix[:n_users, :n_movies])
+
+
+def heldout(train: csr_matrix, test: csr_matrix) -> csr_matrix:
+    """Бинарная матрица релевантности: пары из test, которых нет в train"""
+    relevant = (test > 0).astype(np.float32)
+    relevant = (relevant - relevant.multiply(train > 0)).tocsr()
+    relevant.eliminate_zeros()
+    return relevant
+
+
+def top_k_exact(
+    model_factors: tuple, train: csr_matrix, users: np.ndarray, k: int, block_size=1024
+) -> np.ndarray:
+    """Top-k фильмов пользователей users точным скорингом по блокам; -1 — пусто"""
+    user_vectors, item_vectors, item_biases = model_factors
+    item_vectors_t = np.ascontiguousarray(item_vectors.T)
+    top = np.full((len(users), k), -1, dtype=np.int64)
+    for start in range(0, len(users), block_size):
+        end = start + block_size
+        block = users[start:end]
+        indices, scores = score_top_k(
+            user_vectors[block], item_vectors_t, k, item_biases, train[block]
+        )
+        top[start:end] = np.where(np.isfinite(scores), indices, -1)
+    return top
+
+
+def top_k_ann(
+    model_factors: tuple,
+    index: IVFIndex,
+    train: csr_matrix,
+    users: np.ndarray,
+    k: int,
+    nprobe: int,
+) -> np.ndarray:
+    """Top-k через ANN-индекс: поиск выполняется по одному пользователю"""
+    user_vectors = model_factors[0]
+    top = np.full((len(users), k), -1, dtype=np.int64)
+    for row, user in enumerate(users):
+        start, end = train.indptr[user], train.indptr[user + 1]
+        exclude = train.indices[start:end]
+        items, _ = index.search(user_vectors[user], k, nprobe=nprobe, exclude=exclude)
+        top[row, : len(items)] = items
+    return top
+
+
+def ranking_metrics(top: np.ndarray, relevant: csr_matrix, ks: list) -> dict:
+    """
+    Средние precision@K, recall@K и NDCG@K по пользователям.
+
+    top — (пользователи × max(ks)) индексы фильмов в порядке выдачи (-1 —
+    пустая позиция), relevant — строки отложенной выборки тех же
+    пользователей. Попадания считаются одним разреженным индексированием.
+    """
+    rows = np.repeat(np.arange(top.shape[0]), top.shape[1])
+    hits = np.asarray(relevant[rows, np.maximum(top.ravel(), 0)]).reshape(top.shape)
+    hits = (hits > 0) & (top >= 0)
+    n_relevant = np.diff(relevant.indptr)
+    discounts = 1 / np.log2(np.arange(2, top.shape[1] + 2))
+    ideal = np.cumsum(discounts)
+
+    metrics = {}
+    for k in ks:
+        hits_k = hits[:, :k]
+        found = hits_k.sum(axis=1)
+        dcg = (hits_k * discounts[:k]).sum(axis=1)
+        idcg = ideal[np.minimum(n_relevant, k) - 1]
+        metrics[f"precision@{k}"] = float((found / k).mean())
+        metrics[f"recall@{k}"] = float((found / n_relevant).mean())
+        metrics[f"ndcg@{k}"] = float((dcg / idcg).mean())
+    return metrics
+
+
+def latency_percentiles(
+    score, snapshot: ModelSnapshot, model_type: str, train: csr_matrix, users, k: int
+) -> dict:
+    """p50/p95/p99 (мс) скоринга одного пользователя функцией инференса score"""
+    durations = []
+    for user in users:
+        start = perf_counter()
+        score(snapshot, int(user), model_type, set(), train[user], k)
+        durations.append(perf_counter() - start)
+    p50, p95, p99 = np.percentile(durations, [50, 95, 99]) * 1000
+    return {
+        "latency_p50_ms": round(float(p50), 3),
+        "latency_p95_ms": round(float(p95), 3),
+        "latency_p99_ms": round(float(p99), 3),
+    }
+
+
+def replay(
+    model,
+    train: InteractionMatrix,
+    relevant: csr_matrix,
+    ks: list,
+    nprobes: list,
+    item_features: csr_matrix = None,
+    nlist: int = 0,
+    latency_users: int = 1000,
+    seed: int = 0,
+) -> list:
+    """
+    Обучает модели RecommendationModel.fit на train и оценивает их
+    на отложенных взаимодействиях relevant: качество по всем пользователям
+    с отложенными фильмами и задержку score_user на выборке из них.
+
+    nprobes — режимы ранжирования: 0 — точный скоринг каталога, иначе
+    ANN-индекс (nlist кластеров, 0 — по умолчанию) с таким nprobe.
+    Возвращает по строке отчёта на модель и режим.
+    """
+    start = perf_counter()
+    snapshot = model.fit(train, item_features)
+    train_seconds = perf_counter() - start
+    users = np.flatnonzero(np.diff(relevant.indptr))
+    relevant = relevant[users]
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(users, min(latency_users, len(users)), replace=False)
+    k = max(ks)
+
+    rows = []
+    for model_type in MODEL_TYPES:
+        model_factors = snapshot.factors[model_type]
+        index = None
+        for nprobe in nprobes:
+            if nprobe and index is None:
+                index = IVFIndex.build(*model_factors[1:], nlist=nlist or None)
+            start = perf_counter()
+            if nprobe:
+                top = top_k_ann(model_factors, index, train.matrix, users, k, nprobe)
+            else:
+                top = top_k_exact(model_factors, train.matrix, users, k)
+            ranking_seconds = perf_counter() - start
+            # Задержку меряем путём инференса (score_user) на снимке с этим индексом
+            variant = dataclasses.replace(
+                snapshot, ann_indexes={model_type: index} if nprobe else {}
+            )
+            row = {
+                "model": model_type,
+                "factors": model_factors[0].shape[1],
+                "nprobe": nprobe,
+                "users": len(users),
+                "train_s": round(train_seconds, 2),
+                "ranking_s": round(ranking_seconds, 2),
+                **{
+                    name: round(value, 4)
+                    for name, value in ranking_metrics(top, relevant, ks).items()
+                },
+                **latency_percentiles(
+                    partial(model.score_user, nprobe=nprobe),
+                    variant,
+                    model_type,
+                    train.matrix,
+                    sample,
+                    k,
+                ),
+            }
+            rows.append(row)
+            logger.info(
+                f"{model_type} nprobe={nprobe}: "
+                + ", ".join(
+                    f"{name}={value:.4f}" for name, value in row.items() if "@" in name
+                )
+            )
+    return rows
@@ -0,0 +1,77 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from time import time
+
+from core.config import settings
+from core.metrics import SCORING_IN_FLIGHT, SCORING_QUEUE_DEPTH, SCORING_QUEUE_WAIT
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ScoringExecutor:
+    """
+    Пул потоков для CPU-этапа рекомендаций (скоринг каталога, top-K, ANN).
+
+    Матричные операции numpy отпускают GIL, поэтому пока скоринг идёт
+    в потоках, event loop продолжает обслуживать остальные запросы: ответы
+    из кэша Redis, /health, ожидание MongoDB. Одновременно выполняется
+    не больше concurrency задач; остальные ждут слота в event loop, их число
+    публикуется метрикой scoring_queue_depth. workers=0 — скоринг прямо
+    в event loop (отладка, сравнение в бенчмарке).
+    """
+
+    def __init__(
+        self,
+        workers: int = settings.SCORING_WORKERS,
+        concurrency: int = settings.SCORING_CONCURRENCY,
+    ):
+        self.workers = workers
+        self.concurrency = concurrency or workers or 1
+        self.executor = (
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scoring")
+            if workers > 0
+            else None
+        )
+        self.waiting = 0
+        self.loop = None
+        self.semaphore = None
+
+    def get_semaphore(self) -> asyncio.Semaphore:
+        # Семафор привязан к event loop: воркер RQ запускает asyncio.run на задачу
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.loop, self.semaphore = loop, asyncio.Semaphore(self.concurrency)
+        return self.semaphore
+
+    async def run(self, func, *args, **kwargs):
+        """Выполняет func(*args, **kwargs) в пуле, соблюдая лимит параллельности"""
+        if self.executor is None:
+            return func(*args, **kwargs)
+
+        semaphore = self.get_semaphore()
+        wait_start = time()
+        self.waiting += 1
+        SCORING_QUEUE_DEPTH.set(self.waiting)
+        try:
+            await semaphore.acquire()
+        finally:
+            self.waiting -= 1
+            SCORING_QUEUE_DEPTH.set(self.waiting)
+        SCORING_QUEUE_WAIT.observe(time() - wait_start)
+
+        SCORING_IN_FLIGHT.inc()
+        try:
+            return await self.loop.run_in_executor(
+                self.executor, partial(func, *args, **kwargs)
+            )
+        finally:
+            SCORING_IN_FLIGHT.dec()
+            semaphore.release()
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            logger.info("Scoring executor stopped")
@@ -0,0 +1,130 @@
+import logging
+from dataclasses import dataclass, field
+from time import time
+
+from core.config import settings
+from ml.ann import IVFIndex
+from ml.id_index import IdIndex
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MODEL_TYPES = ("als", "lightfm")
+
+
+def build_ann_indexes(factors: dict) -> dict:
+    """Строит ANN-индексы по векторам фильмов моделей, если они включены в настройках"""
+    if not settings.ANN_ENABLED:
+        return {}
+    ann_indexes = {}
+    for model_type, (_, item_vectors, item_biases) in factors.items():
+        start_time = time()
+        ann_indexes[model_type] = IVFIndex.build(
+            item_vectors, item_biases, nlist=settings.ANN_NLIST or None
+        )
+        logger.info(
+            f"{model_type.upper()} ANN index built: {ann_indexes[model_type].nlist} lists, "
+            f"{len(item_vectors)} items in {time() - start_time:.2f}s"
+        )
+    return ann_indexes
+
+
+@dataclass(frozen=True)
+class ModelSnapshot:
+    """
+    Неизменяемый снимок одной версии моделей: таблицы id пользователей
+    и фильмов (IdIndex, индекс = строка матриц факторов), латентные факторы
+    и ANN-индексы.
+
+    Запрос берёт ссылку на текущий снимок один раз и дальше работает только
+    с ней, а новая версия публикуется заменой этой ссылки целиком
+    (RecommendationModel.publish). Поэтому обучение и перезагрузка никогда
+    не меняют данные, которые читает выполняющийся запрос.
+    """
+
+    version: str = None
+    users: IdIndex = field(default_factory=lambda: IdIndex.from_ids([]))
+    movies: IdIndex = field(default_factory=lambda: IdIndex.from_ids([]))
+    # model_type -> (user_vectors, item_vectors, item_biases)
+    factors: dict = field(default_factory=dict)
+    # model_type -> IVFIndex
+    ann_indexes: dict = field(default_factory=dict)
+
+    @classmethod
+    def build(
+        cls,
+        version: str,
+        users: IdIndex,
+        movies: IdIndex,
+        factors: dict,
+        ann_indexes: dict = None,
+    ) -> "ModelSnapshot":
+        """Собирает снимок; ANN-индексы строятся, если не переданы готовые"""
+        return cls(
+            version=version,
+            users=users,
+            movies=movies,
+            factors=factors,
+            ann_indexes=(
+                build_ann_indexes(factors) if ann_indexes is None else ann_indexes
+            ),
+        )
+
+    def is_loaded(self, model_type: str) -> bool:
+        return model_type in self.factors and len(self.users) > 0
+
+    def to_arrays(self) -> dict:
+        """Массивы снимка для сохранения в артефакт (ml/artifacts.py)"""
+        arrays = {}
+        for table, id_index in (("users", self.users), ("movies", self.movies)):
+            for name, array in id_index.to_arrays().items():
+                arrays[f"{table}_{name}"] = array
+        for model_type, model_factors in self.factors.items():
+            user_vectors, item_vectors, item_biases = model_factors
+            arrays[f"{model_type}_user_vectors"] = user_vectors
+            arrays[f"{model_type}_item_vectors"] = item_vectors
+            if item_biases is not None:
+                arrays[f"{model_type}_item_biases"] = item_biases
+            if model_type in self.ann_indexes:
+                for name, array in self.ann_indexes[model_type].to_arrays().items():
+                    arrays[f"{model_type}_ann_{name}"] = array
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, version: str, arrays: dict, models: list) -> "ModelSnapshot":
+        """Восстанавливает снимок из массивов артефакта (в т.ч. открытых через mmap)"""
+        users, movies = (
+            IdIndex.from_arrays(
+                {
+                    name.removeprefix(f"{table}_"): array
+                    for name, array in arrays.items()
+                    if name.startswith(f"{table}_")
+                }
+            )
+            for table in ("users", "movies")
+        )
+
+        factors = {}
+        ann_indexes = {}
+        for model_type in models:
+            factors[model_type] = (
+                arrays[f"{model_type}_user_vectors"],
+                arrays[f"{model_type}_item_vectors"],
+                arrays.get(f"{model_type}_item_biases"),
+            )
+            prefix = f"{model_type}_ann_"
+            ann_arrays = {
+                name.removeprefix(prefix): array
+                for name, array in arrays.items()
+                if name.startswith(prefix)
+            }
+            if ann_arrays:
+                ann_indexes[model_type] = IVFIndex.from_arrays(ann_arrays)
+
+        if not settings.ANN_ENABLED:
+            ann_indexes = {}
+        elif ann_indexes.keys() != factors.keys():
+            # Версия сохранена без индексов — строим их при загрузке
+            ann_indexes = None
+
+        return cls.build(version, users, movies, factors, ann_indexes)
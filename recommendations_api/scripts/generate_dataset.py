@@ -0,0 +1,425 @@
+"""
+Масштабируемый синтетический датасет для нагрузочных тестов и бенчмарков.
+
+Размер задаётся масштабом: --scale 1 — 10 тыс. пользователей, 2 тыс. фильмов
+и около 300 тыс. взаимодействий; --scale 100 — миллион пользователей
+и 30 млн взаимодействий (каталог растёт как корень из масштаба).
+Популярность фильмов и активность пользователей распределены по степенному
+закону (--movie-alpha, --user-alpha), время взаимодействий — равномерно
+за --days дней.
+
+Коллекции делятся на блоки по --chunk-size документов; блок строится
+векторно (NumPy) из собственного зерна (seed, коллекция, номер блока),
+поэтому при одних --scale и --seed датасет одинаков при любом числе
+процессов. Процессы-писатели (--workers) вставляют блоки через
+insert_many(ordered=False) или пишут JSON Lines для mongoimport (--output).
+
+Запуск: python -m scripts.generate_dataset --scale 100 --workers 8 --drop
+"""
+
+import argparse
+import base64
+import json
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from time import time
+
+import numpy as np
+
+from core.config import settings
+from ml.id_index import unpack_uuids
+from ml.recommendation_logs import recommendation_log, timeseries_options
+
+GENRES = [
+    "Action",
+    "Adventure",
+    "Fantasy",
+    "Sci-Fi",
+    "Drama",
+    "Music",
+    "Romance",
+    "Thriller",
+    "Mystery",
+    "Comedy",
+    "Animation",
+    "Family",
+    "Biography",
+    "Musical",
+    "Crime",
+    "Short",
+    "Western",
+    "Documentary",
+    "History",
+    "War",
+    "Game-Show",
+    "Reality-TV",
+    "Horror",
+    "Sport",
+    "Talk-Show",
+    "News",
+]
+
+# Документов на единицу масштаба; feedback строится вместе с логами рекомендаций
+BASE_SIZES = {
+    "movies": 2000,
+    "users": 10000,
+    "favourite_genres": 3000,
+    "watched_movies": 200000,
+    "likes": 50000,
+    "bookmarks": 30000,
+    "recommendation_logs": 20000,
+}
+FEEDBACK_SHARE = 0.2  # Доля сессий рекомендаций с обратной связью
+
+
+@dataclass(frozen=True)
+class DatasetSpec:
+    scale: float = 1.0
+    seed: int = 42
+    days: int = 180
+    end: datetime = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    movie_alpha: float = 1.0
+    user_alpha: float = 0.8
+    chunk_size: int = 50000
+    logs_layout: str = settings.RECOMMENDATION_LOGS_LAYOUT
+
+    def size(self, collection: str) -> int:
+        if collection == "movies":
+            return max(1, round(BASE_SIZES["movies"] * self.scale**0.5))
+        return max(1, round(BASE_SIZES[collection] * self.scale))
+
+    def chunks(self, collection: str) -> int:
+        return -(-self.size(collection) // self.chunk_size)
+
+
+def power_law_cdf(n: int, alpha: float, rng: np.random.Generator) -> np.ndarray:
+    """CDF степенного распределения по n объектам; ранги перемешаны"""
+    weights = 1.0 / np.arange(1, n + 1) ** alpha
+    weights = weights[rng.permutation(n)]
+    cdf = np.cumsum(weights)
+    return cdf / cdf[-1]
+
+
+class Dataset:
+    """
+    Генератор блоков датасета. Таблицы id и распределения строятся один раз
+    на процесс из spec.seed, блоки — из зерна (seed, коллекция, номер).
+    """
+
+    def __init__(self, spec: DatasetSpec):
+        self.spec = spec
+        rng = np.random.default_rng([spec.seed, 0])
+        self.n_users = spec.size("users")
+        self.n_movies = spec.size("movies")
+        self.user_keys = np.frombuffer(rng.bytes(16 * self.n_users), dtype="S16")
+        self.movie_keys = np.frombuffer(rng.bytes(16 * self.n_movies), dtype="S16")
+        self.user_cdf = power_law_cdf(self.n_users, spec.user_alpha, rng)
+        self.movie_cdf = power_law_cdf(self.n_movies, spec.movie_alpha, rng)
+
+    def rng(self, collection: str, index: int) -> np.random.Generator:
+        return np.random.default_rng(
+            [self.spec.seed, zlib.crc32(collection.encode()), index]
+        )
+
+    def bounds(self, collection: str, index: int) -> tuple:
+        start = index * self.spec.chunk_size
+        return start, min(start + self.spec.chunk_size, self.spec.size(collection))
+
+    def user_ids(self, positions: np.ndarray) -> list:
+        return unpack_uuids(self.user_keys[positions]).tolist()
+
+    def movie_ids(self, positions: np.ndarray) -> list:
+        return unpack_uuids(self.movie_keys[positions]).tolist()
+
+    @staticmethod
+    def sample(cdf: np.ndarray, rng: np.random.Generator, n: int) -> np.ndarray:
+        return np.minimum(np.searchsorted(cdf, rng.random(n)), len(cdf) - 1)
+
+    def active_users(self, rng: np.random.Generator, n: int) -> np.ndarray:
+        return self.sample(self.user_cdf, rng, n)
+
+    def popular_movies(self, rng: np.random.Generator, n: int) -> np.ndarray:
+        return self.sample(self.movie_cdf, rng, n)
+
+    def timestamps(self, rng: np.random.Generator, n: int, days: int = None) -> list:
+        seconds = rng.random(n) * (days or self.spec.days) * 86400
+        start = self.spec.end - timedelta(days=days or self.spec.days)
+        return [start + timedelta(seconds=float(offset)) for offset in seconds]
+
+    def genres(self, rng: np.random.Generator, n: int) -> list:
+        counts = rng.integers(1, 4, n)
+        picks = rng.integers(0, len(GENRES), (n, 3))
+        return [
+            sorted({GENRES[g] for g in row[:count]})
+            for row, count in zip(picks, counts)
+        ]
+
+    def chunk(self, collection: str, index: int) -> dict:
+        """Блок index коллекции: {коллекция: документы}"""
+        rng = self.rng(collection, index)
+        start, end = self.bounds(collection, index)
+        n = end - start
+        build = getattr(self, f"build_{collection}")
+        return build(rng, start, end, n)
+
+    def build_movies(self, rng, start, end, n) -> dict:
+        ratings = np.clip(rng.normal(6.5, 1.5, n), 1, 10).round(1)
+        return {
+            "movies": [
+                {
+                    "_id": movie_id,
+                    "genres": genres,
+                    "rating": float(rating),
+                    "creation_date": created,
+                }
+                for movie_id, genres, rating, created in zip(
+                    self.movie_ids(np.arange(start, end)),
+                    self.genres(rng, n),
+                    ratings,
+                    self.timestamps(rng, n, days=self.spec.days * 4),
+                )
+            ]
+        }
+
+    def build_users(self, rng, start, end, n) -> dict:
+        return {
+            "users": [
+                {"_id": user_id, "username": f"user{position}"}
+                for position, user_id in zip(
+                    range(start, end), self.user_ids(np.arange(start, end))
+                )
+            ]
+        }
+
+    def build_favourite_genres(self, rng, start, end, n) -> dict:
+        return {
+            "favourite_genres": [
+                {"user_id": user_id, "genres": genres, "timestamp": timestamp}
+                for user_id, genres, timestamp in zip(
+                    self.user_ids(self.active_users(rng, n)),
+                    self.genres(rng, n),
+                    self.timestamps(rng, n),
+                )
+            ]
+        }
+
+    def interactions(self, rng, n) -> tuple:
+        return (
+            self.user_ids(self.active_users(rng, n)),
+            self.movie_ids(self.popular_movies(rng, n)),
+            self.timestamps(rng, n),
+        )
+
+    def build_watched_movies(self, rng, start, end, n) -> dict:
+        users, movies, timestamps = self.interactions(rng, n)
+        complete = rng.random(n) < 0.7
+        return {
+            "watched_movies": [
+                {
+                    "user_id": user_id,
+                    "movie_id": movie_id,
+                    "complete": bool(done),
+                    "watched_at": timestamp,
+                    "timestamp": timestamp,
+                }
+                for user_id, movie_id, done, timestamp in zip(
+                    users, movies, complete, timestamps
+                )
+            ]
+        }
+
+    def build_likes(self, rng, start, end, n) -> dict:
+        users, movies, timestamps = self.interactions(rng, n)
+        ratings = np.clip(rng.normal(7, 2, n), 0, 10).round().astype(int)
+        return {
+            "likes": [
+                {
+                    "user_id": user_id,
+                    "movie_id": movie_id,
+                    "rating": int(rating),
+                    "timestamp": timestamp,
+                }
+                for user_id, movie_id, rating, timestamp in zip(
+                    users, movies, ratings, timestamps
+                )
+            ]
+        }
+
+    def build_bookmarks(self, rng, start, end, n) -> dict:
+        users, movies, timestamps = self.interactions(rng, n)
+        return {
+            "bookmarks": [
+                {"user_id": user_id, "movie_id": movie_id, "timestamp": timestamp}
+                for user_id, movie_id, timestamp in zip(users, movies, timestamps)
+            ]
+        }
+
+    def build_recommendation_logs(self, rng, start, end, n) -> dict:
+        users = self.user_ids(self.active_users(rng, n))
+        model_types = np.where(rng.random(n) < 0.5, "als", "lightfm")
+        sessions = unpack_uuids(np.frombuffer(rng.bytes(16 * n), dtype="S16"))
+        timestamps = self.timestamps(rng, n)
+        limit = min(settings.RECOMMENDATIONS_LIMITS, self.n_movies)
+        recommended = self.popular_movies(rng, n * limit).reshape(n, limit)
+        with_feedback = rng.random(n) < FEEDBACK_SHARE
+
+        logs, feedback = [], []
+        for i in range(n):
+            result = {
+                "source": str(model_types[i]),
+                "recommendations": self.movie_ids(recommended[i]),
+                "session_id": str(sessions[i]),
+            }
+            logs.append(
+                recommendation_log(
+                    users[i],
+                    result["source"],
+                    result,
+                    timestamps[i],
+                    layout=self.spec.logs_layout,
+                )
+            )
+            if with_feedback[i]:
+                feedback.append(
+                    {
+                        "user_id": users[i],
+                        "session_id": result["session_id"],
+                        "movie_id": result["recommendations"][rng.integers(limit)],
+                        "liked": bool(rng.random() < 0.6),
+                        "timestamp": timestamps[i]
+                        + timedelta(seconds=float(rng.integers(60, 3600))),
+                    }
+                )
+        return {"recommendation_logs": logs, "feedback": feedback}
+
+
+def extended_json(value):
+    """Даты в Extended JSON, который понимает mongoimport"""
+    if isinstance(value, datetime):
+        return {"$date": {"$numberLong": str(round(value.timestamp() * 1000))}}
+    if isinstance(value, bytes):
+        # Двоичные поля time-series формата логов
+        return {
+            "$binary": {
+                "base64": base64.b64encode(value).decode(),
+                "subType": f"{getattr(value, 'subtype', 0):02x}",
+            }
+        }
+    raise TypeError(f"{type(value)} is not JSON serializable")
+
+
+# Состояние процесса-писателя (ProcessPoolExecutor initializer)
+worker = {}
+
+
+def init_worker(spec: DatasetSpec, mongo_url: str, database: str, output: str):
+    worker["dataset"] = Dataset(spec)
+    worker["output"] = output
+    if output is None:
+        import pymongo
+
+        worker["db"] = pymongo.MongoClient(mongo_url)[database]
+
+
+def write_chunk(collection: str, index: int) -> dict:
+    """Строит блок и пишет его в MongoDB или в файлы; возвращает число документов"""
+    written = {}
+    for name, documents in worker["dataset"].chunk(collection, index).items():
+        if not documents:
+            continue
+        if worker["output"] is None:
+            worker["db"][name].insert_many(documents, ordered=False)
+        else:
+            directory = os.path.join(worker["output"], name)
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"{collection}-{index:05d}.json")
+            with open(path, "w") as f:
+                for document in documents:
+                    f.write(json.dumps(document, default=extended_json) + "\n")
+        written[name] = len(documents)
+    return written
+
+
+def prepare(spec: DatasetSpec, mongo_url: str, database: str, collections: list, drop):
+    import pymongo
+
+    db = pymongo.MongoClient(mongo_url)[database]
+    names = collections + (["feedback"] if "recommendation_logs" in collections else [])
+    if drop:
+        for name in names:
+            db.drop_collection(name)
+    if (
+        "recommendation_logs" in collections
+        and spec.logs_layout == "timeseries"
+        and "recommendation_logs" not in db.list_collection_names()
+    ):
+        db.create_collection("recommendation_logs", **timeseries_options())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--movie-alpha", type=float, default=1.0)
+    parser.add_argument("--user-alpha", type=float, default=0.8)
+    parser.add_argument("--chunk-size", type=int, default=50000)
+    parser.add_argument(
+        "--collections", nargs="+", default=list(BASE_SIZES), choices=list(BASE_SIZES)
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--mongo-url", default=settings.MONGO_URL)
+    parser.add_argument("--database", default=settings.DATABASE_NAME)
+    parser.add_argument("--drop", action="store_true", help="Очистить коллекции")
+    parser.add_argument("--output", help="Каталог JSON Lines для mongoimport")
+    parser.add_argument("--logs-layout", default=settings.RECOMMENDATION_LOGS_LAYOUT)
+    args = parser.parse_args()
+
+    spec = DatasetSpec(
+        scale=args.scale,
+        seed=args.seed,
+        days=args.days,
+        movie_alpha=args.movie_alpha,
+        user_alpha=args.user_alpha,
+        chunk_size=args.chunk_size,
+        logs_layout=args.logs_layout,
+    )
+    if args.output is None:
+        prepare(spec, args.mongo_url, args.database, args.collections, args.drop)
+
+    start_time = time()
+    totals = {}
+    with ProcessPoolExecutor(
+        args.workers,
+        initializer=init_worker,
+        initargs=(spec, args.mongo_url, args.database, args.output),
+    ) as pool:
+        futures = [
+            pool.submit(write_chunk, collection, index)
+            for collection in args.collections
+            for index in range(spec.chunks(collection))
+        ]
+        for future in as_completed(futures):
+            for name, count in future.result().items():
+                totals[name] = totals.get(name, 0) + count
+            done = sum(totals.values())
+            print(
+                f"{done} documents ({done / (time() - start_time):.0f}/s)",
+                end="\r",
+                flush=True,
+            )
+    print()
+    print(json.dumps({"scale": args.scale, "seed": args.seed, **totals}))
+    if args.output:
+        print(
+            f"mongoimport: for f in {args.output}/<collection>/*.json; do "
+            f"mongoimport --uri {args.mongo_url}/{args.database} "
+            "--collection <collection> --file $f; done"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Перевод recommendation_logs в time-series коллекцию с двоичными UUID.
+
+Существующая коллекция переименовывается в recommendation_logs_legacy,
+создаётся time-series recommendation_logs (срок хранения —
+RECOMMENDATION_LOGS_TTL_DAYS), и документы переносятся пачками
+в компактном формате. Записи API, пришедшие во время миграции, попадают
+уже в новую коллекцию. Перенесённые документы удаляются из старой
+коллекции, поэтому прерванный запуск можно просто повторить; опустевшая
+коллекция удаляется. После миграции API запускается
+с RECOMMENDATION_LOGS_LAYOUT=timeseries.
+
+Запуск: python -m scripts.migrate_recommendation_logs --mongo-url mongodb://localhost:27017
+"""
+
+import argparse
+from time import time
+
+import pymongo
+
+from core.config import settings
+from ml.recommendation_logs import (
+    COLLECTION,
+    decode_log,
+    recommendation_log,
+    timeseries_options,
+)
+
+LEGACY_COLLECTION = f"{COLLECTION}_legacy"
+
+
+def migrate(db, batch_size: int, ttl_days: int) -> int:
+    info = list(db.list_collections(filter={"name": COLLECTION}))
+    is_timeseries = bool(info) and info[0].get("type") == "timeseries"
+    if info and not is_timeseries:
+        db[COLLECTION].rename(LEGACY_COLLECTION)
+    if not is_timeseries:
+        db.create_collection(COLLECTION, **timeseries_options(ttl_days))
+        print(f"Created time-series collection {COLLECTION}")
+    # Иначе предыдущий запуск прервался после переименования: продолжаем перенос
+    if LEGACY_COLLECTION not in db.list_collection_names():
+        print(f"Nothing to migrate: no {LEGACY_COLLECTION} collection")
+        return 0
+
+    legacy, target = db[LEGACY_COLLECTION], db[COLLECTION]
+    migrated = 0
+    start_time = time()
+    while True:
+        docs = list(legacy.find().sort("_id", 1).limit(batch_size))
+        if not docs:
+            break
+        compact = []
+        for doc in docs:
+            log = decode_log(doc)
+            result = {
+                "source": log["source"] or log["model_type"],
+                "recommendations": log["recommendations"],
+                "session_id": log["session_id"],
+            }
+            compact.append(
+                recommendation_log(
+                    log.get("user_id"),
+                    log["model_type"] or log["source"],
+                    result,
+                    log["timestamp"],
+                    layout="timeseries",
+                )
+            )
+        target.insert_many(compact, ordered=False)
+        legacy.delete_many({"_id": {"$in": [doc["_id"] for doc in docs]}})
+        migrated += len(docs)
+        print(
+            f"Migrated {migrated} documents ({migrated / (time() - start_time):.0f}/s)"
+        )
+
+    legacy.drop()
+    return migrated
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mongo-url", default=settings.MONGO_URL)
+    parser.add_argument("--database", default=settings.DATABASE_NAME)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument(
+        "--ttl-days", type=int, default=settings.RECOMMENDATION_LOGS_TTL_DAYS
+    )
+    args = parser.parse_args()
+
+    db = pymongo.MongoClient(args.mongo_url)[args.database]
+    migrated = migrate(db, args.batch_size, args.ttl_days)
+    print(f"Done: {migrated} documents in {COLLECTION}")
+
+
+if __name__ == "__main__":
+    main()
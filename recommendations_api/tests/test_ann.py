@@ -0,0 +1,58 @@
+import numpy as np
+
+from ml.ann import IVFIndex
+from ml.ranking import top_k_indices
+
+
+def clustered_vectors(n_items=2000, factors=16, clusters=20, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, factors)) * 3
+    labels = rng.integers(0, clusters, n_items)
+    vectors = centers[labels] + rng.standard_normal((n_items, factors))
+    return vectors.astype(np.float32)
+
+
+def test_full_probe_matches_exact_search():
+    item_vectors = clustered_vectors()
+    query = np.random.default_rng(1).standard_normal(16).astype(np.float32)
+    index = IVFIndex.build(item_vectors, nlist=32)
+
+    items, scores = index.search(query, 10, nprobe=index.nlist)
+
+    expected = top_k_indices(item_vectors @ query, 10)
+    assert items.tolist() == expected.tolist()
+    np.testing.assert_allclose(scores, (item_vectors @ query)[expected], rtol=1e-5)
+
+
+def test_partial_probe_recall():
+    item_vectors = clustered_vectors()
+    rng = np.random.default_rng(2)
+    index = IVFIndex.build(item_vectors, nlist=32)
+
+    hits = 0
+    for query in rng.standard_normal((50, 16)).astype(np.float32):
+        items, _ = index.search(query, 10, nprobe=8)
+        hits += len(set(items) & set(top_k_indices(item_vectors @ query, 10)))
+
+    assert hits / 500 >= 0.9
+
+
+def test_biases_and_exclude():
+    item_vectors = np.zeros((4, 2), dtype=np.float32)
+    item_biases = np.array([0.1, 0.4, 0.3, 0.2], dtype=np.float32)
+    index = IVFIndex.build(item_vectors, item_biases, nlist=2)
+
+    items, _ = index.search(np.ones(2), 2, nprobe=2, exclude=np.array([1]))
+
+    assert items.tolist() == [2, 3]
+
+
+def test_serialization_roundtrip():
+    item_vectors = clustered_vectors(n_items=300)
+    index = IVFIndex.build(item_vectors, nlist=8)
+    query = np.ones(16, dtype=np.float32)
+
+    restored = IVFIndex.from_arrays(index.to_arrays())
+
+    assert restored.n_items == 300
+    assert restored.search(query, 5)[0].tolist() == index.search(query, 5)[0].tolist()
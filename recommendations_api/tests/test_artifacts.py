@@ -0,0 +1,75 @@
+import json
+import os
+import shutil
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+from ml.artifacts import (
+    download_artifact,
+    read_arrays,
+    read_manifest,
+    upload_artifact,
+    write_artifact,
+)
+
+
+@pytest.fixture
+def arrays():
+    return {
+        "user_ids": np.array(["u1", "u2"], dtype="S"),
+        "als_item_vectors": np.arange(6, dtype=np.float32).reshape(3, 2),
+    }
+
+
+def test_write_and_read_artifact_mmap(tmp_path, arrays):
+    manifest = write_artifact(str(tmp_path), arrays, metadata={"version": "v1"})
+
+    loaded = read_arrays(str(tmp_path), read_manifest(str(tmp_path)))
+
+    assert manifest["version"] == "v1"
+    assert manifest["arrays"]["als_item_vectors"]["shape"] == [3, 2]
+    assert isinstance(loaded["als_item_vectors"], np.memmap)
+    np.testing.assert_array_equal(
+        loaded["als_item_vectors"], arrays["als_item_vectors"]
+    )
+    assert loaded["user_ids"].tolist() == [b"u1", b"u2"]
+
+
+def test_unsupported_format_version(tmp_path, arrays):
+    write_artifact(str(tmp_path), arrays)
+    manifest_path = tmp_path / "manifest.json"
+    manifest = json.loads(manifest_path.read_text())
+    manifest["format_version"] = 999
+    manifest_path.write_text(json.dumps(manifest))
+
+    with pytest.raises(ValueError):
+        read_manifest(str(tmp_path))
+
+
+def test_upload_and_download_roundtrip(tmp_path, arrays):
+    source = tmp_path / "source"
+    os.makedirs(source / "training")
+    (source / "training" / "state.bin").write_bytes(b"state")
+    write_artifact(str(source), arrays, training_files=["state.bin"])
+
+    client = MagicMock()
+    uploaded = {}
+    client.fput_object.side_effect = lambda bucket, key, path: uploaded.update(
+        {key: path}
+    )
+    client.fget_object.side_effect = lambda bucket, key, path: shutil.copy(
+        uploaded[key], path
+    )
+
+    upload_artifact(client, "models", "v1", str(source))
+    # manifest загружается последним, затем обновляется указатель latest.json
+    assert list(uploaded)[-1] == "artifacts/v1/manifest.json"
+    client.put_object.assert_called_once()
+
+    serving = download_artifact(client, "models", "v1", str(tmp_path / "cache"))
+    assert not os.path.exists(os.path.join(serving, "training", "state.bin"))
+
+    download_artifact(client, "models", "v1", str(tmp_path / "cache"), True)
+    assert os.path.exists(os.path.join(serving, "training", "state.bin"))
@@ -0,0 +1,91 @@
+import asyncio
+
+import numpy as np
+
+from ml.batching import MicroBatcher
+from ml.id_index import IdIndex
+from ml.ranking import top_k_indices
+from ml.scoring import ScoringExecutor
+from ml.snapshot import ModelSnapshot
+
+
+def make_snapshot(n_users=20, n_items=50):
+    rng = np.random.default_rng(0)
+    return ModelSnapshot.build(
+        "v1",
+        IdIndex.from_ids(f"u{i}" for i in range(n_users)),
+        IdIndex.from_ids(f"m{i}" for i in range(n_items)),
+        {
+            "lightfm": (
+                rng.standard_normal((n_users, 4), dtype=np.float32),
+                rng.standard_normal((n_items, 4), dtype=np.float32),
+                rng.standard_normal(n_items, dtype=np.float32),
+            )
+        },
+        ann_indexes={},
+    )
+
+
+def expected_top(snapshot, user_idx, exclude, n):
+    user_vectors, item_vectors, item_biases = snapshot.factors["lightfm"]
+    scores = item_vectors @ user_vectors[user_idx] + item_biases
+    scores[exclude] = -np.inf
+    return top_k_indices(scores, n).tolist()
+
+
+class CountingExecutor(ScoringExecutor):
+    def __init__(self):
+        super().__init__(workers=1)
+        self.calls = 0
+
+    async def run(self, func, *args, **kwargs):
+        self.calls += 1
+        return await super().run(func, *args, **kwargs)
+
+
+def test_micro_batcher_scores_concurrent_requests_together():
+    snapshot = make_snapshot()
+    scoring = CountingExecutor()
+    batcher = MicroBatcher(scoring, max_wait_ms=50, max_batch=64)
+    requests = [
+        (user_idx, np.array([user_idx, 7]), 3 + user_idx % 2) for user_idx in range(10)
+    ]
+
+    async def main():
+        return await asyncio.gather(
+            *(
+                batcher.score(snapshot, "lightfm", user_idx, exclude, n)
+                for user_idx, exclude, n in requests
+            )
+        )
+
+    results = asyncio.run(main())
+    scoring.shutdown()
+
+    assert scoring.calls == 1
+    for (user_idx, exclude, n), top_items in zip(requests, results):
+        assert top_items.tolist() == expected_top(snapshot, user_idx, exclude, n)
+
+
+def test_micro_batcher_flushes_on_max_batch():
+    snapshot = make_snapshot()
+    scoring = CountingExecutor()
+    # Ожидание пачки заведомо дольше теста: отправляет только max_batch
+    batcher = MicroBatcher(scoring, max_wait_ms=60000, max_batch=4)
+
+    async def main():
+        return await asyncio.wait_for(
+            asyncio.gather(
+                *(
+                    batcher.score(snapshot, "lightfm", user_idx, np.empty(0, int), 3)
+                    for user_idx in range(8)
+                )
+            ),
+            timeout=5,
+        )
+
+    results = asyncio.run(main())
+    scoring.shutdown()
+
+    assert scoring.calls == 2
+    assert all(len(top_items) == 3 for top_items in results)
@@ -0,0 +1,108 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock, patch
+
+from core.cache import (
+    MISSING,
+    CacheInvalidator,
+    LocalCache,
+    TwoTierCache,
+    cache_ttls,
+    encode_entry,
+)
+from core.metrics import CACHE_REFRESHES
+
+
+def test_local_cache_evicts_least_recently_used():
+    cache = LocalCache("test", max_size=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "a" теперь свежее "b"
+    cache.set("c", 3)
+
+    assert cache.get("b") is MISSING
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+
+
+def test_local_cache_expires_entries():
+    cache = LocalCache("test", max_size=10, ttl=60)
+    with patch("core.cache.monotonic", return_value=100.0):
+        cache.set("a", 1)
+        cache.set("b", 2, ttl=5)  # TTL из Redis короче локального
+    with patch("core.cache.monotonic", return_value=110.0):
+        assert cache.get("a") == 1
+        assert cache.get("b") is MISSING
+    with patch("core.cache.monotonic", return_value=161.0):
+        assert cache.get("a") is MISSING
+    assert cache.entries == {}
+
+
+def test_two_tier_cache_serves_hits_locally():
+    redis = AsyncMock()
+    redis.get = AsyncMock(return_value=json.dumps({"recommendations": ["m1"]}))
+    cache = TwoTierCache(LocalCache("test", max_size=10, ttl=60), CacheInvalidator())
+
+    async def main():
+        return [await cache.get(redis, "key") for _ in range(3)]
+
+    assert asyncio.run(main()) == [({"recommendations": ["m1"]}, False)] * 3
+    redis.get.assert_awaited_once_with("key")
+
+
+def test_invalidation_skips_own_messages():
+    writer, reader = CacheInvalidator(), CacheInvalidator()
+    writer_cache = TwoTierCache(LocalCache("test", max_size=10, ttl=60), writer)
+    reader_cache = TwoTierCache(LocalCache("test", max_size=10, ttl=60), reader)
+    reader_cache.local.set("key", "old")
+    reader_cache.local.set("other", "old")
+    redis = AsyncMock()
+
+    asyncio.run(writer_cache.set(redis, "key", "new", 30, 60))
+    message = redis.publish.await_args.args[1]
+    writer.handle(message)
+    reader.handle(message)
+
+    assert writer_cache.local.get("key")[0] == "new"
+    assert reader_cache.local.get("key") is MISSING
+    assert reader_cache.local.get("other") == "old"
+
+    reader.handle(f"{writer.node_id} test *")
+    assert reader_cache.local.get("other") is MISSING
+
+
+def test_cache_ttls_jitter_keeps_soft_before_hard():
+    ttls = [cache_ttls(2700, 3600, jitter=0.1) for _ in range(200)]
+
+    assert all(soft < hard for soft, hard in ttls)
+    assert all(3240 <= hard <= 3960 for _, hard in ttls)
+    assert len({hard for _, hard in ttls}) > 50
+
+
+def test_stale_value_is_served_and_refreshed_once():
+    redis = AsyncMock()
+    redis.get = AsyncMock(return_value=encode_entry(["old"], soft_ttl=-1))
+    redis.set = AsyncMock(return_value=True)
+    cache = TwoTierCache(LocalCache("swr", max_size=10, ttl=60), CacheInvalidator())
+    refreshes = []
+
+    async def refresh():
+        refreshes.append(1)
+        await asyncio.sleep(0.01)
+        await cache.set(redis, "key", ["new"], 30, 60)
+
+    async def main():
+        served = []
+        for _ in range(3):
+            value, stale = await cache.get(redis, "key")
+            served.append((value, stale))
+            if stale:
+                cache.refresh(redis, "key", refresh)
+        await asyncio.gather(*cache.refreshing.values())
+        return served, await cache.get(redis, "key")
+
+    served, after = asyncio.run(main())
+
+    assert served == [(["old"], True)] * 3
+    assert len(refreshes) == 1
+    assert after == (["new"], False)
+    assert CACHE_REFRESHES.labels(cache="swr", result="success")._value.get() == 1
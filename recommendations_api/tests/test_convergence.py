@@ -0,0 +1,96 @@
+from unittest.mock import patch
+
+import implicit
+import numpy as np
+from lightfm import LightFM
+from scipy.sparse import csr_matrix
+from scipy.sparse import random as sparse_random
+
+from ml import convergence
+from ml.convergence import (
+    EarlyStopping,
+    fit_als_until_plateau,
+    fit_lightfm_until_plateau,
+    hit_rate_at_k,
+    holdout_split,
+)
+
+
+def test_early_stopping_waits_for_plateau():
+    stopping = EarlyStopping(tolerance=0.01, patience=2)
+
+    assert not stopping.update(10.0)
+    assert not stopping.update(5.0)
+    assert not stopping.update(4.99)  # Улучшение меньше 1%
+    assert not stopping.update(4.0)  # Счётчик плато сбрасывается
+    assert not stopping.update(4.0)
+    assert stopping.update(3.99)
+    assert stopping.best == 3.99
+
+
+def test_holdout_split_removes_one_interaction_per_user():
+    rng = np.random.default_rng(0)
+    matrix = csr_matrix(
+        ([1.0, 0.5, 1.0, 0.3, 1.0, 1.0], ([0, 0, 1, 2, 2, 2], [0, 1, 2, 0, 1, 3])),
+        shape=(3, 4),
+    )
+
+    train, users, items = holdout_split(matrix, 10, rng)
+
+    # У пользователя 1 одно взаимодействие — он не участвует
+    assert users.tolist() == [0, 2]
+    assert train.nnz == matrix.nnz - 2
+    assert all(matrix[u, i] > 0 and train[u, i] == 0 for u, i in zip(users, items))
+
+
+def test_hit_rate_at_k_excludes_seen_items():
+    item_vectors = np.eye(3, dtype=np.float32)
+    user_vectors = np.array([[1.0, 0.9, 0.0], [0.0, 0.0, 1.0]], dtype=np.float32)
+    train = csr_matrix(([1.0], ([0], [0])), shape=(2, 3))
+
+    # Просмотренный фильм 0 исключён, поэтому у первого пользователя top-1 — фильм 1
+    hit_rate = hit_rate_at_k(
+        user_vectors, item_vectors, None, train, np.array([0, 1]), np.array([1, 0]), k=1
+    )
+
+    assert hit_rate == 0.5
+
+
+def test_fit_lightfm_until_plateau_trains_last_epoch_on_all_interactions():
+    user_items = sparse_random(30, 20, density=0.3, format="csr", random_state=0)
+    model = LightFM(no_components=4, loss="warp", random_state=0)
+
+    with patch.object(model, "fit_partial", wraps=model.fit_partial) as fit_partial:
+        durations, _, overhead = fit_lightfm_until_plateau(
+            model, user_items, None, 5, 10, tolerance=0.0, patience=1
+        )
+
+    trained = [call.args[0].nnz for call in fit_partial.call_args_list]
+    # Эпохи подбора — без 10 отложенных взаимодействий, последняя — по всем
+    assert trained == [user_items.nnz - 10] * len(durations) + [user_items.nnz]
+    assert overhead > 0
+
+
+def test_fit_als_until_plateau_matches_fit_and_checks_loss_every_n():
+    user_items = sparse_random(40, 25, density=0.2, format="csr", random_state=0)
+    reference = implicit.als.AlternatingLeastSquares(
+        factors=4, iterations=5, random_state=0
+    )
+    reference.fit(user_items, show_progress=False)
+    model = implicit.als.AlternatingLeastSquares(
+        factors=4, iterations=5, random_state=0
+    )
+
+    with patch(
+        "ml.convergence.calculate_loss", wraps=convergence.calculate_loss
+    ) as calculate_loss:
+        durations, loss, overhead = fit_als_until_plateau(
+            model, user_items, tolerance=-1.0, patience=1, loss_every=2
+        )
+
+    # Без останова — те же факторы, что у fit; loss после итераций 2, 4 и 5
+    assert len(durations) == 5
+    assert calculate_loss.call_count == 3
+    assert loss > 0 and overhead > 0
+    np.testing.assert_allclose(model.user_factors, reference.user_factors, rtol=1e-5)
+    np.testing.assert_allclose(model.item_factors, reference.item_factors, rtol=1e-5)
@@ -0,0 +1,163 @@
+import asyncio
+import math
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from ml.evaluate_metrics import OnlineEvaluator, averages, session_metrics
+from ml.recommendation_logs import recommendation_log
+
+
+def test_session_metrics():
+    metrics = session_metrics(["a", "b", "c", "d"], {"b", "d", "x"}, [1, 3])
+
+    assert metrics["precision@1"] == 0.0
+    assert metrics["hit_rate@1"] == 0.0
+    assert metrics["precision@3"] == pytest.approx(1 / 3)
+    assert metrics["recall@3"] == pytest.approx(1 / 3)
+    assert metrics["hit_rate@3"] == 1.0
+    idcg = 1 + 1 / math.log2(3) + 1 / math.log2(4)
+    assert metrics["ndcg@3"] == pytest.approx((1 / math.log2(3)) / idcg)
+
+
+class FakeCursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def __aiter__(self):
+        return self.aiter()
+
+    async def aiter(self):
+        for document in self.documents:
+            yield document
+
+    async def to_list(self, length):
+        return list(self.documents)
+
+
+def in_window(value: datetime, window: dict) -> bool:
+    return window["$gt"] < value <= window["$lte"]
+
+
+class FakeDatabase(dict):
+    """feedback, recommendation_logs и evaluation_state в памяти"""
+
+    def __init__(self, feedback, logs):
+        super().__init__(
+            feedback=FakeFeedback(feedback),
+            recommendation_logs=FakeLogs(logs),
+            evaluation_state=FakeState(),
+        )
+
+
+class FakeFeedback:
+    def __init__(self, documents):
+        self.documents = documents
+        self.pipelines = []
+
+    def aggregate(self, pipeline, allowDiskUse=False):
+        # $match + $group из конвейера оценщика
+        self.pipelines.append(pipeline)
+        since = pipeline[0]["$match"]["timestamp"]["$gt"]
+        groups = {}
+        for fb in self.documents:
+            if fb["liked"] and fb["timestamp"] > since:
+                groups.setdefault(fb["session_id"], set()).add(fb["movie_id"])
+        return FakeCursor(
+            [{"_id": key, "liked": list(liked)} for key, liked in groups.items()]
+        )
+
+
+class FakeLogs:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def find(self, query, projection):
+        keys = query["session_id"]["$in"]
+        return FakeCursor(
+            [
+                log
+                for log in self.documents
+                if log["session_id"] in keys
+                and in_window(log["timestamp"], query["timestamp"])
+            ]
+        )
+
+
+class FakeState:
+    def __init__(self):
+        self.document = None
+
+    async def find_one(self, query):
+        return self.document
+
+    async def replace_one(self, query, document, upsert=False):
+        self.document = {"_id": query["_id"], **document}
+
+
+def make_session(model_type, recommendations, age, liked, now):
+    session_id = str(uuid.uuid4())
+    result = {
+        "source": model_type,
+        "recommendations": recommendations,
+        "session_id": session_id,
+    }
+    log = recommendation_log("user", model_type, result, now - age, layout="timeseries")
+    feedback = [
+        {
+            "session_id": session_id,
+            "movie_id": movie_id,
+            "liked": True,
+            "timestamp": now - age + timedelta(seconds=10),
+        }
+        for movie_id in liked
+    ]
+    return log, feedback
+
+
+def test_evaluator_processes_each_settled_session_once():
+    now = datetime.now(timezone.utc)
+    movies = [str(uuid.uuid4()) for _ in range(4)]
+    sessions = [
+        make_session("als", movies[:3], timedelta(hours=3), movies[:1], now),
+        make_session("lightfm", movies[1:], timedelta(hours=2), movies[3:], now),
+        # Ещё не прошла задержка settle: оценивается в следующих запусках
+        make_session("als", movies[:3], timedelta(minutes=5), movies[2:3], now),
+    ]
+    database = FakeDatabase(
+        [fb for _, feedback in sessions for fb in feedback],
+        [log for log, _ in sessions],
+    )
+    evaluator = OnlineEvaluator(
+        database, ks=[1, 3], settle=3600, layout="timeseries", batch_size=1
+    )
+
+    assert asyncio.run(evaluator.run_once()) == 2
+    means = averages(evaluator.totals)
+    assert means["als"]["hit_rate@1"] == 1.0
+    assert means["lightfm"]["hit_rate@1"] == 0.0
+    assert means["lightfm"]["hit_rate@3"] == 1.0
+    assert evaluator.watermark == database["evaluation_state"].document["watermark"]
+
+    # Повторный запуск читает только обратную связь новее водяного знака
+    watermark = evaluator.watermark
+    assert asyncio.run(evaluator.run_once()) == 0
+    since = database["feedback"].pipelines[-1][0]["$match"]["timestamp"]["$gt"]
+    assert since == watermark
+    assert evaluator.totals["als"]["samples"] == 1
+
+    # Новый процесс продолжает с сохранённого состояния
+    restarted = OnlineEvaluator(database, ks=[3, 1], layout="timeseries")
+    asyncio.run(restarted.load_state())
+    assert restarted.totals == evaluator.totals
+    other_ks = OnlineEvaluator(database, ks=[5], layout="timeseries")
+    asyncio.run(other_ks.load_state())
+    assert other_ks.watermark is None and other_ks.totals == {}
+
+
+def test_documents_layout_joins_in_mongo():
+    evaluator = OnlineEvaluator(FakeDatabase([], []), layout="documents")
+    window = {"$gt": datetime.min, "$lte": datetime.now()}
+    stages = [next(iter(stage)) for stage in evaluator.feedback_pipeline(window)]
+    assert stages == ["$match", "$group", "$lookup", "$match"]
@@ -0,0 +1,45 @@
+import asyncio
+import json
+from collections import Counter
+from unittest.mock import AsyncMock
+
+from core.experiments import ModelExperiment, choose_model, user_bucket
+
+
+def test_assignment_is_sticky_and_follows_split():
+    experiment = ModelExperiment(split={"als": 80, "lightfm": 20}, reload_interval=60)
+    redis = AsyncMock()
+    redis.get = AsyncMock(return_value=None)
+
+    async def assign_all():
+        return [await experiment.assign(redis, f"user-{i}") for i in range(5000)]
+
+    first, second = asyncio.run(assign_all()), asyncio.run(assign_all())
+
+    assert first == second
+    share = Counter(first)["als"] / len(first)
+    assert 0.77 < share < 0.83
+    # Конфигурация читается из Redis не чаще раза в reload_interval
+    redis.get.assert_awaited_once()
+
+
+def test_split_change_moves_only_boundary_users():
+    buckets = [user_bucket(f"user-{i}", "salt") for i in range(5000)]
+    before = [choose_model({"als": 50, "lightfm": 50}, bucket) for bucket in buckets]
+    after = [choose_model({"als": 60, "lightfm": 40}, bucket) for bucket in buckets]
+
+    moved = [(a, b) for a, b in zip(before, after) if a != b]
+    assert all(move == ("lightfm", "als") for move in moved)
+    assert 0.07 < len(moved) / len(buckets) < 0.13
+
+
+def test_experiment_config_reloads_from_redis():
+    experiment = ModelExperiment(split={"als": 50, "lightfm": 50}, reload_interval=0)
+    redis = AsyncMock()
+
+    redis.get = AsyncMock(return_value=json.dumps({"split": {"lightfm": 100}}))
+    assert asyncio.run(experiment.assign(redis, "user-1")) == "lightfm"
+
+    # Некорректная конфигурация игнорируется, остаются прежние доли
+    redis.get = AsyncMock(return_value=json.dumps({"split": {"random": 100}}))
+    assert asyncio.run(experiment.assign(redis, "user-1")) == "lightfm"
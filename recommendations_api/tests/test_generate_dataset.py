@@ -0,0 +1,29 @@
+from collections import Counter
+
+from scripts.generate_dataset import Dataset, DatasetSpec
+
+
+def test_chunks_are_deterministic_and_skewed():
+    spec = DatasetSpec(scale=0.1, chunk_size=5000)
+    first = Dataset(spec).chunk("watched_movies", 1)["watched_movies"]
+    # Другой процесс строит тот же блок независимо от остальных
+    assert Dataset(spec).chunk("watched_movies", 1)["watched_movies"] == first
+    assert first != Dataset(spec).chunk("watched_movies", 0)["watched_movies"]
+
+    counts = sorted(Counter(doc["movie_id"] for doc in first).values(), reverse=True)
+    n_movies = spec.size("movies")
+    # Степенной закон: десятая часть каталога собирает больше половины просмотров
+    assert sum(counts[: n_movies // 10]) > 0.5 * len(first)
+
+
+def test_feedback_refers_to_generated_sessions():
+    dataset = Dataset(DatasetSpec(scale=0.1, logs_layout="documents"))
+    chunk = dataset.chunk("recommendation_logs", 0)
+    logs = {log["session_id"]: log for log in chunk["recommendation_logs"]}
+
+    assert len(logs) == dataset.spec.size("recommendation_logs")
+    assert chunk["feedback"]
+    for feedback in chunk["feedback"]:
+        log = logs[feedback["session_id"]]
+        assert feedback["movie_id"] in log["recommendations"]
+        assert feedback["timestamp"] > log["timestamp"]
@@ -0,0 +1,68 @@
+import uuid
+
+import numpy as np
+
+from ml.id_index import IdIndex, pack_uuids, unpack_uuids
+
+
+def random_ids(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return [str(uuid.UUID(bytes=rng.bytes(16))) for _ in range(n)]
+
+
+def test_pack_unpack_uuids():
+    ids = random_ids(100)
+    packed, valid = pack_uuids(ids + ["not-a-uuid", ids[0].upper()])
+
+    assert valid.tolist() == [True] * 100 + [False, False]
+    assert packed[0].ljust(16, b"\0") == uuid.UUID(ids[0]).bytes
+    assert unpack_uuids(packed[:100]).tolist() == ids
+
+
+def test_lookup_and_ids_at():
+    ids = random_ids(1000)
+    index = IdIndex.from_ids(ids)
+    missing = random_ids(3, seed=1)
+
+    assert index.packed_uuids
+    assert (
+        index.lookup(ids[::-1] + missing).tolist()
+        == list(range(999, -1, -1)) + [-1] * 3
+    )
+    assert index.get(ids[42]) == 42 and index.get(missing[0]) is None
+    assert index.ids_at([5, 0]) == [ids[5], ids[0]]
+    assert index.nbytes == 24 * len(ids)
+
+
+def test_extend_keeps_existing_indexes():
+    ids = random_ids(500)
+    new_ids = random_ids(20, seed=2)
+    index = IdIndex.from_ids(ids)
+
+    extended = index.extend(new_ids + ids[:5] + new_ids[:1])
+
+    assert len(extended) == 520
+    assert extended.lookup(ids + new_ids).tolist() == list(range(520))
+    assert list(extended) == ids + new_ids
+    # Исходная таблица не меняется — её может читать текущий снимок модели
+    assert len(index) == 500 and index.get(new_ids[0]) is None
+
+
+def test_non_uuid_ids():
+    index = IdIndex.from_ids(["b", "a", "ccc"]).extend(["dddddd", "aa"])
+
+    assert not index.packed_uuids
+    assert index.lookup(["a", "ccc", "cc", "dddddd", "aa"]).tolist() == [1, 2, -1, 3, 4]
+    assert list(index) == ["b", "a", "ccc", "dddddd", "aa"]
+
+
+def test_map_to_aligns_indexes_between_versions():
+    ids = random_ids(300)
+    previous = IdIndex.from_ids(ids[:200])
+    current = IdIndex.from_ids(ids[100:] + ["legacy"])
+
+    mapping = current.map_to(previous)
+
+    assert mapping.tolist() == list(range(100, 200)) + [-1] * 101
+    # Разные форматы ключей сопоставляются через id
+    assert previous.map_to(current)[150] == 50
@@ -0,0 +1,176 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import implicit
+import numpy as np
+from lightfm import LightFM
+from scipy.sparse import csr_matrix
+from scipy.sparse import random as sparse_random
+
+from ml.id_index import IdIndex
+from ml.incremental import (
+    fold_in_als,
+    grow_lightfm,
+    warm_start_als,
+    warm_start_lightfm,
+)
+from ml.interactions import InteractionMatrix
+from ml.recommendation_model import RecommendationModel
+
+
+def make_als(user_items):
+    model = implicit.als.AlternatingLeastSquares(
+        factors=8, iterations=5, random_state=0
+    )
+    # cg_steps = factors: сопряжённые градиенты сходятся к точному решению
+    model.cg_steps = 8
+    model.fit(user_items, show_progress=False)
+    return model
+
+
+def test_fold_in_als_updates_only_touched_rows():
+    user_items = sparse_random(50, 30, density=0.2, format="csr", random_state=0)
+    user_items.data += 1.0  # Веса >= 1: точное решение считается через Cholesky
+    model = make_als(user_items)
+    old_users, old_items = model.user_factors.copy(), model.item_factors.copy()
+
+    # Новые взаимодействия: пользователь 3 и новый пользователь 50 с новым фильмом 30
+    delta = csr_matrix(([1.0, 1.0, 0.5], ([3, 50, 50], [5, 30, 2])), shape=(51, 31))
+    user_items.resize((51, 31))
+    user_items = (user_items + delta).tocsr()
+    stats = fold_in_als(model, user_items, delta)
+
+    assert stats == {"users": 2, "items": 3, "duration": stats["duration"]}
+    assert model.user_factors.shape == (51, 8)
+    assert model.item_factors.shape == (31, 8)
+    untouched_users = np.setdiff1d(np.arange(50), [3])
+    untouched_items = np.setdiff1d(np.arange(30), [2, 5])
+    assert np.array_equal(
+        model.user_factors[untouched_users], old_users[untouched_users]
+    )
+    assert np.array_equal(
+        model.item_factors[untouched_items], old_items[untouched_items]
+    )
+    assert np.abs(model.item_factors[30]).sum() > 0
+    # Вектор пользователя — решение задачи наименьших квадратов при фиксированных фильмах
+    expected = model.recalculate_user([3, 50], user_items[[3, 50]])
+    assert np.allclose(model.user_factors[[3, 50]], expected, atol=1e-3)
+
+
+def test_grow_lightfm_allows_fit_partial_with_new_users_and_items():
+    interactions = sparse_random(20, 10, density=0.3, format="coo", random_state=0)
+    model = LightFM(no_components=4, loss="warp", random_state=0)
+    model.fit(interactions, epochs=2)
+
+    interactions = interactions.tocsr()
+    interactions.resize((22, 12))
+    grow_lightfm(model, 22, 12)
+    model.fit_partial(interactions.tocoo(), epochs=1)
+
+    assert model.user_embeddings.shape == (22, 4)
+    assert model.item_embeddings.shape == (12, 4)
+    assert model.item_bias_gradients.shape == (12,)
+    assert len(model.predict(21, np.arange(12))) == 12
+
+
+@patch("ml.recommendation_model.settings.ALS_PARTIAL_MODE", "full")
+def test_partial_train_full_mode_grows_als_factors():
+    user_items = sparse_random(20, 10, density=0.3, format="csr", random_state=0)
+    user_items.data += 1.0
+    users = IdIndex.from_ids([f"u{i}" for i in range(20)])
+    movies = IdIndex.from_ids([f"m{i}" for i in range(10)])
+    model = RecommendationModel(load=False)
+    model.publish(model.fit(InteractionMatrix(user_items, users, movies, 60, 0.0)))
+
+    # Новый пользователь u20 посмотрел новый фильм m10 и старый m3
+    grown_users, grown_movies = users.extend(["u20"]), movies.extend(["m10"])
+    delta = csr_matrix(([1.0, 1.0], ([20, 20], [10, 3])), shape=(21, 11))
+    loaded = InteractionMatrix(delta, grown_users, grown_movies, 2, 0.0)
+    with (
+        patch("ml.recommendation_model.count_interactions", AsyncMock(return_value=2)),
+        patch(
+            "ml.recommendation_model.load_interaction_matrix",
+            AsyncMock(return_value=loaded),
+        ),
+        patch.object(model, "load_item_features", AsyncMock(return_value=None)),
+        patch.object(model, "save_models") as save_models,
+    ):
+        asyncio.run(model.partial_train(db=None))
+
+    assert model.als_model.user_factors.shape == (21, model.als_factors)
+    assert model.als_model.item_factors.shape == (11, model.als_factors)
+    snapshot = save_models.call_args.args[0]
+    user_vectors, item_vectors, _ = snapshot.factors["als"]
+    assert np.abs(user_vectors[20]).sum() > 0
+    assert np.abs(item_vectors[10]).sum() > 0
+
+
+class FakeMovies:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, query, projection=None):
+        return self
+
+    async def to_list(self, length):
+        return self.docs
+
+
+def test_load_item_features_follow_movie_index():
+    db = {
+        "movies": FakeMovies(
+            [
+                {"_id": "m1", "genres": ["Drama", "War"]},
+                {"_id": "m2", "genres": "Comedy"},
+                {"_id": "m3"},
+            ]
+        )
+    }
+    model = SimpleNamespace(genres=None)
+    # m4 есть во взаимодействиях, но не в каталоге
+    movies = IdIndex.from_ids(["m4", "m2", "m1"])
+
+    features = asyncio.run(RecommendationModel.load_item_features(model, db, movies))
+
+    assert model.genres == ["Comedy", "Drama", "War"]
+    assert features.toarray().tolist() == [[0, 0, 0], [1, 0, 0], [0, 1, 1]]
+
+    # При дообучении словарь не меняется, новые жанры пропускаются
+    db["movies"].docs.append({"_id": "m4", "genres": ["Horror", "War"]})
+    features = asyncio.run(RecommendationModel.load_item_features(model, db, movies))
+    assert model.genres == ["Comedy", "Drama", "War"]
+    assert features.toarray()[0].tolist() == [0, 0, 1]
+
+
+def test_warm_start_als_copies_known_rows():
+    user_items = sparse_random(20, 10, density=0.3, format="csr", random_state=0)
+    previous = make_als(user_items)
+    model = implicit.als.AlternatingLeastSquares(factors=8, random_state=0)
+    user_map = np.array([3, -1, 0])
+    item_map = np.array([-1, 9])
+
+    assert warm_start_als(
+        model, previous.user_factors, previous.item_factors, user_map, item_map
+    )
+
+    assert np.array_equal(model.user_factors[[0, 2]], previous.user_factors[[3, 0]])
+    assert np.array_equal(model.item_factors[1], previous.item_factors[9])
+    assert model.user_factors.shape == (3, 8)
+    assert np.abs(model.user_factors[1]).max() <= 0.01
+
+
+def test_warm_start_lightfm_aligns_state_by_feature():
+    interactions = sparse_random(20, 10, density=0.3, format="coo", random_state=0)
+    previous = LightFM(no_components=4, loss="warp", random_state=0)
+    previous.fit(interactions, epochs=2)
+    model = LightFM(no_components=4, loss="warp", random_state=1)
+
+    assert warm_start_lightfm(model, previous, np.array([5, -1]), np.array([2]))
+
+    assert np.array_equal(model.user_embeddings[0], previous.user_embeddings[5])
+    assert np.array_equal(
+        model.user_embedding_gradients[0], previous.user_embedding_gradients[5]
+    )
+    assert np.array_equal(model.item_biases, previous.item_biases[[2]])
+    assert np.all(model.user_embedding_gradients[1] == 1.0)  # adagrad с нуля
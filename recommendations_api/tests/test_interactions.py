@@ -0,0 +1,117 @@
+import asyncio
+import uuid
+
+import numpy as np
+import pytest
+
+from ml.id_index import IdIndex
+from ml.interactions import MemoryGrowth, load_interaction_matrix
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def batch_size(self, size):
+        return self
+
+    async def to_list(self, length):
+        docs, self.docs = self.docs[:length], self.docs[length:]
+        return docs
+
+
+class FakeCollection:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def count_documents(self, query):
+        return len(self.docs)
+
+    def find(self, query, projection=None):
+        return FakeCursor(list(self.docs))
+
+
+def make_db(watched=(), likes=(), bookmarks=()):
+    return {
+        "watched_movies": FakeCollection(
+            [{"user_id": u, "movie_id": m, "complete": c} for u, m, c in watched]
+        ),
+        "likes": FakeCollection(
+            [{"user_id": u, "movie_id": m, "rating": r} for u, m, r in likes]
+        ),
+        "bookmarks": FakeCollection(
+            [{"user_id": u, "movie_id": m} for u, m in bookmarks]
+        ),
+    }
+
+
+U1, U2, U3 = (str(uuid.UUID(int=i)) for i in (1, 2, 3))
+M1, M2 = (str(uuid.UUID(int=i)) for i in (10, 20))
+
+
+def test_load_interaction_matrix_weights_and_duplicates():
+    db = make_db(
+        watched=[(U1, M1, True), (U2, M1, False)],
+        likes=[(U1, M1, 8), (U2, M2, 5)],
+        bookmarks=[(U1, M2)],
+    )
+
+    loaded = asyncio.run(load_interaction_matrix(db, batch_size=1))
+
+    assert loaded.rows == 5
+    assert loaded.users.packed_uuids
+    matrix = loaded.matrix.toarray()
+    u1, u2 = loaded.users.lookup([U1, U2])
+    m1, m2 = loaded.movies.lookup([M1, M2])
+    # Повторная пара суммируется: просмотр (1.0) + лайк (8 / 10)
+    assert np.isclose(matrix[u1, m1], 1.8)
+    assert np.isclose(matrix[u1, m2], 0.3)
+    assert np.isclose(matrix[u2, m1], 0.5)
+    assert np.isclose(matrix[u2, m2], 0.5)
+
+
+def test_load_interaction_matrix_extends_base_index():
+    users = IdIndex.from_ids([U2, U1])
+    movies = IdIndex.from_ids([M2])
+    db = make_db(watched=[(U3, M1, True), (U1, M2, True)])
+
+    loaded = asyncio.run(load_interaction_matrix(db, users=users, movies=movies))
+
+    # Индексы существующих id сохраняются, новые дописываются в конец
+    assert list(loaded.users) == [U2, U1, U3]
+    assert list(loaded.movies) == [M2, M1]
+    assert loaded.matrix.shape == (3, 2)
+    assert loaded.matrix[2, 1] == 1.0
+    assert loaded.matrix[1, 0] == 1.0
+
+
+def test_load_interaction_matrix_non_uuid_ids():
+    db = make_db(watched=[(U1, M1, True)], bookmarks=[("legacy-user", M1)])
+
+    loaded = asyncio.run(load_interaction_matrix(db, batch_size=1))
+
+    assert not loaded.users.packed_uuids
+    assert sorted(loaded.users) == sorted([U1, "legacy-user"])
+    assert loaded.matrix[loaded.users.get("legacy-user"), 0] == np.float32(0.3)
+
+
+def test_load_interaction_matrix_empty():
+    loaded = asyncio.run(load_interaction_matrix(make_db()))
+
+    assert loaded.rows == 0
+    assert loaded.matrix.shape == (0, 0)
+
+
+def test_memory_growth_measures_peak_of_the_window_only():
+    # Пик до начала замера (как у прошлых этапов процесса) не учитывается
+    before = np.ones(64 * 2**20 // 8)
+    del before
+    memory = MemoryGrowth()
+    if memory.start is None or not memory.peak_reset:
+        pytest.skip("VmHWM reset is not available")
+
+    allocated = np.ones(32 * 2**20 // 8)  # 32 MB, освобождаются до замера
+    del allocated
+
+    # RSS остального процесса за окно может немного уменьшиться
+    assert 30 * 2**20 <= memory.peak() < 60 * 2**20
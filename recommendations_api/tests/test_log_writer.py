@@ -0,0 +1,79 @@
+import asyncio
+
+from core.log_writer import BufferedWriter
+from core.metrics import LOG_WRITER_DROPPED
+
+
+class FakeCollection:
+    def __init__(self):
+        self.batches = []
+
+    async def insert_many(self, documents, ordered=True):
+        assert ordered is False
+        await asyncio.sleep(0)
+        self.batches.append(list(documents))
+
+
+class FakeDatabase(dict):
+    def __missing__(self, name):
+        collection = self[name] = FakeCollection()
+        return collection
+
+
+def test_writer_batches_by_size_and_flushes_on_stop():
+    database = FakeDatabase()
+    writer = BufferedWriter(database, queue_size=100, batch_size=4, flush_interval=60)
+
+    async def main():
+        writer.start()
+        for i in range(10):
+            await writer.write("recommendation_logs", {"i": i})
+        await writer.write("feedback", {"liked": True})
+        await asyncio.sleep(0.05)
+        flushed_before_stop = len(database["recommendation_logs"].batches)
+        await writer.stop()
+        return flushed_before_stop
+
+    # Две полные пачки уходят сразу, остаток — только при остановке
+    assert asyncio.run(main()) == 2
+    batches = database["recommendation_logs"].batches
+    assert [len(batch) for batch in batches] == [4, 4, 2]
+    assert [doc["i"] for batch in batches for doc in batch] == list(range(10))
+    assert database["feedback"].batches == [[{"liked": True}]]
+
+
+def test_writer_flushes_by_time():
+    database = FakeDatabase()
+    writer = BufferedWriter(
+        database, queue_size=100, batch_size=100, flush_interval=0.02
+    )
+
+    async def main():
+        writer.start()
+        await writer.write("feedback", {"liked": False})
+        await asyncio.sleep(0.1)
+        flushed = list(database["feedback"].batches)
+        await writer.stop()
+        return flushed
+
+    assert asyncio.run(main()) == [[{"liked": False}]]
+
+
+def test_writer_drops_on_overflow_without_blocking():
+    database = FakeDatabase()
+    writer = BufferedWriter(database, queue_size=2, batch_size=1, flush_interval=60)
+    dropped = LOG_WRITER_DROPPED.labels(collection="feedback", reason="overflow")
+    before = dropped._value.get()
+
+    async def main():
+        writer.start()
+        # write не ждёт места в очереди: помещаются два документа, прочие отброшены
+        accepted = [await writer.write("feedback", {"i": i}) for i in range(6)]
+        await writer.stop()
+        return accepted
+
+    accepted = asyncio.run(main())
+
+    assert accepted == [True, True, False, False, False, False]
+    assert dropped._value.get() - before == 4
+    assert database["feedback"].batches == [[{"i": 0}], [{"i": 1}]]
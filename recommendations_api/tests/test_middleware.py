@@ -0,0 +1,62 @@
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from core.jwt import security_jwt
+from core.middleware import UNMATCHED_ROUTE
+from main import app
+
+client = TestClient(app)
+
+FEEDBACK_ROUTE = "/api/recommend/v1/recommendations/feedback/{session_id}"
+
+
+def requests_total(method: str, endpoint: str, status: str) -> float:
+    return (
+        REGISTRY.get_sample_value(
+            "http_requests_total",
+            {"method": method, "endpoint": endpoint, "status": status},
+        )
+        or 0.0
+    )
+
+
+@patch("api.v1.recommend.log_writer.write")
+def test_requests_are_labelled_by_route_template(_):
+    app.dependency_overrides[security_jwt] = lambda: {"id": "user-1"}
+    before = requests_total("POST", FEEDBACK_ROUTE, "200")
+    try:
+        for session_id in ("session-1", "session-2"):
+            response = client.post(
+                f"/api/recommend/v1/recommendations/feedback/{session_id}",
+                params={"movie_id": "movie-1", "liked": True},
+                headers={"X-Request-Id": "test-request-id"},
+            )
+            assert response.status_code == 200
+    finally:
+        app.dependency_overrides.pop(security_jwt, None)
+
+    assert requests_total("POST", FEEDBACK_ROUTE, "200") == before + 2
+    paths = {
+        sample.labels["endpoint"]
+        for metric in REGISTRY.collect()
+        if metric.name == "http_requests"
+        for sample in metric.samples
+    }
+    assert not any("session-1" in path for path in paths)
+    assert REGISTRY.get_sample_value("http_requests_in_flight", {"method": "POST"}) == 0
+
+
+def test_missing_request_id_and_unknown_paths_are_counted():
+    before_rejected = requests_total("POST", FEEDBACK_ROUTE, "400")
+    before_unmatched = requests_total("GET", UNMATCHED_ROUTE, "404")
+
+    rejected = client.post("/api/recommend/v1/recommendations/feedback/session-3")
+    unknown = client.get("/no/such/path", headers={"X-Request-Id": "test-request-id"})
+
+    assert rejected.status_code == 400
+    assert rejected.json() == {"detail": "X-Request-Id is required"}
+    assert unknown.status_code == 404
+    assert requests_total("POST", FEEDBACK_ROUTE, "400") == before_rejected + 1
+    assert requests_total("GET", UNMATCHED_ROUTE, "404") == before_unmatched + 1
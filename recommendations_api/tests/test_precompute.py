@@ -0,0 +1,154 @@
+import asyncio
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import numpy as np
+import pytest
+from scipy.sparse import csr_matrix
+
+from core.experiments import ModelExperiment
+from ml.id_index import IdIndex
+from ml.precompute import precompute_recommendations
+from ml.recommendation_model import RecommendationModel
+from ml.snapshot import ModelSnapshot
+
+
+class FakeCollection:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, query, projection=None):
+        user_ids = query["user_id"]["$in"]
+        return SimpleNamespace(
+            to_list=AsyncMock(
+                return_value=[doc for doc in self.docs if doc["user_id"] in user_ids]
+            )
+        )
+
+
+def make_snapshot():
+    rng = np.random.default_rng(0)
+    return ModelSnapshot.build(
+        "v1",
+        IdIndex.from_ids(["u0", "u1", "u2"]),
+        IdIndex.from_ids([f"m{i}" for i in range(8)]),
+        {
+            model_type: (
+                rng.standard_normal((3, 4), dtype=np.float32),
+                rng.standard_normal((8, 4), dtype=np.float32),
+                rng.standard_normal(8, dtype=np.float32) if biases else None,
+            )
+            for model_type, biases in (("als", False), ("lightfm", True))
+        },
+        ann_indexes={},
+    )
+
+
+DB = {
+    "watched_movies": FakeCollection(
+        [
+            {"user_id": "u0", "movie_id": "m1"},
+            {"user_id": "u0", "movie_id": "new1"},  # Новый фильм уже просмотрен
+            {"user_id": "u1", "movie_id": "m2"},
+        ]
+    ),
+    "likes": FakeCollection([{"user_id": "u0", "movie_id": "m3"}]),
+    "bookmarks": FakeCollection([{"user_id": "u2", "movie_id": "m4"}]),
+}
+
+
+def online(snapshot, user_id: str, model_type: str, n: int) -> list:
+    """Выдача онлайн-пути (RecommendationModel.score_user) без новых фильмов"""
+    watched = {
+        doc["movie_id"]
+        for doc in DB["watched_movies"].docs
+        if doc["user_id"] == user_id
+    }
+    interactions = [
+        doc["movie_id"]
+        for collection in DB.values()
+        for doc in collection.docs
+        if doc["user_id"] == user_id
+    ]
+    cols = snapshot.movies.lookup(interactions)
+    cols = cols[cols >= 0]
+    user_row = csr_matrix(
+        (np.ones(len(cols)), (np.zeros(len(cols)), cols)),
+        shape=(1, len(snapshot.movies)),
+    )
+    return RecommendationModel.score_user(
+        RecommendationModel(load=False),
+        snapshot,
+        snapshot.users.get(user_id),
+        model_type,
+        watched,
+        user_row,
+        n,
+    )
+
+
+@pytest.mark.parametrize("model_type", ["als", "lightfm"])
+def test_precompute_matches_online_exclusion(model_type):
+    snapshot = make_snapshot()
+    model = SimpleNamespace(
+        snapshot=snapshot, get_new_movies=AsyncMock(return_value=["new1"])
+    )
+    pipe = MagicMock(execute=AsyncMock())
+    redis = MagicMock(pipeline=MagicMock(return_value=pipe))
+
+    asyncio.run(
+        precompute_recommendations(
+            model,
+            DB,
+            redis,
+            model_type=model_type,
+            n=4,
+            block_size=2,
+            experiment=None,
+        )
+    )
+
+    written = {
+        call.args[0]: json.loads(call.args[2])["value"]["recommendations"]
+        for call in pipe.setex.call_args_list
+    }
+    # u0 уже видел new1: выдача совпадает с онлайн-путём целиком
+    assert written[f"recommendations:u0:{model_type}"] == online(
+        snapshot, "u0", model_type, 4
+    )
+    for user_id in ("u1", "u2"):
+        recommendations = written[f"recommendations:{user_id}:{model_type}"]
+        assert recommendations[:3] == online(snapshot, user_id, model_type, 4)[:3]
+        assert recommendations[3] == "new1"
+    # Лайк исключается только для ALS, просмотр — для обеих моделей
+    assert "m1" not in written[f"recommendations:u0:{model_type}"]
+    if model_type == "als":
+        assert "m3" not in written["recommendations:u0:als"]
+
+
+def test_precompute_writes_only_assigned_model():
+    snapshot = make_snapshot()
+    model = SimpleNamespace(
+        snapshot=snapshot, get_new_movies=AsyncMock(return_value=[])
+    )
+    pipe = MagicMock(execute=AsyncMock())
+    redis = MagicMock(
+        pipeline=MagicMock(return_value=pipe), get=AsyncMock(return_value=None)
+    )
+    # С солью "a" пользователи u0 и u2 закреплены за ALS, u1 — за LightFM
+    experiment = ModelExperiment(split={"als": 50, "lightfm": 50}, salt="a")
+
+    for model_type in ("als", "lightfm"):
+        asyncio.run(
+            precompute_recommendations(
+                model, DB, redis, model_type=model_type, experiment=experiment
+            )
+        )
+
+    keys = sorted(call.args[0] for call in pipe.setex.call_args_list)
+    assert keys == [
+        "recommendations:u0:als",
+        "recommendations:u1:lightfm",
+        "recommendations:u2:als",
+    ]
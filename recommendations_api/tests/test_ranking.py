@@ -0,0 +1,50 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from ml.ranking import mask_seen_items, mix_new_movies, score_top_k, top_k_indices
+
+
+def test_top_k_indices_matches_argsort():
+    rng = np.random.default_rng(0)
+    scores = rng.standard_normal((5, 100)).astype(np.float32)
+
+    top = top_k_indices(scores, 10)
+
+    assert top.shape == (5, 10)
+    np.testing.assert_array_equal(top, np.argsort(-scores, axis=1)[:, :10])
+
+
+def test_top_k_indices_vector_and_small_catalog():
+    scores = np.array([0.1, 0.9, 0.5], dtype=np.float32)
+
+    assert top_k_indices(scores, 2).tolist() == [1, 2]
+    assert top_k_indices(scores, 10).tolist() == [1, 2, 0]
+
+
+def test_mask_seen_items():
+    scores = np.ones((2, 4), dtype=np.float32)
+    seen = csr_matrix(np.array([[1, 0, 0, 1], [0, 1, 0, 0]], dtype=np.float32))
+
+    mask_seen_items(scores, seen)
+
+    assert np.isneginf(scores).tolist() == [
+        [True, False, False, True],
+        [False, True, False, False],
+    ]
+
+
+def test_score_top_k_skips_seen_items():
+    user_vectors = np.array([[1.0, 0.0], [0.0, 1.0]], dtype=np.float32)
+    item_vectors = np.array([[3.0, 0.0], [2.0, 1.0], [0.0, 3.0]], dtype=np.float32)
+    seen = csr_matrix(np.array([[1, 0, 0], [0, 0, 0]], dtype=np.float32))
+
+    indices, scores = score_top_k(user_vectors, item_vectors.T, 2, user_items=seen)
+
+    assert indices.tolist() == [[1, 2], [2, 1]]
+    assert np.isfinite(scores).all()
+
+
+def test_mix_new_movies_replaces_tail():
+    recommendations = mix_new_movies(["m1", "m2", "m3"], ["new"], 3)
+
+    assert recommendations == ["m1", "m2", "new"]
@@ -0,0 +1,50 @@
+import asyncio
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from main import app
+from ml.recommendation_model import RecommendationModel
+from tests.test_registry import make_snapshot
+
+client = TestClient(app)
+
+
+def test_ready_after_background_load():
+    model = RecommendationModel(load=False)
+
+    def load_models():
+        model.publish(make_snapshot("v2"), load_seconds=0.5)
+        return True
+
+    with patch("main.recommendation_model", model):
+        loading = client.get("/ready")
+        with patch.object(model, "load_models", side_effect=load_models) as load:
+            assert asyncio.run(model.load_async()) is True
+            # Повторный вызов после готовности не обращается к реестру
+            assert asyncio.run(model.load_async()) is True
+        ready = client.get("/ready")
+
+    assert loading.status_code == 503
+    assert loading.json()["ready"] is False
+    assert loading.json()["version"] is None
+    load.assert_called_once()
+    assert ready.status_code == 200
+    body = ready.json()
+    assert body["version"] == "v2"
+    assert body["models"] == {"als": True, "lightfm": True}
+    assert body["load_seconds"] == 0.5
+    assert body["loaded_at"] is not None
+
+
+def test_ready_when_registry_is_empty():
+    model = RecommendationModel(load=False)
+
+    with patch.object(model, "load_models", return_value=False):
+        assert asyncio.run(model.load_async()) is False
+
+    # Моделей нет, но загрузка завершена: сервис отдаёт популярные фильмы
+    with patch("main.recommendation_model", model):
+        response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["models"] == {"als": False, "lightfm": False}
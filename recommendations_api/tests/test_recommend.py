@@ -7,6 +7,7 @@ from fastapi import status
 from fastapi.testclient import TestClient
 
 from api.v1.recommend import get_redis
+from core.cache import encode_entry, invalidator
 from core.config import db
 from core.jwt import security_jwt
 from main import app
@@ -39,6 +40,14 @@ def override_jwt_dependency():
     app.dependency_overrides.pop(security_jwt, None)
 
 
+@pytest.fixture(autouse=True)
+def clear_local_caches():
+    # Тесты подменяют Redis и MongoDB: значения прошлых тестов не должны отдаваться
+    invalidator.clear_all()
+    yield
+    invalidator.clear_all()
+
+
 @pytest.mark.asyncio
 @patch("core.jwt.JWTBearer.get_token_from_request", return_value=None)
 async def test_missing_authorization_token(jwt_get_token):
@@ -149,16 +158,17 @@ async def test_get_recommendations_cache_hit(
 # # ==================================================================
 # # 2. Cache miss
 # # ==================================================================
+@patch("api.v1.recommend.log_writer.write")
 @patch("api.v1.recommend.db")
 @patch("api.v1.recommend.recommendation_model.get_recommendations")
 @patch("core.jwt.security_jwt")
 @pytest.mark.asyncio
 async def test_get_recommendations_cache_miss(
-    mock_security, mock_get_recommendations, mock_db, valid_token_header
+    mock_security, mock_get_recommendations, mock_db, mock_write, valid_token_header
 ):
     """
     Если кеш отсутствует, функция recommendation_model.get_recommendations вызывается,
-    затем результат кэшируется в Redis и логируется в MongoDB.
+    затем результат кэшируется в Redis и ставится в очередь записи в MongoDB.
     """
     user_id = "hashed_user_id"
     result = {
@@ -178,10 +188,6 @@ async def test_get_recommendations_cache_miss(
 
     mock_security.return_value = {"id": "hashed_user_id", "username": "test_user"}
 
-    fake_logs = AsyncMock()
-    fake_logs.insert_one = AsyncMock()
-    mock_db.__getitem__.return_value = fake_logs
-
     response = client.get(
         BASE_URL_AUTH + f"/{user_id}?model=lightfm",
         headers=valid_token_header,
@@ -192,15 +198,64 @@ async def test_get_recommendations_cache_miss(
     fake_redis.get.assert_awaited_with(cache_key)
     mock_get_recommendations.assert_awaited_with(user_id, mock_db, model_type="lightfm")
     fake_redis.setex.assert_awaited()
-    fake_logs.insert_one.assert_awaited_once()
+    mock_write.assert_awaited_once()
+    assert mock_write.await_args.args[0] == "recommendation_logs"
+
+    app.dependency_overrides.pop(get_redis, None)
+
+
+# # ==================================================================
+# # 2a. Устаревшее значение в кэше
+# # ==================================================================
+@patch("api.v1.recommend.recommendation_cache.refresh")
+@patch("api.v1.recommend.log_writer.write")
+@patch("api.v1.recommend.db")
+@patch("api.v1.recommend.recommendation_model.get_recommendations")
+@pytest.mark.asyncio
+async def test_get_recommendations_stale_hit_refresh_is_logged(
+    mock_get_recommendations, mock_db, mock_write, mock_refresh, valid_token_header
+):
+    """
+    Устаревшее значение отдаётся сразу, а фоновый пересчёт не только
+    кэширует новую выдачу, но и пишет её session_id в recommendation_logs.
+    """
+    user_id = "hashed_user_id"
+    stale = {"recommendations": ["movie1"], "session_id": "old", "source": "model"}
+    fresh = {"recommendations": ["movie2"], "session_id": "new", "source": "model"}
+
+    fake_redis = AsyncMock()
+    fake_redis.get = AsyncMock(return_value=encode_entry(stale, soft_ttl=-1))
+    fake_redis.setex = AsyncMock()
+    app.dependency_overrides[get_redis] = lambda: fake_redis
+    mock_get_recommendations.return_value = fresh
+
+    response = client.get(
+        BASE_URL_AUTH + f"/{user_id}?model=als", headers=valid_token_header
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == stale
+    mock_write.assert_not_awaited()
+
+    # Пересчёт, который эндпоинт поставил в фон
+    mock_refresh.assert_called_once()
+    redis, cache_key, refresher = mock_refresh.call_args.args
+    assert cache_key == f"recommendations:{user_id}:als"
+    assert await refresher() == fresh
+
+    fake_redis.setex.assert_awaited()
+    mock_write.assert_awaited_once()
+    collection, log = mock_write.await_args.args
+    assert collection == "recommendation_logs"
+    assert log["session_id"] == "new"
 
     app.dependency_overrides.pop(get_redis, None)
 
 
 # # ==================================================================
-# # 3. Неверный параметр model → используется random.choice
+# # 3. Неверный параметр model → модель по бакету пользователя
 # # ==================================================================
-@patch("api.v1.recommend.random.choice", return_value="als")
+@patch("api.v1.recommend.log_writer.write")
+@patch("api.v1.recommend.model_experiment.assign", return_value="als")
 @patch("api.v1.recommend.db")
 @patch("api.v1.recommend.recommendation_model.get_recommendations")
 @patch("core.jwt.security_jwt")
@@ -209,13 +264,14 @@ async def test_get_recommendations_invalid_model(
     mock_security,
     mock_get_recommendations,
     mock_db,
-    mock_random_choice,
+    mock_assign,
+    mock_write,
     valid_token_header,
 ):
     """
     Если передан недопустимый параметр model (например, "invalid"),
-    то выбирается случайное значение. Поскольку random.choice замокано и возвращает "als",
-    в итоге используется модель "als".
+    то модель выбирается по бакету пользователя. Поскольку assign замокан
+    и возвращает "als", в итоге используется модель "als".
     """
     user_id = "hashed_user_id"
     result = {"recommendations": ["movieX"], "session_id": "sess789", "source": "model"}
@@ -230,10 +286,6 @@ async def test_get_recommendations_invalid_model(
 
     mock_security.return_value = {"id": "hashed_user_id", "username": "test_user"}
 
-    fake_logs = AsyncMock()
-    fake_logs.insert_one = AsyncMock()
-    mock_db.__getitem__.return_value = fake_logs
-
     response = client.get(
         BASE_URL_AUTH + f"/{user_id}?model=invalid",
         headers=valid_token_header,
@@ -245,15 +297,16 @@ async def test_get_recommendations_invalid_model(
     assert response.json() == result
 
     fake_redis.setex.assert_awaited()
-    fake_logs.insert_one.assert_awaited_once()
+    mock_write.assert_awaited_once()
 
     app.dependency_overrides.pop(get_redis, None)
 
 
 # # ==================================================================
-# # 4. Отсутствует параметр model → используется random.choice
+# # 4. Отсутствует параметр model → модель по бакету пользователя
 # # ==================================================================
-@patch("api.v1.recommend.random.choice", return_value="lightfm")
+@patch("api.v1.recommend.log_writer.write")
+@patch("api.v1.recommend.model_experiment.assign", return_value="lightfm")
 @patch("api.v1.recommend.db")
 @patch("api.v1.recommend.recommendation_model.get_recommendations")
 @patch("core.jwt.security_jwt")
@@ -262,12 +315,13 @@ async def test_get_recommendations_no_model_param(
     mock_security,
     mock_get_recommendations,
     mock_db,
-    mock_random_choice,
+    mock_assign,
+    mock_write,
     valid_token_header,
 ):
     """
-    Если параметр model не передан, то выбирается случайная модель.
-    Здесь random.choice замокан и возвращает "lightfm".
+    Если параметр model не передан, то модель выбирается по бакету пользователя.
+    Здесь assign замокан и возвращает "lightfm".
     """
     user_id = "hashed_user_id"
     result = {
@@ -284,9 +338,6 @@ async def test_get_recommendations_no_model_param(
 
     mock_get_recommendations.return_value = result
     mock_security.return_value = {"id": "hashed_user_id", "username": "test_user"}
-    fake_logs = AsyncMock()
-    fake_logs.insert_one = AsyncMock()
-    mock_db.__getitem__.return_value = fake_logs
 
     response = client.get(
         BASE_URL_AUTH + f"/{user_id}",
@@ -295,6 +346,7 @@ async def test_get_recommendations_no_model_param(
     assert response.status_code == status.HTTP_200_OK
 
     fake_redis.get.assert_awaited_with(cache_key)
+    mock_assign.assert_awaited_once_with(fake_redis, user_id)
     mock_get_recommendations.assert_awaited_with(user_id, mock_db, model_type="lightfm")
     assert response.json() == result
 
@@ -309,13 +361,13 @@ async def test_get_recommendations_no_model_param(
 # --------------------------------------------
 # 1. Успешная отправка обратной связи
 # --------------------------------------------
-@patch("api.v1.recommend.db")
+@patch("api.v1.recommend.log_writer.write")
 @patch("core.jwt.security_jwt")
 @pytest.mark.asyncio
-async def test_submit_feedback_success(mock_security, mock_db, valid_token_header):
+async def test_submit_feedback_success(mock_security, mock_write, valid_token_header):
     """
     При наличии валидного токена и всех обязательных параметров обратной связи,
-    feedback сохраняется в базе и возвращается {"status": "success"}.
+    feedback ставится в очередь записи в базу и возвращается {"status": "success"}.
     """
     session_id = "sess_001"
     movie_id = "movie_123"
@@ -323,10 +375,6 @@ async def test_submit_feedback_success(mock_security, mock_db, valid_token_heade
 
     mock_security.return_value = {"id": "hashed_user_id", "username": "test_user"}
 
-    fake_feedback_collection = AsyncMock()
-    fake_feedback_collection.insert_one = AsyncMock()
-    mock_db.__getitem__.return_value = fake_feedback_collection
-
     response = client.post(
         BASE_URL_AUTH
         + f"/feedback/{session_id}?movie_id={movie_id}&liked={str(liked).lower()}",
@@ -336,10 +384,11 @@ async def test_submit_feedback_success(mock_security, mock_db, valid_token_heade
     assert response.status_code == status.HTTP_200_OK
     assert response.json() == {"status": "success"}
 
-    fake_feedback_collection.insert_one.assert_awaited_once()
+    mock_write.assert_awaited_once()
 
-    args, kwargs = fake_feedback_collection.insert_one.await_args
-    inserted_data = args[0]
+    args, kwargs = mock_write.await_args
+    collection, inserted_data = args
+    assert collection == "feedback"
 
     assert inserted_data["session_id"] == session_id
     assert inserted_data["movie_id"] == movie_id
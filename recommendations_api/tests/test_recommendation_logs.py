@@ -0,0 +1,60 @@
+import uuid
+from datetime import datetime, timezone
+
+import bson
+
+from ml.recommendation_logs import decode_log, recommendation_log, timeseries_options
+
+TIMESTAMP = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def roundtrip(doc: dict) -> dict:
+    # Как документ вернётся из MongoDB
+    return bson.decode(bson.encode(doc), codec_options=bson.CodecOptions(tz_aware=True))
+
+
+def test_timeseries_log_roundtrip_with_binary_ids():
+    user_id, session_id = str(uuid.uuid4()), str(uuid.uuid4())
+    movies = [str(uuid.uuid4()) for _ in range(5)]
+    result = {"source": "als", "recommendations": movies, "session_id": session_id}
+
+    doc = recommendation_log(user_id, "als", result, TIMESTAMP, layout="timeseries")
+    legacy = recommendation_log(user_id, "als", result, TIMESTAMP, layout="documents")
+
+    assert len(bson.encode(doc)) < 0.6 * len(bson.encode(legacy))
+    assert (
+        decode_log(roundtrip(doc))
+        == decode_log(roundtrip(legacy))
+        == {
+            "user_id": user_id,
+            "session_id": session_id,
+            "model_type": "als",
+            "source": "als",
+            "recommendations": movies,
+            "timestamp": TIMESTAMP,
+        }
+    )
+
+
+def test_timeseries_log_keeps_non_uuid_ids_as_strings():
+    result = {
+        "source": "popular",
+        "recommendations": ["tt0111161", str(uuid.uuid4())],
+        "session_id": "session-1",
+    }
+
+    doc = roundtrip(
+        recommendation_log("user-1", "lightfm", result, TIMESTAMP, layout="timeseries")
+    )
+
+    assert doc["meta"] == {"model": "lightfm", "source": "popular"}
+    decoded = decode_log(doc)
+    assert decoded["recommendations"] == result["recommendations"]
+    assert (decoded["user_id"], decoded["session_id"]) == ("user-1", "session-1")
+
+
+def test_timeseries_options_retention():
+    assert "expireAfterSeconds" not in timeseries_options(0)
+    options = timeseries_options(30)
+    assert options["expireAfterSeconds"] == 30 * 86400
+    assert options["timeseries"]["metaField"] == "meta"
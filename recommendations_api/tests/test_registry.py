@@ -0,0 +1,97 @@
+import asyncio
+import os
+from unittest.mock import MagicMock
+
+import numpy as np
+
+from ml.artifacts import read_arrays, read_manifest, write_artifact
+from ml.id_index import IdIndex
+from ml.registry import ModelRegistry, ModelWatcher
+from ml.snapshot import ModelSnapshot
+
+
+def make_snapshot(version="v1"):
+    rng = np.random.default_rng(0)
+    return ModelSnapshot.build(
+        version,
+        IdIndex.from_ids(["u1", "u2"]),
+        IdIndex.from_ids(["m1", "m2", "m3"]),
+        {
+            "als": (
+                rng.random((2, 4), dtype=np.float32),
+                rng.random((3, 4), dtype=np.float32),
+                None,
+            ),
+            "lightfm": (
+                rng.random((2, 4), dtype=np.float32),
+                rng.random((3, 4), dtype=np.float32),
+                rng.random(3, dtype=np.float32),
+            ),
+        },
+        ann_indexes={},
+    )
+
+
+def test_snapshot_artifact_roundtrip(tmp_path):
+    snapshot = make_snapshot()
+    write_artifact(str(tmp_path), snapshot.to_arrays())
+
+    loaded = ModelSnapshot.from_arrays(
+        "v1",
+        read_arrays(str(tmp_path), read_manifest(str(tmp_path))),
+        ["als", "lightfm"],
+    )
+
+    assert loaded.users.lookup(["u2", "u1", "u3"]).tolist() == [1, 0, -1]
+    assert list(loaded.movies) == ["m1", "m2", "m3"]
+    assert loaded.is_loaded("als") and loaded.is_loaded("lightfm")
+    assert loaded.factors["als"][2] is None
+    np.testing.assert_array_equal(
+        loaded.factors["lightfm"][2], snapshot.factors["lightfm"][2]
+    )
+
+
+def test_watcher_swaps_snapshot_on_new_version():
+    current, new = make_snapshot("v1"), make_snapshot("v2")
+    model = MagicMock(snapshot=current)
+    model.registry.latest_version.return_value = "v1"
+    model.registry.load.return_value = new
+    watcher = ModelWatcher(model, interval=0)
+
+    assert asyncio.run(watcher.check()) is False
+    model.publish.assert_not_called()
+
+    model.registry.latest_version.return_value = "v2"
+    assert asyncio.run(watcher.check()) is True
+    model.registry.load.assert_called_once_with("v2")
+    model.publish.assert_called_once()
+    assert model.publish.call_args.args == (new,)
+    assert model.publish.call_args.kwargs["load_seconds"] >= 0
+
+
+def test_prune_local_keeps_latest_versions(tmp_path):
+    # Без манифеста порядок задаёт mtime каталога
+    for day, version in enumerate(("20240103T000000-c", "20240101T000000-a", "b")):
+        os.makedirs(tmp_path / version)
+        os.utime(tmp_path / version, (day, day))
+    registry = ModelRegistry(MagicMock(), "models", str(tmp_path))
+
+    registry.prune_local(keep=2)
+
+    assert sorted(os.listdir(tmp_path)) == ["20240101T000000-a", "b"]
+
+
+def test_prune_local_orders_same_second_versions_by_manifest(tmp_path):
+    # Версии одной секунды: по имени "-f" новее "-0", по манифесту — наоборот
+    snapshot = make_snapshot()
+    for version in ("20240101T000000-f", "20240101T000000-0"):
+        write_artifact(str(tmp_path / version), snapshot.to_arrays())
+    registry = ModelRegistry(MagicMock(), "models", str(tmp_path))
+
+    registry.prune_local(keep=1)
+    assert os.listdir(tmp_path) == ["20240101T000000-0"]
+
+    # Текущая версия не удаляется, даже если она не из keep последних
+    write_artifact(str(tmp_path / "20240101T000000-1"), snapshot.to_arrays())
+    registry.prune_local(keep=1, protect=("20240101T000000-0",))
+    assert sorted(os.listdir(tmp_path)) == ["20240101T000000-0", "20240101T000000-1"]
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from scipy.sparse import csr_matrix
+
+from ml.evaluate_metrics import session_metrics
+from ml.replay import heldout, ranking_metrics, top_k_exact
+
+
+def test_heldout_drops_known_pairs():
+    train = csr_matrix(np.array([[1, 0, 0], [0, 2, 0]], dtype=np.float32))
+    test = csr_matrix(np.array([[3, 1, 0], [0, 1, 1]], dtype=np.float32))
+
+    relevant = heldout(train, test)
+
+    assert relevant.toarray().tolist() == [[0, 1, 0], [0, 0, 1]]
+
+
+def test_ranking_metrics_match_online_evaluator():
+    rng = np.random.default_rng(0)
+    top = np.array([rng.permutation(20)[:5] for _ in range(30)])
+    top[3, 4] = -1  # Каталог меньше K: пустая позиция
+    relevant = csr_matrix((rng.random((30, 20)) < 0.2).astype(np.float32))
+    relevant[:, 0] = 1  # У каждого пользователя есть отложенные фильмы
+    relevant = relevant.tocsr()
+
+    metrics = ranking_metrics(top, relevant, [1, 5])
+
+    # Те же определения, что у онлайн-оценки по обратной связи
+    per_user = [
+        session_metrics(
+            [item for item in row if item >= 0],
+            set(relevant[user].indices),
+            [1, 5],
+        )
+        for user, row in enumerate(top)
+    ]
+    for name in ("recall@5", "ndcg@5", "ndcg@1", "precision@1"):
+        expected = np.mean([user_metrics[name] for user_metrics in per_user])
+        assert metrics[name] == pytest.approx(expected)
+
+
+def test_top_k_exact_skips_train_items():
+    user_vectors = np.eye(2, dtype=np.float32)
+    item_vectors = np.array([[3, 0], [2, 0], [1, 0], [0, 1]], dtype=np.float32)
+    train = csr_matrix(np.array([[1, 0, 0, 0], [0, 0, 0, 1]], dtype=np.float32))
+
+    top = top_k_exact(
+        (user_vectors, item_vectors, None), train, np.array([0, 1]), 2, block_size=1
+    )
+
+    assert top[0].tolist() == [1, 2]
+    assert top[1, 0] in (0, 1, 2)
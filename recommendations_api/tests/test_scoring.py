@@ -0,0 +1,48 @@
+import asyncio
+import time
+
+from core.metrics import SCORING_QUEUE_DEPTH
+from ml.scoring import ScoringExecutor
+
+
+def blocking_score(duration: float) -> float:
+    time.sleep(duration)
+    return duration
+
+
+def test_scoring_does_not_block_event_loop():
+    scoring = ScoringExecutor(workers=2, concurrency=1)
+    ticks = []
+    depths = []
+
+    async def ticker():
+        # Пока идёт скоринг, event loop продолжает выполнять другие корутины
+        for _ in range(5):
+            ticks.append(time.perf_counter())
+            depths.append(SCORING_QUEUE_DEPTH._value.get())
+            await asyncio.sleep(0.02)
+
+    async def main():
+        return await asyncio.gather(
+            scoring.run(blocking_score, 0.1),
+            scoring.run(blocking_score, duration=0.1),
+            ticker(),
+        )
+
+    start = time.perf_counter()
+    first, second, _ = asyncio.run(main())
+    elapsed = time.perf_counter() - start
+    scoring.shutdown()
+
+    assert (first, second) == (0.1, 0.1)
+    # Лимит 1: задачи выполняются по очереди, вторая ждёт слота
+    assert elapsed >= 0.2
+    assert max(depths) == 1
+    assert ticks[-1] - ticks[0] < 0.2
+    assert SCORING_QUEUE_DEPTH._value.get() == 0
+
+
+def test_scoring_inline_without_workers():
+    scoring = ScoringExecutor(workers=0)
+
+    assert asyncio.run(scoring.run(blocking_score, 0)) == 0
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+from core.metrics import COALESCED_REQUESTS
+from core.single_flight import SingleFlight
+
+
+class FakeRedis:
+    """Общий Redis нескольких «реплик»: SET NX, GET и снятие блокировки"""
+
+    def __init__(self):
+        self.data = {}
+
+    async def set(self, key, value, nx=False, px=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def eval(self, script, numkeys, key, token):
+        if self.data.get(key) == token:
+            del self.data[key]
+            return 1
+        return 0
+
+
+def coalesced(scope: str) -> float:
+    return COALESCED_REQUESTS.labels(scope=scope)._value.get()
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    flight = SingleFlight(redis_lock=False)
+    calls = []
+    before = coalesced("local")
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"recommendations": ["m1"]}
+
+    async def main():
+        return await asyncio.gather(*(flight.do("key", compute) for _ in range(5)))
+
+    results = asyncio.run(main())
+
+    assert len(calls) == 1
+    assert all(result == {"recommendations": ["m1"]} for result in results)
+    assert coalesced("local") - before == 4
+    assert flight.calls == {}
+
+
+def test_single_flight_propagates_errors_and_retries():
+    flight = SingleFlight(redis_lock=False)
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("model unavailable")
+
+    async def main():
+        return await asyncio.gather(
+            *(flight.do("key", failing) for _ in range(3)), return_exceptions=True
+        )
+
+    results = asyncio.run(main())
+
+    assert len(calls) == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+    # Ошибка не кэшируется: следующий вызов считает заново
+    with pytest.raises(RuntimeError):
+        asyncio.run(flight.do("key", failing))
+    assert len(calls) == 2
+
+
+def test_single_flight_redis_lock_across_replicas():
+    redis = FakeRedis()
+    replicas = [SingleFlight(redis_lock=True, poll_ms=5) for _ in range(2)]
+    calls = []
+    before = coalesced("redis")
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.03)
+        redis.data["cache"] = "result"
+        return "result"
+
+    async def load():
+        return redis.data.get("cache")
+
+    async def main():
+        return await asyncio.gather(
+            *(
+                replica.do("cache", compute, redis=redis, load=load)
+                for replica in replicas
+            )
+        )
+
+    assert asyncio.run(main()) == ["result", "result"]
+    assert len(calls) == 1
+    assert coalesced("redis") - before == 1
+    assert "lock:cache" not in redis.data
@@ -0,0 +1,79 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from api.v1.recommend import get_redis
+from core.cache import invalidator
+from core.jwt import security_jwt
+from core.stages import collect_stages, server_timing, stage
+from main import app
+
+client = TestClient(app)
+
+BASE_URL = "http://localhost:8084/api/recommend/v1/recommendations"
+
+
+def stage_count(name: str, model_type: str) -> float:
+    return (
+        REGISTRY.get_sample_value(
+            "recommendation_stage_duration_seconds_count",
+            {"stage": name, "model_type": model_type},
+        )
+        or 0.0
+    )
+
+
+@pytest.mark.asyncio
+async def test_stage_breakdown_collects_stages_of_gathered_tasks():
+    before = stage_count("scoring", "als")
+
+    async def timed(name: str):
+        with stage(name, "als"):
+            await asyncio.sleep(0.01)
+
+    breakdown = collect_stages()
+    await asyncio.gather(timed("scoring"), timed("new_movie_mix"))
+    with stage("new_movie_mix", "als"):
+        pass
+
+    assert set(breakdown) == {"scoring", "new_movie_mix"}
+    assert breakdown["scoring"] >= 0.01
+    assert stage_count("scoring", "als") == before + 1
+    header = server_timing({"scoring": 0.0125}, 0.02)
+    assert header == "scoring;dur=12.50, total;dur=20.00"
+
+
+@patch("api.v1.recommend.log_writer.write")
+@patch("api.v1.recommend.db")
+@patch("api.v1.recommend.recommendation_model.get_recommendations")
+def test_debug_header_returns_stage_breakdown(mock_get_recommendations, mock_db, _):
+    fake_redis = AsyncMock()
+    fake_redis.get = AsyncMock(return_value=None)
+    app.dependency_overrides[get_redis] = lambda: fake_redis
+    app.dependency_overrides[security_jwt] = lambda: {"id": "user-1"}
+    mock_get_recommendations.return_value = {
+        "recommendations": ["movie1"],
+        "session_id": "sess1",
+        "source": "als",
+    }
+    headers = {"Authorization": "Bearer token", "X-Request-Id": "test-request-id"}
+    try:
+        invalidator.clear_all()
+        plain = client.get(f"{BASE_URL}/user-1?model=als", headers=headers)
+        invalidator.clear_all()
+        debug = client.get(
+            f"{BASE_URL}/user-1?model=als", headers={**headers, "X-Debug-Timing": "1"}
+        )
+    finally:
+        app.dependency_overrides.pop(get_redis, None)
+        app.dependency_overrides.pop(security_jwt, None)
+        invalidator.clear_all()
+
+    assert "server-timing" not in plain.headers
+    names = [
+        entry.split(";")[0] for entry in debug.headers["server-timing"].split(", ")
+    ]
+    assert names == ["cache_write", "log_write", "total"]
@@ -1,12 +1,14 @@
 import asyncio
-import json
 import logging
 from datetime import datetime
 
 from rq import Queue, Retry
 
+from core.cache import cache_ttls, invalidator, recommendation_cache
 from core.config import db
 from core.redis import get_redis, get_sync_redis
+from ml.interactions import count_interactions
+from ml.precompute import precompute_recommendations
 from ml.recommendation_model import recommendation_model
 
 logging.basicConfig(level=logging.INFO)
@@ -19,18 +21,17 @@ def get_queue() -> Queue:
 
 
 async def update_recommendations_async(user_id: str, model_type: str = "als"):
+    # При импорте модели не загружаются: первая задача воркера загружает их сама
+    await recommendation_model.load_async()
     result = await recommendation_model.get_recommendations(
         user_id, db, model_type=model_type
     )
-    cache_data = {
-        "source": result["source"],
-        "recommendations": result["recommendations"],
-    }
     redis = await get_redis()
     cache_key = f"recommendations:{user_id}:{model_type}"
-    await redis.setex(cache_key, 3600, json.dumps(cache_data))
+    # Те же TTL с разбросом, что и у API; session_id нужен схеме ответа
+    await recommendation_cache.set(redis, cache_key, result, *cache_ttls())
     logger.info(
-        f"Cached {model_type} recommendations for user {user_id} via RQ: {cache_data}"
+        f"Cached {model_type} recommendations for user {user_id} via RQ: {result}"
     )
 
 
@@ -39,14 +40,23 @@ def update_recommendations(user_id: str, model_type: str = "als"):
 
 
 async def update_all_recommendations_async():
-    users = await db["watched_movies"].distinct("user_id")
-    queue = get_queue()
-    for user_id in map(str, users):
-        queue.enqueue(update_recommendations, user_id, "als")
-        queue.enqueue(update_recommendations, user_id, "lightfm")
-        logger.info(
-            f"Enqueued update_recommendations for user {user_id} with ALS and LightFM"
-        )
+    # Job выполняется в форке воркера: подтягиваем модели последнего обучения.
+    # Состояние для дообучения не нужно: исключения читаются из MongoDB
+    if not recommendation_model.load_models():
+        logger.info("No trained models available. Skipping recommendations update.")
+        return
+
+    redis = await get_redis()
+    for model_type, loaded in (
+        ("als", recommendation_model.als_loaded),
+        ("lightfm", recommendation_model.lightfm_loaded),
+    ):
+        if loaded:
+            await precompute_recommendations(
+                recommendation_model, db, redis, model_type=model_type
+            )
+    # Кэш перезаписан целиком: реплики API сбрасывают локальные копии
+    await invalidator.publish(redis, recommendation_cache.local.name)
 
 
 def update_all_recommendations():
@@ -61,17 +71,9 @@ async def train_model_async(partial: bool = False, train_als: bool = False):
         datetime.fromisoformat(last_train_time_str) if last_train_time_str else None
     )
 
-    # Проверяем наличие новых взаимодействий
-    new_interactions = (
-        await db["watched_movies"]
-        .find({"timestamp": {"$gt": last_train_time}} if last_train_time else {})
-        .to_list(None)
-        or await db["likes"]
-        .find({"timestamp": {"$gt": last_train_time}} if last_train_time else {})
-        .to_list(None)
-        or await db["bookmarks"]
-        .find({"timestamp": {"$gt": last_train_time}} if last_train_time else {})
-        .to_list(None)
+    # Проверяем наличие новых взаимодействий (без загрузки самих документов)
+    new_interactions = await count_interactions(
+        db, {"timestamp": {"$gt": last_train_time}} if last_train_time else {}
     )
 
     if partial and new_interactions: